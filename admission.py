@@ -0,0 +1,204 @@
+"""
+Admission control for the expensive endpoints.
+
+A chat reply (LLM generation) or a voice command (ffmpeg plus recognition)
+costs orders of magnitude more than a task list, so a single chatty client
+could otherwise keep Ollama and the CPU busy for everyone. Before one of the
+limited routes runs, AdmissionController checks, in order:
+
+* the route's concurrency cap (requests of that route already running);
+* the client's token bucket (ZELDA_RATE_CLIENT tokens per second, bursts of
+  up to ZELDA_RATE_CLIENT_BURST);
+* the global token bucket (ZELDA_RATE_GLOBAL / ZELDA_RATE_GLOBAL_BURST).
+
+Each route has a cost in tokens. A request that doesn't fit is answered
+right away with 429 and a Retry-After header instead of queueing. Other
+routes are never checked, so task and habit CRUD keep their latency while
+the expensive routes are saturated. Limits are per process: under
+gunicorn every worker has its own buckets. Clients are told apart by their
+address as ProxyFix resolved it: behind the reverse proxy that is the
+client the proxy saw, taken from only the X-Forwarded-For entries the
+trusted proxies appended (ZELDA_PROXY_HOPS), so a client can't pick its
+bucket by sending the header itself. In multi-user mode the app keys on the
+user instead.
+
+Route costs and caps can be changed with ZELDA_ADMISSION_ROUTES, e.g.
+``main.chat_api=5:4,main.handle_voice=3:2`` (endpoint=cost:max concurrent);
+ZELDA_ADMISSION=off turns the whole layer off.
+"""
+
+import logging
+import math
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from flask import g, jsonify, request
+
+import metrics
+
+log = logging.getLogger(__name__)
+
+RouteLimit = namedtuple('RouteLimit', 'cost max_concurrent')
+
+# With the default client bucket (1 token per second, bursts of 30) one user
+# can give ten voice commands back to back and one every 3 seconds after that
+DEFAULT_ROUTES = {
+    'main.chat_api': RouteLimit(5, 4),
+    'main.handle_voice': RouteLimit(3, 2),
+    'main.voice_stream': RouteLimit(3, 2),
+    # One import at a time already bounds its load; a small cost keeps a
+    # retried or repeated import within a client's burst
+    'main.import_api': RouteLimit(5, 1),
+}
+
+rejected_requests = metrics.REGISTRY.register(metrics.Counter(
+    'zelda_admission_rejected_total', 'Requests turned away by admission control', ('route', 'reason')))
+admitted_requests = metrics.REGISTRY.register(metrics.Counter(
+    'zelda_admission_admitted_total', 'Requests admitted to rate limited routes', ('route',)))
+
+
+def peer_address():
+    """Address of the client. Under ProxyFix this is the entry the trusted
+    proxy added to X-Forwarded-For, not one the client sent."""
+    return request.remote_addr or 'unknown'
+
+
+class TokenBucket:
+    """Refills ``rate`` tokens per second up to ``burst``. Not thread safe on its own."""
+
+    def __init__(self, rate, burst, now=None):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic() if now is None else now
+
+    def refill(self, now):
+        if now > self.updated:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def wait_time(self, cost, now):
+        """Seconds until ``cost`` tokens are available (0 if they are now)"""
+        self.refill(now)
+        if self.tokens >= cost:
+            return 0.0
+        if self.rate <= 0 or cost > self.burst:
+            return math.inf
+        return (cost - self.tokens) / self.rate
+
+    def take(self, cost):
+        self.tokens -= cost
+
+
+class Rejected(Exception):
+    def __init__(self, reason, retry_after):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Per-client and global token buckets plus per-route concurrency caps"""
+
+    def __init__(self, routes=None, client_rate=1.0, client_burst=30, global_rate=5.0, global_burst=100,
+                 max_clients=10000, client_key=None):
+        self.routes = dict(DEFAULT_ROUTES if routes is None else routes)
+        self.client_rate = client_rate
+        self.client_burst = client_burst
+        self.max_clients = max_clients
+        self.client_key = client_key or peer_address
+        self.global_bucket = TokenBucket(global_rate, global_burst)
+        self._clients = OrderedDict()       # client -> TokenBucket, least recently used first
+        self._running = {endpoint: 0 for endpoint in self.routes}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, **kwargs):
+        """Controller configured from ZELDA_RATE_* / ZELDA_ADMISSION_ROUTES, or None when turned off"""
+        if os.environ.get('ZELDA_ADMISSION', 'on') == 'off':
+            return None
+        routes = dict(DEFAULT_ROUTES)
+        for item in filter(None, os.environ.get('ZELDA_ADMISSION_ROUTES', '').split(',')):
+            endpoint, _, limit = item.strip().partition('=')
+            cost, _, max_concurrent = limit.partition(':')
+            routes[endpoint] = RouteLimit(float(cost), int(max_concurrent or 0))
+        return cls(
+            routes,
+            client_rate=float(os.environ.get('ZELDA_RATE_CLIENT', '1')),
+            client_burst=float(os.environ.get('ZELDA_RATE_CLIENT_BURST', '30')),
+            global_rate=float(os.environ.get('ZELDA_RATE_GLOBAL', '5')),
+            global_burst=float(os.environ.get('ZELDA_RATE_GLOBAL_BURST', '100')),
+            **kwargs
+        )
+
+    def init_app(self, app):
+        app.before_request(self._before_request)
+        app.teardown_request(self._teardown_request)
+        metrics.REGISTRY.register(metrics.GaugeFunc(
+            'zelda_admission_in_flight', 'Requests running on rate limited routes',
+            lambda: {(endpoint,): running for endpoint, running in self.stats()['running'].items()},
+            ('route',)), replace=True)
+        app.extensions['admission'] = self
+        return self
+
+    def _client_bucket(self, client, now):
+        bucket = self._clients.get(client)
+        if bucket is None:
+            bucket = self._clients[client] = TokenBucket(self.client_rate, self.client_burst, now)
+            if len(self._clients) > self.max_clients:
+                # The oldest client has been idle longest; a new bucket for it starts full anyway
+                self._clients.popitem(last=False)
+        else:
+            self._clients.move_to_end(client)
+        return bucket
+
+    def admit(self, endpoint, client, now=None):
+        """Reserve a slot and tokens for one request, or raise Rejected"""
+        limit = self.routes[endpoint]
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if limit.max_concurrent and self._running[endpoint] >= limit.max_concurrent:
+                raise Rejected('concurrency', 1)
+            bucket = self._client_bucket(client, now)
+            wait = bucket.wait_time(limit.cost, now)
+            if wait:
+                raise Rejected('client_rate', wait)
+            wait = self.global_bucket.wait_time(limit.cost, now)
+            if wait:
+                raise Rejected('global_rate', wait)
+            # Only charge the buckets once every check has passed
+            bucket.take(limit.cost)
+            self.global_bucket.take(limit.cost)
+            self._running[endpoint] += 1
+
+    def release(self, endpoint):
+        with self._lock:
+            self._running[endpoint] -= 1
+
+    def _before_request(self):
+        endpoint = request.endpoint
+        if endpoint not in self.routes:
+            return None
+        try:
+            self.admit(endpoint, self.client_key())
+        except Rejected as e:
+            rejected_requests.inc(endpoint, e.reason)
+            retry_after = 3600 if math.isinf(e.retry_after) else max(1, math.ceil(e.retry_after))
+            log.info("Rejected %s (%s)", endpoint, e.reason, extra={'retry_after': retry_after})
+            return jsonify({'success': False, 'error': 'Too many requests, please try again shortly',
+                            'reason': e.reason}), 429, {'Retry-After': str(retry_after)}
+        admitted_requests.inc(endpoint)
+        g._admitted = endpoint
+        return None
+
+    def _teardown_request(self, exc):
+        endpoint = g.pop('_admitted', None)
+        if endpoint is not None:
+            self.release(endpoint)
+
+    def stats(self):
+        with self._lock:
+            return {'running': dict(self._running), 'clients': len(self._clients),
+                    'global_tokens': round(self.global_bucket.tokens, 2)}
@@ -1,27 +1,126 @@
 import os
-from flask import Flask, render_template, jsonify, request, abort
+import logging
+from flask import Blueprint, Flask, Response, current_app, g, has_request_context, render_template, jsonify, request, abort, stream_with_context
 from werkzeug.middleware.proxy_fix import ProxyFix
 import json
+import re
 import sqlite3
-from assistant import get_ai_reply, get_motivation_message
+import threading
+from contextlib import contextmanager
+from assistant import OLLAMA_URL, get_ai_reply, get_motivation_message, summarize_conversation
+from habit_index import HabitNameIndex, normalize_name
+from stages import stage
+import reminders
+from reminders import ReminderScheduler, ReminderFollower, LogSink, DesktopSink
+from assets import AssetPipeline
+from page_cache import PageCache
+from summary import DashboardSummary
+import metrics
+from logging_setup import configure_logging
+from profiling import RequestProfiler
+from admission import AdmissionController, peer_address
+from invalidation import DataVersionWatcher
+from shards import ShardRouter
+import idempotency
+import archive
+from archive import Archiver
+import transfer
+import conversation
+from conversation import ConversationMemory
+import retrieval
+from retrieval import RetrievalIndex
+import recurrence
+from idempotency import IdempotencyStore, idempotent
 
-# Import voice assistant module
+# WebSocket support for streaming voice input is optional
 try:
-    from voice_assistant import handle_voice_command
-    VOICE_ENABLED = True
+    from flask_sock import Sock
 except ImportError:
-    print("Voice assistant module could not be loaded. Please install required dependencies.")
-    VOICE_ENABLED = False
+    Sock = None
 
-app = Flask(__name__)
-app.wsgi_app = ProxyFix(app.wsgi_app)
+log = logging.getLogger(__name__)
 
-DB_FILE = 'habits.db'
+bp = Blueprint('main', __name__)
+sock = Sock() if Sock else None
+
+DB_FILE = os.environ.get('ZELDA_DB', 'habits.db')
+
+# Multi-user mode: with ZELDA_SHARD_DIR set, every user's tasks and habits live
+# in their own shard database (see shards.py) instead of DB_FILE. Requests name
+# their user in the ZELDA_USER_HEADER header, normally set by the reverse proxy
+# that authenticated them; ZELDA_DEFAULT_USER covers requests without one.
+USER_HEADER = os.environ.get('ZELDA_USER_HEADER', 'X-Zelda-User')
+DEFAULT_USER = os.environ.get('ZELDA_DEFAULT_USER')
+
+def connect_db():
+    """Open a connection to the app database, or to the requesting user's shard
+    in multi-user mode (statements are timed for /metrics)"""
+    if shard_router is not None:
+        return current_shard().connect()
+    return _connect_db_file()
+
+def _connect_db_file():
+    return sqlite3.connect(DB_FILE, factory=metrics.InstrumentedConnection)
+
+def current_shard():
+    """Shard of the user making the current request (multi-user mode only)"""
+    if not has_request_context():
+        raise RuntimeError('Shard databases can only be used while handling a request')
+    shard = g.get('shard')
+    if shard is None:
+        user = request.headers.get(USER_HEADER) or DEFAULT_USER
+        if not user:
+            abort(401)
+        shard = g.shard = shard_router.get(user)
+        # Pick up writes other worker processes made to this shard
+        shard.state.watcher.check()
+    return shard
+
+# --- LAZY SUBSYSTEMS ---
+# Voice recognition pulls in speech_recognition and friends, so it is only
+# imported when a voice endpoint is first hit (or by the warm-up thread).
+
+_voice_module = None
+_voice_lock = threading.Lock()
+
+def get_voice_assistant():
+    """Import the voice assistant on first use, returning None if it is unavailable"""
+    global _voice_module
+    if _voice_module is None:
+        with _voice_lock:
+            if _voice_module is None:
+                try:
+                    import voice_assistant
+                    _voice_module = voice_assistant
+                except ImportError:
+                    log.warning("Voice assistant module could not be loaded. Please install required dependencies.")
+                    _voice_module = False
+    return _voice_module or None
+
+def warm_up():
+    """Load heavy subsystems in the background so the first request doesn't pay for them"""
+    def _load():
+        get_voice_assistant()
+        if shard_router is None:
+            get_habit_index()
+    threading.Thread(target=_load, name='zelda-warmup', daemon=True).start()
 
 # Database initialization
 def init_db():
     """Initialize the database with required tables"""
-    conn = sqlite3.connect(DB_FILE)
+    conn = _connect_db_file()
+    migrate_schema(conn)
+    conn.commit()
+    conn.close()
+
+def init_shard(conn):
+    """Create or migrate a user shard (runs once per shard per process)"""
+    # journal_mode can't change inside the transaction migrate_schema opens
+    conn.execute('PRAGMA journal_mode=WAL')
+    migrate_schema(conn)
+
+def migrate_schema(conn):
+    """Create missing tables and triggers; safe to run on an up-to-date database"""
     cursor = conn.cursor()
     
     # Create habits table
@@ -54,190 +153,828 @@ def init_db():
             category TEXT DEFAULT 'other',
             due_date TEXT,
             completed BOOLEAN DEFAULT 0,
-            created_at TEXT NOT NULL
+            created_at TEXT NOT NULL,
+            title_key TEXT,
+            completed_at TEXT,
+            recurrence TEXT
         )
     ''')
+    task_columns = {row[1] for row in cursor.execute('PRAGMA table_info(tasks)')}
     
-    conn.commit()
+    # At most one open task per normalized title, so repeated or retried
+    # creates land on the existing task (see upsert_task)
+    if 'title_key' not in task_columns:
+        add_task_title_keys(cursor)
+    cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS tasks_open_title_key ON tasks (title_key) WHERE NOT completed')
+    
+    # When a task was completed decides when it is archived (see archive.py)
+    if 'completed_at' not in task_columns:
+        cursor.execute('ALTER TABLE tasks ADD COLUMN completed_at TEXT')
+    # Recurring tasks keep their rule here; only completed occurrences get rows (see recurrence.py)
+    if 'recurrence' not in task_columns:
+        cursor.execute('ALTER TABLE tasks ADD COLUMN recurrence TEXT')
+    recurrence.create_table(cursor)
+    reminders.create_table(cursor)
+    archive.create_tables(cursor)
+    
+    idempotency.create_table(cursor)
+    conversation.create_tables(cursor)
+    
+    # Data version for client sync: bumped by triggers on every write to the
+    # user's data, so clients can cheaply ask "has anything changed?"
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sync_state (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL
+        )
+    ''')
+    cursor.execute('INSERT OR IGNORE INTO sync_state (id, version) VALUES (1, 0)')
+    for table in ('tasks', 'habits', 'habit_dates', 'task_occurrences'):
+        for event in ('INSERT', 'UPDATE', 'DELETE'):
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS {table}_{event.lower()}_version
+                AFTER {event} ON {table}
+                BEGIN
+                    UPDATE sync_state SET version = version + 1 WHERE id = 1;
+                END
+            ''')
+    
+    create_task_search(cursor)
+
+def task_title_key(title):
+    """Normalized title used to recognize duplicate tasks ("Call mom!" == "call  Mom")"""
+    return normalize_name(title) or None
+
+def add_task_title_keys(cursor):
+    """Add tasks.title_key to an older database, keying existing duplicates only once"""
+    cursor.execute('ALTER TABLE tasks ADD COLUMN title_key TEXT')
+    seen = set()
+    updates = []
+    for task_id, title, completed in cursor.execute('SELECT id, title, completed FROM tasks ORDER BY id').fetchall():
+        key = task_title_key(title)
+        if not completed:
+            if key in seen:
+                # Keep the newer duplicate as it is rather than deleting anyone's data
+                continue
+            seen.add(key)
+        updates.append((key, task_id))
+    cursor.executemany('UPDATE tasks SET title_key = ? WHERE id = ?', updates)
+
+def create_task_search(cursor):
+    """Full-text index over task titles and descriptions, kept in sync by triggers.
+
+    An external-content FTS5 table: it stores only the index and reads the
+    text from tasks. Skipped (search falls back to LIKE) if SQLite was built
+    without FTS5.
+    """
+    exists = cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'tasks_fts'").fetchone()
+    try:
+        cursor.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS tasks_fts USING fts5(
+                title, description,
+                content='tasks', content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+            )
+        ''')
+    except sqlite3.OperationalError as e:
+        log.warning("Task search index unavailable (%s); searching with LIKE", e)
+        return
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS tasks_fts_insert AFTER INSERT ON tasks BEGIN
+            INSERT INTO tasks_fts (rowid, title, description) VALUES (new.id, new.title, new.description);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS tasks_fts_delete AFTER DELETE ON tasks BEGIN
+            INSERT INTO tasks_fts (tasks_fts, rowid, title, description) VALUES ('delete', old.id, old.title, old.description);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS tasks_fts_update AFTER UPDATE OF title, description ON tasks BEGIN
+            INSERT INTO tasks_fts (tasks_fts, rowid, title, description) VALUES ('delete', old.id, old.title, old.description);
+            INSERT INTO tasks_fts (rowid, title, description) VALUES (new.id, new.title, new.description);
+        END
+    ''')
+    if not exists:
+        # Index the tasks that were there before search existed
+        cursor.execute("INSERT INTO tasks_fts (tasks_fts) VALUES ('rebuild')")
+
+def get_data_version(conn=None):
+    """Current data version (changes whenever tasks or habits change)"""
+    own_conn = conn is None
+    if own_conn:
+        conn = connect_db()
+    row = conn.execute('SELECT version FROM sync_state WHERE id = 1').fetchone()
+    if own_conn:
+        conn.close()
+    return row[0] if row else 0
+
+def version_etag(version):
+    return f"v{version}"
+
+_db_initialized = False
+_db_init_lock = threading.Lock()
+
+def ensure_db():
+    """Run schema initialization once per process (on every existing shard in multi-user mode)"""
+    global _db_initialized
+    if not _db_initialized:
+        with _db_init_lock:
+            if not _db_initialized:
+                if shard_router is not None:
+                    shard_router.migrate_all()
+                else:
+                    init_db()
+                _db_initialized = True
+
+def enable_wal():
+    """Use WAL journaling so readers in other worker processes don't block writers"""
+    if shard_router is not None:
+        return    # shards are switched to WAL by init_shard()
+    conn = _connect_db_file()
+    conn.execute('PRAGMA journal_mode=WAL')
     conn.close()
 
-init_db()
+# --- PER-DATABASE STATE ---
+# Dashboard counters, the habit name index and the invalidation watcher all
+# describe one database, so there is one DatabaseState for DB_FILE and, in
+# multi-user mode, one per open shard.
+#
+# Counters behind /api/summary: every task/habit write goes through
+# tracked_write() and reports what it changed, so the summary never has to
+# scan the tables except to rebuild after a missed write.
+#
+# Cross-process invalidation: with several worker processes each one has its
+# own in-memory state. Writes from this process are reported to the watcher;
+# any other change to the data version means another process wrote, and the
+# watcher's callbacks drop or reload what is cached. Checked at most every
+# ZELDA_INVALIDATION_INTERVAL seconds.
+
+INVALIDATION_INTERVAL = float(os.environ.get('ZELDA_INVALIDATION_INTERVAL', '1'))
+
+class DatabaseState:
+    """In-memory state kept for one database (DB_FILE or a user shard)"""
+
+    def __init__(self, connect):
+        self.connect = connect
+        self.summary = DashboardSummary()
+        self.habit_index = None
+        self.habit_index_lock = threading.Lock()
+        self.watcher = DataVersionWatcher(self.read_version, INVALIDATION_INTERVAL)
+        self.watcher.on_change(self.drop_habit_index)
+        self.conversations = ConversationMemory.from_env(connect, summarize_conversation)
+        self.retrieval = RetrievalIndex.from_env(embedder) if embedder is not None else None
+
+    def read_version(self):
+        conn = self.connect()
+        try:
+            return get_data_version(conn)
+        finally:
+            conn.close()
+
+    def drop_habit_index(self):
+        # Reloaded on next use
+        self.habit_index = None
+
+# Embeds tasks and habits so chat prompts get only the relevant ones (see retrieval.py)
+embedder = retrieval.embedder_from_env(OLLAMA_URL)
+
+single_db = DatabaseState(_connect_db_file)
+shard_router = ShardRouter.from_env(init=init_shard, make_state=lambda shard: DatabaseState(shard.connect))
+
+# Create endpoints accept an Idempotency-Key header, so retries replay the
+# first response instead of creating again (see idempotency.py)
+idempotency_store = IdempotencyStore.from_env(connect_db)
+
+def db_state():
+    """State for the database the current request uses"""
+    if shard_router is not None:
+        return current_shard().state
+    return single_db
+
+@bp.before_app_request
+def check_for_foreign_writes():
+    if shard_router is None:
+        single_db.watcher.check()
+    elif request.path.startswith(('/api/', '/ws/')):
+        # Resolve the user up front, so a missing user is a 401 rather than
+        # an error inside a handler
+        current_shard()
+
+@bp.after_app_request
+def vary_by_user(response):
+    # ETags are data versions, which are only unique within one shard
+    if shard_router is not None:
+        response.vary.add(USER_HEADER)
+    return response
+
+@contextmanager
+def tracked_write():
+    """Write transaction that keeps the summary counters in step.
 
-@app.route('/')
+    Yields (conn, changes); append summary deltas to changes. Commits on exit.
+    Inside a request the (before, after) data versions of each write are
+    kept in ``g.data_writes``, so a handler can tell its own writes apart.
+    """
+    state = db_state()
+    conn = connect_db()
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        before = get_data_version(conn)
+        changes = []
+        yield conn, changes
+        after = get_data_version(conn)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    state.watcher.saw(before, after)
+    state.summary.update(before, after, changes)
+    if has_request_context():
+        g.setdefault('data_writes', []).append((before, after))
+
+def get_summary(today=None):
+    """Dashboard totals, rebuilt from SQL only if the counters fell behind"""
+    summary = db_state().summary
+    if summary.version != get_data_version():
+        conn = connect_db()
+        try:
+            summary.rebuild(conn)
+        finally:
+            conn.close()
+    return summary.snapshot(today)
+
+# --- DUE DATE REMINDERS ---
+# Upcoming due tasks are loaded once at startup; the task write paths below keep
+# the scheduler in sync. ZELDA_REMINDERS picks the sink: log (default), desktop or off.
+# In multi-user mode task ids repeat between shards, so reminders are keyed by
+# (shard key, task id).
+# Tasks written by other workers (or imported in bulk) arrive through the
+# task_changes log: a follower thread reads only the changed tasks of each
+# database whose files changed, the single database or every shard.
+
+REMINDER_SINKS = {'log': LogSink, 'desktop': DesktopSink}
+_reminder_scheduler = None
+_reminder_follower = None
+
+def _reminder_databases():
+    if shard_router is None:
+        return [(None, DB_FILE)]
+    return [(key, shard_router.path_for(key)) for key in shard_router.keys()]
+
+def _follower_task_key(key, task_id):
+    return task_id if key is None else (key, task_id)
+
+def start_reminders(sink=None):
+    """Load open tasks with due dates and start firing reminders"""
+    global _reminder_scheduler, _reminder_follower
+    scheduler = ReminderScheduler(sink)
+    follower = ReminderFollower(scheduler, _reminder_databases, _follower_task_key, INVALIDATION_INTERVAL)
+    follower.poll(force=True)
+    scheduler.start()
+    follower.start()
+    _reminder_scheduler, _reminder_follower = scheduler, follower
+    return scheduler
+
+def _reminder_key(task_id):
+    return task_id if shard_router is None else (current_shard().key, task_id)
+
+def schedule_reminder(task_id, title, due_date):
+    if _reminder_scheduler is not None:
+        _reminder_scheduler.schedule(_reminder_key(task_id), title, due_date)
+
+def cancel_reminder(task_id):
+    if _reminder_scheduler is not None:
+        _reminder_scheduler.cancel(_reminder_key(task_id))
+
+# --- ARCHIVAL ---
+# Old completed tasks and habit history are moved to archive tables by a
+# background job (see archive.py), in the same process as the reminders.
+
+_archiver = None
+
+def _database_paths():
+    if shard_router is None:
+        return [DB_FILE]
+    return [shard_router.path_for(key) for key in shard_router.keys()]
+
+def start_archiver():
+    global _archiver
+    _archiver = Archiver(_database_paths)
+    _archiver.start()
+    return _archiver
+
+# --- BACKGROUND JOBS ---
+# Reminders and archiving run in one process. Under a pre-fork server
+# (ZELDA_PREFORK=1, set by gunicorn.conf.py) that is one of the workers, not
+# the master: the master serves no requests, so every write would look
+# foreign to its watcher and reload all reminders. Workers wait on a lock
+# file and the one holding it runs the jobs; when it exits the lock is
+# released and another worker takes over.
+
+PREFORK = os.environ.get('ZELDA_PREFORK') == '1'
+_jobs_lock = None
+
+def start_background_jobs():
+    sink_name = os.environ.get('ZELDA_REMINDERS', 'log')
+    if sink_name in REMINDER_SINKS and _reminder_scheduler is None:
+        start_reminders(REMINDER_SINKS[sink_name]())
+    if _archiver is None:
+        start_archiver()
+
+def _jobs_lock_path():
+    if shard_router is not None:
+        return os.path.join(shard_router.directory, '.zelda-jobs.lock')
+    return os.path.abspath(DB_FILE) + '.jobs.lock'
+
+def _run_background_jobs_when_elected():
+    global _jobs_lock
+    import fcntl
+    lock = open(_jobs_lock_path(), 'a')
+    fcntl.flock(lock, fcntl.LOCK_EX)    # held until this process exits
+    _jobs_lock = lock
+    log.info("Running reminders and archiving in worker %d", os.getpid())
+    start_background_jobs()
+
+def render_page(template_name):
+    """Serve a static page template from the rendered-page cache"""
+    return current_app.extensions['page_cache'].render(template_name)
+
+@bp.route('/')
 def home():
-    return render_template('home.html')
+    return render_page('home.html')
 
-@app.route('/habits')
+@bp.route('/habits')
 def habits():
-    return render_template('habits.html')
+    return render_page('habits.html')
 
-@app.route('/chat')
+@bp.route('/chat')
 def chat():
-    return render_template('chat.html')
+    return render_page('chat.html')
 
-@app.route('/chat-simple')
+@bp.route('/chat-simple')
 def chat_simple():
     """Educational version of the chat interface"""
-    return render_template('chat_simple.html')
+    return render_page('chat_simple.html')
 
-@app.route('/account')
+@bp.route('/account')
 def account():
-    return render_template('account.html')
+    return render_page('account.html')
 
-@app.route('/tasks')
+@bp.route('/tasks')
 def tasks():
     """Modern task management interface"""
-    return render_template('tasks.html')
+    return render_page('tasks.html')
 
 # Task Management API Endpoints
-@app.route('/api/tasks', methods=['GET'])
+@bp.route('/api/tasks', methods=['GET'])
 def get_tasks():
-    """Get all tasks from database"""
+    """Get all tasks from database.
+
+    Tasks completed long ago are archived (see archive.py) and only included
+    when asked for: ``?archived=all``, or ``?archived=YYYY-MM-DD`` for those
+    completed since that day.
+    """
+    archived = request.args.get('archived')
+    if archived and archived != 'all' and not is_iso_date(archived):
+        return jsonify({'success': False, 'error': 'archived must be "all" or a YYYY-MM-DD date'}), 400
     try:
-        conn = sqlite3.connect(DB_FILE)
+        conn = connect_db()
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
         
+        # Clients revalidate with the data version; skip the scan if nothing changed
+        version = get_data_version(conn)
+        if request.if_none_match.contains(version_etag(version)):
+            conn.close()
+            return '', 304, {'ETag': f'"{version_etag(version)}"'}
+        
         cursor.execute('''
             SELECT * FROM tasks ORDER BY 
             CASE priority WHEN 'high' THEN 1 WHEN 'medium' THEN 2 ELSE 3 END,
             created_at DESC
         ''')
         
-        tasks = []
-        for row in cursor.fetchall():
-            tasks.append({
-                'id': row['id'],
-                'title': row['title'],
-                'description': row['description'],
-                'priority': row['priority'],
-                'category': row['category'],
-                'dueDate': row['due_date'],
-                'completed': bool(row['completed']),
-                'createdAt': row['created_at']
-            })
+        tasks = [task_to_json(row) for row in cursor.fetchall()]
+        if archived:
+            rows = archive.archived_tasks(conn, None if archived == 'all' else archived)
+            tasks.extend(dict(task_to_json(row), archived=True) for row in rows)
         
         conn.close()
-        return jsonify({'success': True, 'tasks': tasks})
+        response = jsonify({'success': True, 'tasks': tasks, 'version': version})
+        response.set_etag(version_etag(version))
+        return response
         
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
-@app.route('/api/tasks', methods=['POST'])
+PRIORITY_ORDER = {'high': 1, 'medium': 2, 'low': 3}
+MAX_OCCURRENCE_WINDOW_DAYS = 366
+
+def is_iso_date(value):
+    from datetime import date
+    try:
+        date.fromisoformat(value)
+        return len(value) == 10
+    except ValueError:
+        return False
+
+def task_to_json(row):
+    """API representation of a tasks row (fetched with sqlite3.Row)"""
+    return {
+        'id': row['id'],
+        'title': row['title'],
+        'description': row['description'],
+        'priority': row['priority'],
+        'category': row['category'],
+        'dueDate': row['due_date'],
+        'completed': bool(row['completed']),
+        'createdAt': row['created_at'],
+        'recurrence': row['recurrence']
+    }
+
+@bp.route('/api/tasks/occurrences')
+def task_occurrences_api():
+    """Occurrences of recurring tasks from ?start= to ?end= (YYYY-MM-DD, default the next 7 days)"""
+    from datetime import date, timedelta
+    start = request.args.get('start') or date.today().isoformat()
+    if not is_iso_date(start):
+        return jsonify({'success': False, 'error': 'start must be a YYYY-MM-DD date'}), 400
+    start = date.fromisoformat(start)
+    end = request.args.get('end') or (start + timedelta(days=6)).isoformat()
+    if not is_iso_date(end):
+        return jsonify({'success': False, 'error': 'end must be a YYYY-MM-DD date'}), 400
+    end = date.fromisoformat(end)
+    if not timedelta(0) <= end - start <= timedelta(days=MAX_OCCURRENCE_WINDOW_DAYS):
+        return jsonify({'success': False, 'error': f'end must be 0-{MAX_OCCURRENCE_WINDOW_DAYS} days after start'}), 400
+    
+    conn = connect_db()
+    conn.row_factory = sqlite3.Row
+    try:
+        version = get_data_version(conn)
+        etag = f"{version_etag(version)}-{start}-{end}"
+        if request.if_none_match.contains(etag):
+            return '', 304, {'ETag': f'"{etag}"'}
+        done = {(task_id, day) for task_id, day in conn.execute(
+            'SELECT task_id, date FROM task_occurrences WHERE date BETWEEN ? AND ?', (start.isoformat(), end.isoformat()))}
+        occurrences = []
+        with stage('expand_occurrences'):
+            for row in conn.execute('SELECT * FROM tasks WHERE recurrence IS NOT NULL AND NOT completed'):
+                try:
+                    rule = recurrence.parse(row['recurrence'])
+                except ValueError:
+                    log.warning("Task %s has an invalid recurrence %r", row['id'], row['recurrence'])
+                    continue
+                task = task_to_json(row)
+                for day in recurrence.occurrences(rule, start, end):
+                    day = day.isoformat()
+                    occurrences.append(dict(task, date=day, completed=(row['id'], day) in done))
+    finally:
+        conn.close()
+    occurrences.sort(key=lambda o: (o['date'], PRIORITY_ORDER.get(o['priority'], 3)))
+    response = jsonify({'success': True, 'occurrences': occurrences, 'version': version})
+    response.set_etag(etag)
+    return response
+
+@bp.route('/api/tasks/<int:task_id>/occurrences/<day>/complete', methods=['PUT'])
+def complete_occurrence(task_id, day):
+    """Mark one occurrence of a recurring task as done"""
+    if not is_iso_date(day):
+        return jsonify({'success': False, 'error': 'date must be YYYY-MM-DD'}), 400
+    try:
+        completed = complete_task_in_db(task_id, occurrence=day)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    return jsonify({'success': completed is not None, 'date': completed})
+
+@bp.route('/api/tasks/<int:task_id>/occurrences/<day>/complete', methods=['DELETE'])
+def reopen_occurrence(task_id, day):
+    """Undo completing one occurrence"""
+    if not is_iso_date(day):
+        return jsonify({'success': False, 'error': 'date must be YYYY-MM-DD'}), 400
+    with tracked_write() as (conn, changes):
+        conn.execute('DELETE FROM task_occurrences WHERE task_id = ? AND date = ?', (task_id, day))
+    return jsonify({'success': True})
+
+@bp.route('/api/tasks/search')
+def search_tasks_api():
+    """Ranked prefix search over task titles and descriptions"""
+    query = request.args.get('q', '').strip()
+    limit = min(max(request.args.get('limit', 20, type=int), 1), 100)
+    open_only = request.args.get('open') in ('1', 'true')
+    if not query:
+        return jsonify({'success': True, 'tasks': []})
+    try:
+        tasks = search_tasks(query, limit=limit, open_only=open_only)
+        return jsonify({'success': True, 'tasks': tasks})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@bp.route('/api/tasks', methods=['POST'])
+@idempotent(idempotency_store)
 def create_task():
-    """Create a new task"""
+    """Create a new task, or give the open task that already has this title
+    the new priority and due date"""
     try:
         data = request.get_json()
+        task_id, created = upsert_task(data, update=True)
+        return jsonify({'success': True, 'task_id': task_id, 'created': created})
         
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT INTO tasks (title, description, priority, category, due_date, completed, created_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            data['title'],
-            data.get('description', ''),
-            data.get('priority', 'medium'),
-            data.get('category', 'other'),
-            data.get('dueDate'),
-            False,
-            data['createdAt']
-        ))
-        
-        conn.commit()
-        task_id = cursor.lastrowid
-        conn.close()
-        
-        return jsonify({'success': True, 'task_id': task_id})
-        
+    except ValueError as e:
+        # An unparseable recurrence rule
+        return jsonify({'success': False, 'error': str(e)}), 400
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
-@app.route('/api/tasks/<int:task_id>/complete', methods=['PUT'])
+@bp.route('/api/tasks/<int:task_id>/complete', methods=['PUT'])
 def complete_task(task_id):
     """Mark a task as completed"""
     try:
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
-        
-        cursor.execute('UPDATE tasks SET completed = 1 WHERE id = ?', (task_id,))
-        conn.commit()
-        conn.close()
-        
+        complete_task_in_db(task_id)
         return jsonify({'success': True})
         
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
-@app.route('/api/tasks/<int:task_id>', methods=['DELETE'])
+@bp.route('/api/tasks/<int:task_id>', methods=['DELETE'])
 def delete_task(task_id):
     """Delete a task"""
     try:
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
-        
-        cursor.execute('DELETE FROM tasks WHERE id = ?', (task_id,))
-        conn.commit()
-        conn.close()
-        
+        delete_task_from_db(task_id)
         return jsonify({'success': True})
         
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
-@app.route('/api/motivation')
+@bp.route('/api/motivation')
 def get_motivation():
     message = get_motivation_message()
     return jsonify({'motivation': message})
 
+@bp.route('/api/summary')
+def summary_api():
+    """Counts for the dashboards, instead of the full task and habit lists"""
+    from datetime import date
+    today = date.today()
+    # Totals change with the data and with the day (overdue, checked today)
+    etag = f"{version_etag(get_data_version())}-{today.isoformat()}"
+    if request.if_none_match.contains(etag):
+        return '', 304, {'ETag': f'"{etag}"'}
+    response = jsonify(get_summary(today))
+    response.set_etag(etag)
+    return response
+
 # --- HABIT TRACKER MULTI-HABIT SUPPORT ---
 # habits.json structure:
 # {
 #   "Habit Name": {"dates": {"YYYY-MM-DD": true, ...}, "color": "#hex"},
 #   ...
 # }
+# Old files can be loaded with POST /api/import?format=legacy (see transfer.py).
 
 def create_task_in_db(task_data):
-    """Helper function to create a task in the database (used by voice assistant)"""
+    """Helper function to create a task in the database (used by voice assistant).
+
+    Returns the task id (an existing open task's if one has the same title),
+    or False on failure.
+    """
     try:
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT INTO tasks (title, description, priority, category, due_date, completed, created_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
+        return upsert_task(task_data)[0]
+    except Exception as e:
+        log.exception("Error creating task")
+        return False
+
+def upsert_task(task_data, update=False):
+    """Insert a task unless an open task with the same normalized title exists.
+
+    With ``update`` (a create the user made on purpose) the existing task
+    takes the priority and due date (or recurrence) of the new one instead of
+    keeping its own. Returns (task_id, created).
+    """
+    from datetime import date
+    priority = task_data.get('priority', 'medium')
+    category = task_data.get('category', 'other')
+    title_key = task_title_key(task_data['title'])
+    due_date = task_data.get('dueDate')
+    rule = task_data.get('recurrence')
+    if rule:
+        # A recurring task starts on its due date; each occurrence then has its own
+        start = date.fromisoformat(due_date[:10]) if due_date else None
+        rule = recurrence.format_rule(recurrence.parse(rule, default_start=start))
+        due_date = None
+    title = task_data['title']
+    updated = False
+    with stage('db_write'), tracked_write() as (conn, changes):
+        cursor = conn.execute('''
+            INSERT INTO tasks (title, description, priority, category, due_date, completed, created_at, title_key,
+                               recurrence)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (title_key) WHERE NOT completed DO NOTHING
         ''', (
             task_data['title'],
             task_data.get('description', ''),
-            task_data.get('priority', 'medium'),
-            task_data.get('category', 'other'),
-            task_data.get('dueDate'),
+            priority,
+            category,
+            due_date,
             False,
-            task_data['createdAt']
+            task_data['createdAt'],
+            title_key,
+            rule or None
         ))
-        
-        conn.commit()
+        created = cursor.rowcount > 0
+        if created:
+            task_id = cursor.lastrowid
+            changes.append(('task', 1, False, priority, category, due_date))
+        else:
+            task_id, title, *row = conn.execute('''
+                SELECT id, title, completed, priority, category, due_date, recurrence
+                FROM tasks WHERE title_key = ? AND NOT completed
+            ''', (title_key,)).fetchone()
+            old_priority, old_due_date, old_rule = row[1], row[3], row[4]
+            if 'priority' not in task_data:
+                priority = old_priority
+            if 'dueDate' not in task_data and 'recurrence' not in task_data:
+                due_date, rule = old_due_date, old_rule
+            if update and (priority, due_date, rule or None) != (old_priority, old_due_date, old_rule):
+                conn.execute('UPDATE tasks SET priority = ?, due_date = ?, recurrence = ? WHERE id = ?',
+                             (priority, due_date, rule or None, task_id))
+                changes.append(('task', -1, *row[:4]))
+                changes.append(('task', 1, False, priority, row[2], due_date))
+                updated = True
+    if created or updated:
+        schedule_reminder(task_id, title, due_date)
+    return task_id, created
+
+def create_task_via_voice(title, due_date=None, rule=None):
+    """Create a task from a voice command, optionally with a due date (the
+    first occurrence, for a task with a recurrence rule)"""
+    from datetime import datetime
+    return create_task_in_db({
+        'title': title,
+        'description': 'Created via voice command',
+        'priority': 'medium',
+        'category': 'other',
+        'dueDate': due_date,
+        'recurrence': rule,
+        'createdAt': datetime.now().isoformat()
+    })
+
+# --- TASK SEARCH ---
+# Backed by the tasks_fts index (see create_task_search). Every word of the
+# query is matched as a prefix, so "buy gro" finds "Buy groceries"; results are
+# ranked by bm25 with title matches weighted above description matches.
+
+def fts_query(text, match_all=True):
+    """FTS5 MATCH expression for free text (quoted, so user input can't inject syntax)"""
+    words = re.findall(r'\w+', text.lower())
+    return (' ' if match_all else ' OR ').join(f'"{word}"*' for word in words)
+
+def search_tasks(text, limit=20, open_only=False, match_all=True):
+    """Tasks matching text, best first"""
+    match = fts_query(text, match_all)
+    if not match:
+        return []
+    conn = connect_db()
+    conn.row_factory = sqlite3.Row
+    try:
+        with stage('task_search'):
+            try:
+                rows = conn.execute(f'''
+                    SELECT tasks.* FROM tasks_fts JOIN tasks ON tasks.id = tasks_fts.rowid
+                    WHERE tasks_fts MATCH ? {'AND NOT tasks.completed' if open_only else ''}
+                    ORDER BY bm25(tasks_fts, 10.0, 1.0) LIMIT ?
+                ''', (match, limit)).fetchall()
+            except sqlite3.OperationalError:
+                # No FTS5: substring match on the title, most recent first
+                words = re.findall(r'\w+', text.lower())
+                joiner = ' AND ' if match_all else ' OR '
+                rows = conn.execute(f'''
+                    SELECT * FROM tasks WHERE ({joiner.join("lower(title) LIKE ?" for _ in words)})
+                    {'AND NOT completed' if open_only else ''}
+                    ORDER BY created_at DESC LIMIT ?
+                ''', [f'%{word}%' for word in words] + [limit]).fetchall()
+        return [task_to_json(row) for row in rows]
+    finally:
         conn.close()
-        return True
-        
-    except Exception as e:
-        print(f"Error creating task: {e}")
-        return False
 
-def get_habits_from_db():
-    conn = sqlite3.connect(DB_FILE)
+# Words that say nothing about which task is meant
+MATCH_FILLER = frozenset(('a', 'an', 'and', 'at', 'for', 'i', 'in', 'it', 'my', 'of', 'on', 'please',
+                          'the', 'to', 'today', 'with'))
+FALLBACK_CANDIDATES = 5
+
+def _content_words(text):
+    return [word for word in re.findall(r'\w+', text.lower()) if word not in MATCH_FILLER]
+
+def _covers(spoken, title):
+    """(share of the spoken words found in title, every title word was spoken), prefix matched like the index"""
+    spoken_words = _content_words(spoken)
+    title_words = _content_words(title)
+    if not spoken_words or not title_words:
+        return 0.0, False
+    matched = sum(any(word.startswith(s) for word in title_words) for s in spoken_words)
+    complete = all(any(word.startswith(s) for s in spoken_words) for word in title_words)
+    return matched / len(spoken_words), complete
+
+def match_task(spoken_title, open_only=True):
+    """(task, confident) for a spoken or typed title; (None, False) if nothing is close.
+
+    Every spoken word matching is confident, so dropped words are fine. When
+    speech added words, a task still counts if every word of its title was
+    said and at least half of what was said is in the title; a task sharing
+    less is only a suggestion, never something to complete unasked.
+    """
+    matches = search_tasks(' '.join(_content_words(spoken_title)), limit=1, open_only=open_only)
+    if matches:
+        return matches[0], True
+    candidates = search_tasks(spoken_title, limit=FALLBACK_CANDIDATES, open_only=open_only, match_all=False)
+    for task in candidates:
+        share, complete = _covers(spoken_title, task['title'])
+        if complete and share >= 0.5:
+            return task, True
+    return (candidates[0], False) if candidates else (None, False)
+
+def find_task(spoken_title, open_only=True):
+    """Resolve a spoken or typed task title to the task it confidently names, or None"""
+    task, confident = match_task(spoken_title, open_only)
+    return task if confident else None
+
+def _summary_row(conn, task_id):
+    """(completed, priority, category, due_date) of a task, or None"""
+    return conn.execute(
+        'SELECT completed, priority, category, due_date FROM tasks WHERE id = ?', (task_id,)
+    ).fetchone()
+
+def complete_task_in_db(task_id, occurrence=None):
+    """Complete a task. A recurring task stays open: one occurrence is marked
+    done instead (``occurrence``, else the latest one due by today), and its
+    date is returned."""
+    from datetime import date, datetime
+    now = datetime.now()
+    completed = None
+    with tracked_write() as (conn, changes):
+        row = _summary_row(conn, task_id)
+        rule = conn.execute('SELECT recurrence FROM tasks WHERE id = ?', (task_id,)).fetchone()
+        if rule and rule[0]:
+            rule = recurrence.parse(rule[0])
+            if occurrence is not None:
+                if not recurrence.is_occurrence(rule, date.fromisoformat(occurrence)):
+                    raise ValueError(f'{occurrence} is not an occurrence of this task')
+                day = date.fromisoformat(occurrence)
+            else:
+                today = now.date()
+                day = recurrence.latest_occurrence(rule, today) or next(recurrence.occurrences(rule, today), None)
+            if day is not None:
+                conn.execute('INSERT OR IGNORE INTO task_occurrences (task_id, date, completed_at) VALUES (?, ?, ?)',
+                             (task_id, day.isoformat(), now.isoformat()))
+                completed = day.isoformat()
+        elif occurrence is not None:
+            raise ValueError('not a recurring task')
+        elif row and not row[0]:
+            conn.execute('UPDATE tasks SET completed = 1, completed_at = ? WHERE id = ?',
+                         (now.isoformat(), task_id))
+            changes.append(('task', -1, *row))
+            changes.append(('task', 1, True, *row[1:]))
+    cancel_reminder(task_id)
+    return completed
+
+def delete_task_from_db(task_id):
+    with tracked_write() as (conn, changes):
+        row = _summary_row(conn, task_id)
+        conn.execute('DELETE FROM task_occurrences WHERE task_id = ?', (task_id,))
+        if row:
+            conn.execute('DELETE FROM tasks WHERE id = ?', (task_id,))
+            changes.append(('task', -1, *row))
+        else:
+            # Archived tasks still count in the summary totals
+            row = conn.execute(
+                'SELECT completed, priority, category, due_date FROM tasks_archive WHERE id = ?', (task_id,)
+            ).fetchone()
+            if row:
+                conn.execute('DELETE FROM tasks_archive WHERE id = ?', (task_id,))
+                # The archive has no version trigger; make sure clients still see a change
+                conn.execute('UPDATE sync_state SET version = version + 1 WHERE id = 1')
+                changes.append(('task', -1, *row))
+    cancel_reminder(task_id)
+
+def get_habits_from_db(since=None):
+    """Habits with their check history. Archived years are only read when
+    ``since`` (YYYY-MM-DD) reaches back into them."""
+    conn = connect_db()
     c = conn.cursor()
     
     # Try the new schema first, fallback to old schema
     try:
         c.execute('SELECT id, name, color FROM habits')
         rows = c.fetchall()
+        archived = archive.archived_habit_dates(conn, since) if since else {}
         
         habits = {}
         for habit_id, name, color in rows:
+            dates = dict.fromkeys(archived.get(habit_id, ()), True)
             c.execute('SELECT date, checked FROM habit_dates WHERE habit_id=?', (habit_id,))
-            dates = {row[0]: bool(row[1]) for row in c.fetchall()}
+            dates.update((row[0], bool(row[1])) for row in c.fetchall())
             habits[name] = {'dates': dates, 'color': color or '#2ecc40'}
     except sqlite3.OperationalError:
         # Fallback to old schema or create empty structure
@@ -246,68 +983,140 @@ def get_habits_from_db():
     conn.close()
     return habits
 
+# Habit names are indexed in memory (one index per database, see DatabaseState)
+# so voice/chat commands can fuzzy match them without loading habit_dates. The
+# index is filled once and then kept in sync by the habit write helpers below.
+
+def get_habit_index():
+    """Return the habit name index, loading it from the database on first use"""
+    state = db_state()
+    if state.habit_index is None:
+        with state.habit_index_lock:
+            if state.habit_index is None:
+                index = HabitNameIndex()
+                conn = connect_db()
+                try:
+                    for (name,) in conn.execute('SELECT name FROM habits'):
+                        index.add(name)
+                except sqlite3.OperationalError:
+                    pass
+                conn.close()
+                state.habit_index = index
+    return state.habit_index
+
+def find_habit(spoken_name):
+    """Resolve a spoken or typed habit name to the best matching habit"""
+    return get_habit_index().best_match(spoken_name)
+
 def save_habit_date(habit_name, date):
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    c.execute('SELECT id FROM habits WHERE name=?', (habit_name,))
-    row = c.fetchone()
-    if not row:
-        c.execute('INSERT INTO habits (name) VALUES (?)', (habit_name,))
-        habit_id = c.lastrowid
-    else:
-        habit_id = row[0]
-    c.execute('SELECT checked FROM habit_dates WHERE habit_id=? AND date=?', (habit_id, date))
-    row = c.fetchone()
-    if row:
-        new_checked = 0 if row[0] else 1
-        c.execute('UPDATE habit_dates SET checked=? WHERE habit_id=? AND date=?', (new_checked, habit_id, date))
-    else:
-        new_checked = 1
-        c.execute('INSERT INTO habit_dates (habit_id, date, checked) VALUES (?, ?, ?)', (habit_id, date, new_checked))
-    conn.commit()
-    conn.close()
+    with stage('db_write'), tracked_write() as (conn, changes):
+        c = conn.cursor()
+        c.execute('SELECT id FROM habits WHERE name=?', (habit_name,))
+        row = c.fetchone()
+        created = not row
+        if created:
+            c.execute('INSERT INTO habits (name) VALUES (?)', (habit_name,))
+            habit_id = c.lastrowid
+            changes.append(('habit', 1))
+        else:
+            habit_id = row[0]
+        c.execute('SELECT checked FROM habit_dates WHERE habit_id=? AND date=?', (habit_id, date))
+        row = c.fetchone()
+        if row:
+            new_checked = 0 if row[0] else 1
+            c.execute('UPDATE habit_dates SET checked=? WHERE habit_id=? AND date=?', (new_checked, habit_id, date))
+        else:
+            new_checked = 1
+            c.execute('INSERT INTO habit_dates (habit_id, date, checked) VALUES (?, ?, ?)', (habit_id, date, new_checked))
+        changes.append(('check', date, 1 if new_checked else -1))
+    if created:
+        get_habit_index().add(habit_name)
+
+def set_habit_date(habit_name, date, checked):
+    """Set (rather than toggle) a habit's state for a date; safe to replay"""
+    with stage('db_write'), tracked_write() as (conn, changes):
+        c = conn.cursor()
+        c.execute('INSERT OR IGNORE INTO habits (name) VALUES (?)', (habit_name,))
+        created = c.rowcount > 0
+        if created:
+            changes.append(('habit', 1))
+        c.execute('SELECT id FROM habits WHERE name=?', (habit_name,))
+        habit_id = c.fetchone()[0]
+        c.execute('SELECT checked FROM habit_dates WHERE habit_id=? AND date=?', (habit_id, date))
+        row = c.fetchone()
+        was_checked = bool(row and row[0])
+        c.execute('''
+            INSERT INTO habit_dates (habit_id, date, checked) VALUES (?, ?, ?)
+            ON CONFLICT (habit_id, date) DO UPDATE SET checked = excluded.checked
+        ''', (habit_id, date, 1 if checked else 0))
+        if bool(checked) != was_checked:
+            changes.append(('check', date, 1 if checked else -1))
+    if created:
+        get_habit_index().add(habit_name)
 
 def add_habit_to_db(habit_name):
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    c.execute('INSERT OR IGNORE INTO habits (name) VALUES (?)', (habit_name,))
-    conn.commit()
-    conn.close()
+    """Add a habit unless one with the same normalized name exists. Returns the habit's name."""
+    existing = get_habit_index().equivalent(habit_name)
+    if existing is not None:
+        return existing
+    with stage('db_write'), tracked_write() as (conn, changes):
+        c = conn.execute('INSERT OR IGNORE INTO habits (name) VALUES (?)', (habit_name,))
+        if c.rowcount > 0:
+            changes.append(('habit', 1))
+    get_habit_index().add(habit_name)
+    return habit_name
 
 def update_habit_color_in_db(habit_name, color):
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    c.execute('UPDATE habits SET color=? WHERE name=?', (color, habit_name))
-    conn.commit()
-    conn.close()
+    with tracked_write() as (conn, changes):
+        conn.execute('UPDATE habits SET color=? WHERE name=?', (color, habit_name))
 
 def rename_habit_in_db(old_name, new_name):
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    c.execute('UPDATE habits SET name=? WHERE name=?', (new_name, old_name))
-    conn.commit()
-    conn.close()
+    with tracked_write() as (conn, changes):
+        c = conn.execute('UPDATE habits SET name=? WHERE name=?', (new_name, old_name))
+        renamed = c.rowcount > 0
+    if renamed:
+        get_habit_index().rename(old_name, new_name)
 
 def delete_habit_from_db(habit_name):
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    c.execute('DELETE FROM habits WHERE name=?', (habit_name,))
-    conn.commit()
-    conn.close()
+    with tracked_write() as (conn, changes):
+        c = conn.cursor()
+        c.execute('SELECT id FROM habits WHERE name=?', (habit_name,))
+        row = c.fetchone()
+        if row:
+            # Drop the habit's history too, so a later habit can't inherit it
+            c.execute('SELECT date FROM habit_dates WHERE habit_id=? AND checked', (row[0],))
+            changes.extend(('check', date, -1) for (date,) in c.fetchall())
+            c.execute('DELETE FROM habit_dates WHERE habit_id=?', (row[0],))
+            c.execute('DELETE FROM habit_history_archive WHERE habit_id=?', (row[0],))
+            c.execute('DELETE FROM habits WHERE id=?', (row[0],))
+            changes.append(('habit', -1))
+    get_habit_index().remove(habit_name)
 
 # --- HABIT TRACKING API ENDPOINTS ---
 
-@app.route('/api/habits', methods=['GET', 'POST'])
+@bp.route('/api/habits', methods=['GET', 'POST'])
 def habits_api():
     if request.method == 'POST':
         habit_name = request.json.get('habit')
         date = request.json.get('date')
         if habit_name and date:
             save_habit_date(habit_name, date)
-    habits = get_habits_from_db()
-    return jsonify({'habits': habits})
+    
+    # Read the version before the data so a concurrent write can only make it look older
+    version = get_data_version()
+    if request.method == 'GET' and request.if_none_match.contains(version_etag(version)):
+        return '', 304, {'ETag': f'"{version_etag(version)}"'}
+    # ?since=YYYY-MM-DD also returns archived history back to that day
+    since = request.args.get('since')
+    if since and not is_iso_date(since):
+        return jsonify({'error': 'since must be a YYYY-MM-DD date'}), 400
+    habits = get_habits_from_db(since)
+    response = jsonify({'habits': habits, 'version': version})
+    response.set_etag(version_etag(version))
+    return response
 
-@app.route('/api/habits/new', methods=['POST'])
+@bp.route('/api/habits/new', methods=['POST'])
+@idempotent(idempotency_store)
 def add_habit():
     habit_name = request.json.get('habit')
     if habit_name:
@@ -315,7 +1124,7 @@ def add_habit():
     habits = get_habits_from_db()
     return jsonify({'habits': habits})
 
-@app.route('/api/habits/color', methods=['POST'])
+@bp.route('/api/habits/color', methods=['POST'])
 def update_habit_color():
     habit_name = request.json.get('habit')
     color = request.json.get('color')
@@ -324,7 +1133,7 @@ def update_habit_color():
     habits = get_habits_from_db()
     return jsonify({'habits': habits})
 
-@app.route('/api/habits/rename', methods=['POST'])
+@bp.route('/api/habits/rename', methods=['POST'])
 def rename_habit():
     old = request.json.get('old')
     new = request.json.get('new')
@@ -333,7 +1142,7 @@ def rename_habit():
     habits = get_habits_from_db()
     return jsonify({'habits': habits})
 
-@app.route('/api/habits/delete', methods=['POST'])
+@bp.route('/api/habits/delete', methods=['POST'])
 def delete_habit():
     habit = request.json.get('habit')
     if habit:
@@ -341,14 +1150,160 @@ def delete_habit():
     habits = get_habits_from_db()
     return jsonify({'habits': habits})
 
-@app.route('/api/chat', methods=['POST'])
+# --- CLIENT SYNC ---
+# The browser keeps tasks and habits in IndexedDB (static/datastore.js), applies
+# changes optimistically and sends queued mutations here in batches.
+
+def apply_mutation(mutation, client_ids):
+    """Apply one queued client mutation. client_ids maps temporary task ids to real ones."""
+    kind = mutation.get('type')
+    if kind == 'task.create':
+        task = mutation['task']
+        task_id = create_task_in_db(task)
+        if not task_id:
+            raise ValueError('could not create task')
+        client_ids[task.get('clientId')] = task_id
+        return {'taskId': task_id}
+    if kind in ('task.complete', 'task.delete'):
+        task_id = mutation['taskId']
+        task_id = client_ids.get(task_id, task_id)
+        if kind == 'task.complete':
+            complete_task_in_db(int(task_id))
+        else:
+            delete_task_from_db(int(task_id))
+        return {}
+    if kind == 'habit.set':
+        set_habit_date(mutation['habit'], mutation['date'], mutation['checked'])
+        return {}
+    if kind == 'habit.create':
+        add_habit_to_db(mutation['habit'])
+        return {}
+    if kind == 'habit.color':
+        update_habit_color_in_db(mutation['habit'], mutation['color'])
+        return {}
+    if kind == 'habit.rename':
+        rename_habit_in_db(mutation['old'], mutation['new'])
+        return {}
+    if kind == 'habit.delete':
+        delete_habit_from_db(mutation['habit'])
+        return {}
+    raise ValueError(f"unknown mutation type: {kind}")
+
+@bp.route('/api/sync', methods=['POST'])
+@idempotent(idempotency_store)
+def sync_api():
+    """Apply a batch of client mutations in order.
+
+    The client sends the data version it last saw as ``since``. If anything
+    but this batch's own writes moved the version on (before, between or
+    after them), ``stale`` tells the client to refetch; otherwise it can keep
+    its optimistic state and adopt ``version``.
+    """
+    data = request.get_json() or {}
+    g.data_writes = []
+    client_ids = {}
+    results = []
+    for mutation in data.get('mutations', []):
+        try:
+            results.append({'id': mutation.get('id'), 'ok': True, **apply_mutation(mutation, client_ids)})
+        except Exception as e:
+            results.append({'id': mutation.get('id'), 'ok': False, 'error': str(e)})
+    # Our writes must chain from ``since`` to the current version
+    expected = data.get('since')
+    stale = False
+    for before, after in g.data_writes:
+        stale = stale or before != expected
+        expected = after
+    version = get_data_version()
+    return jsonify({
+        'results': results,
+        'version': version,
+        'stale': stale or version != expected
+    })
+
+# --- BULK EXPORT / IMPORT ---
+# Streamed both ways so neither side holds the whole dataset (see transfer.py).
+
+@bp.route('/api/export')
+def export_api():
+    """Stream tasks and habits as NDJSON (default) or as CSV of one ``kind``"""
+    fmt = request.args.get('format', 'ndjson')
+    archived = request.args.get('archived', '1') != '0'
+    if fmt == 'csv':
+        kind = request.args.get('kind', 'tasks')
+        if kind not in transfer.CSV_COLUMNS:
+            return jsonify({'error': f'kind must be one of {", ".join(transfer.CSV_COLUMNS)}'}), 400
+        kinds, mimetype, extension = (kind,), 'text/csv', f'{kind}.csv'
+    elif fmt == 'ndjson':
+        kinds, mimetype, extension = ('habits', 'checks', 'tasks'), 'application/x-ndjson', 'ndjson'
+    else:
+        return jsonify({'error': 'format must be ndjson or csv'}), 400
+    
+    def generate():
+        conn = connect_db()
+        try:
+            records = transfer.export_records(conn, kinds, archived)
+            chunks = transfer.csv_chunks(records, kinds[0]) if fmt == 'csv' else transfer.ndjson_chunks(records)
+            yield from chunks
+        finally:
+            conn.close()
+    
+    from datetime import date
+    return Response(stream_with_context(generate()), mimetype=mimetype, headers={
+        'Content-Disposition': f'attachment; filename="zelda-{date.today().isoformat()}.{extension}"',
+        'Cache-Control': 'no-store'
+    })
+
+@bp.route('/api/import', methods=['POST'])
+# Fingerprinted by its headers: hashing the body would read all of it before
+# the streaming reader gets to (and leave that reader nothing to import)
+@idempotent(idempotency_store, fingerprint=idempotency.streamed_request_fingerprint)
+def import_api():
+    """Import an export (or a legacy habits.json), streamed from the request body or an uploaded file"""
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in transfer.READERS:
+        return jsonify({'success': False, 'error': f'format must be one of {", ".join(transfer.READERS)}'}), 400
+    upload = request.files.get('file')
+    stream = upload.stream if upload is not None else request.stream
+    
+    conn = connect_db()
+    importer = transfer.Importer(conn, task_title_key)
+    try:
+        with stage('import'):
+            result = importer.run(transfer.READERS[fmt](stream))
+        status = 200
+    except ValueError as e:
+        # Malformed legacy JSON: rows before the error are already imported
+        importer.flush()
+        result = {'imported': importer.counts, 'errors': importer.errors + [{'error': str(e)}]}
+        status = 400
+    finally:
+        conn.close()
+        # Bulk writes bypass tracked_write: summary counters notice the new
+        # data version and reminders the task change log on their own, the
+        # habit index doesn't
+        db_state().drop_habit_index()
+    log.info("Imported %s", result['imported'], extra={'format': fmt})
+    return jsonify({'success': status == 200, **result}), status
+
+CHAT_SESSION_PATTERN = re.compile(r'[A-Za-z0-9_-]{1,64}')
+
+@bp.route('/api/chat', methods=['POST'])
 def chat_api():
     user_message = request.json.get('message', '')
+    # Each browser sends its own session id, so conversations don't mix
+    session = request.json.get('session')
+    if not isinstance(session, str) or not CHAT_SESSION_PATTERN.fullmatch(session):
+        session = 'default'
     
     # Proactively detect and create habits/tasks from user messages
     detected_actions = detect_and_create_items(user_message)
     
-    reply = get_ai_reply(user_message)
+    # The most relevant tasks and habits, then earlier turns and the rolling
+    # summary, each within a fixed budget
+    memory = db_state().conversations
+    context = '\n\n'.join(filter(None, (relevant_items(user_message), memory.context(session))))
+    reply = get_ai_reply(user_message, context)
     
     # If we detected and created something, modify the reply to acknowledge it
     if detected_actions:
@@ -358,16 +1313,36 @@ def chat_api():
         if detected_actions.get('tasks'):
             task_names = ", ".join(detected_actions['tasks'])
             reply = f"Great! I've created the task '{task_names}' for you. {reply}"
+        if detected_actions.get('completed'):
+            task_names = ", ".join(detected_actions['completed'])
+            reply = f"Nice work! I've marked '{task_names}' as complete. {reply}"
     
+    memory.record(session, user_message, reply)
     return jsonify({'reply': reply})
 
+def relevant_items(message):
+    """Prompt context listing the tasks and habits most similar to a chat message"""
+    index = db_state().retrieval
+    if index is None:
+        return ''
+    try:
+        conn = connect_db()
+        try:
+            index.refresh(conn, get_data_version(conn))
+        finally:
+            conn.close()
+        return retrieval.format_context(index.search(message))
+    except Exception as e:
+        # An unreachable embedding model shouldn't stop the chat; retried next message
+        log.warning("Task and habit retrieval failed: %s", e)
+        return ''
+
 def detect_and_create_items(message):
-    """Detect habit and task creation from user messages and create them automatically"""
-    import re
+    """Detect habit and task creation (and task completion) from user messages and apply them"""
     from datetime import datetime
     
     message_lower = message.lower()
-    created_items = {'habits': [], 'tasks': []}
+    created_items = {'habits': [], 'tasks': [], 'completed': []}
     
     # Habit detection patterns
     habit_patterns = [
@@ -387,22 +1362,43 @@ def detect_and_create_items(message):
         r"(?:schedule|plan) ([^.,!?]+)",
     ]
     
+    # Task completion patterns (must name a task, so chat about finishing things isn't misread)
+    completion_patterns = [
+        r"(?:complete|finish|mark (?:as )?done|check off|close) (?:the |my )?task[:\s]+['\"]?([^'\".,!?]+)['\"]?",
+        r"i (?:have |just )?(?:finished|completed|done) (?:the |my )?task[:\s]+['\"]?([^'\".,!?]+)['\"]?",
+    ]
+    
+    # Check for completed tasks first: "complete task: call mom" shouldn't also create one
+    for pattern in completion_patterns:
+        for match in re.findall(pattern, message_lower, re.IGNORECASE):
+            task = find_task(match.strip())
+            if task:
+                complete_task_in_db(task['id'])
+                created_items['completed'].append(task['title'])
+    if created_items['completed']:
+        return created_items
+    
     # Check for habits
     for pattern in habit_patterns:
         matches = re.findall(pattern, message_lower, re.IGNORECASE)
         for match in matches:
-            habit_name = match.strip().title()
+            habit_name = re.sub(r'^(?:of|for)\s+', '', match.strip()).title()
             if habit_name and len(habit_name) > 2:
                 # Clean up the habit name
                 habit_name = re.sub(r'(daily|every day|everyday)$', '', habit_name).strip()
-                add_habit_to_db(habit_name)
-                created_items['habits'].append(habit_name)
+                habit_name = add_habit_to_db(habit_name)
+                if habit_name not in created_items['habits']:
+                    created_items['habits'].append(habit_name)
     
-    # Check for tasks
+    # Check for tasks. Several patterns can match the same phrase; upsert_task
+    # turns the repeats into no-ops, so only new tasks are reported.
     for pattern in task_patterns:
         matches = re.findall(pattern, message_lower, re.IGNORECASE)
         for match in matches:
-            task_title = match.strip().title()
+            # "remind me to water the plants every Monday" is a recurring task
+            rule, text = recurrence.rule_from_text(match.strip())
+            # "I have to do X" and "I need to do X" should both give "X"
+            task_title = re.sub(r'^(?:do|to)\s+', '', text).title()
             if task_title and len(task_title) > 2:
                 task_data = {
                     'title': task_title,
@@ -410,47 +1406,198 @@ def detect_and_create_items(message):
                     'priority': 'medium',
                     'category': 'other',
                     'dueDate': None,
+                    'recurrence': rule,
                     'createdAt': datetime.now().isoformat()
                 }
-                if create_task_in_db(task_data):
+                try:
+                    _, created = upsert_task(task_data)
+                except Exception:
+                    log.exception("Error creating task from chat")
+                    continue
+                if created:
                     created_items['tasks'].append(task_title)
     
     return created_items if (created_items['habits'] or created_items['tasks']) else None
 
-@app.errorhandler(404)
+@bp.app_errorhandler(404)
 def not_found(e):
     return render_template('404.html'), 404
 
-@app.errorhandler(500)
+@bp.app_errorhandler(500)
 def server_error(e):
     return render_template('500.html'), 500
 
-@app.route('/api/voice', methods=['POST'])
+@bp.route('/api/voice', methods=['POST'])
 def handle_voice():
     """Handle voice command requests"""
     try:
-        print("🎤 Voice request received")
-        
         if 'audio' not in request.files:
-            print("❌ No audio file in request")
+            log.warning("Voice request without an audio file")
             return jsonify({'error': 'No audio file provided'}), 400
         
         audio_file = request.files['audio']
-        print(f"📁 Audio file: {audio_file.filename}, size: {audio_file.content_length}")
+        log.debug("Voice request: %s (%s bytes)", audio_file.filename, audio_file.content_length)
+        
+        voice = get_voice_assistant()
+        if voice is None:
+            return jsonify({
+                'transcript': '',
+                'reply': 'Voice commands are not available. Please install the voice dependencies.',
+                'action': 'error'
+            }), 503
         
         # Process the voice command
-        result = handle_voice_command(audio_file)
-        print(f"✅ Voice processing result: {result}")
+        result = voice.handle_voice_command(audio_file)
+        log.info("Voice command handled: %s", result.get('action'), extra={'transcript': result.get('transcript')})
         
         return jsonify(result)
         
     except Exception as e:
-        print(f"❌ Voice processing error: {str(e)}")
+        log.exception("Voice processing error")
         return jsonify({
             'transcript': '',
             'reply': 'Sorry, there was an error processing your voice command.',
             'action': 'error'
         }), 500
 
+@bp.route('/api/voice/stats')
+def voice_stats():
+    """Report transcription cache size and hit ratio"""
+    voice = get_voice_assistant()
+    if voice is None:
+        return jsonify({'error': 'Voice assistant is not available'}), 503
+    return jsonify({'transcription_cache': voice.transcription_cache.stats()})
+
+if sock is not None:
+    @sock.route('/ws/voice', bp=bp)
+    def voice_stream(ws):
+        """Stream voice audio chunks, sending interim and final transcripts back.
+
+        Binary messages are encoded audio chunks; a text message of
+        {"type": "end"} closes the stream and returns the command result.
+        """
+        log.debug("Voice stream opened")
+        voice = get_voice_assistant()
+        if voice is None:
+            ws.send(json.dumps({'type': 'error', 'reply': 'Voice commands are not available.'}))
+            return
+        try:
+            session = voice.StreamingVoiceSession()
+        except OSError as e:
+            log.warning("Could not start audio decoder: %s", e)
+            ws.send(json.dumps({'type': 'error', 'reply': 'Streaming voice is not available right now.'}))
+            return
+        
+        try:
+            while True:
+                message = ws.receive(timeout=0.1)
+                for partial in session.drain_partials():
+                    ws.send(json.dumps({'type': 'partial', 'transcript': partial}))
+                if message is None:
+                    continue
+                if isinstance(message, bytes):
+                    session.feed(message)
+                elif json.loads(message).get('type') == 'end':
+                    break
+            
+            result = voice.handle_voice_stream(session)
+            log.info("Voice stream handled: %s", result.get('action'), extra={'transcript': result.get('transcript')})
+            ws.send(json.dumps({'type': 'final', **result}))
+        except Exception as e:
+            log.exception("Voice stream error")
+        finally:
+            session.close()
+
+# Reverse proxies in front of the app; ProxyFix trusts only the
+# X-Forwarded-For/-Proto entries they appended (0 when clients connect directly)
+PROXY_HOPS = int(os.environ.get('ZELDA_PROXY_HOPS', '1'))
+
+def admission_client():
+    """Who a rate limited request is charged to.
+
+    The user header is only trusted in multi-user mode, where the
+    authenticating proxy sets it; otherwise it is the client address.
+    """
+    if shard_router is not None:
+        user = request.headers.get(USER_HEADER) or DEFAULT_USER
+        if user:
+            return f'user:{user}'
+    return peer_address()
+
+def create_app(warm=None):
+    """Application factory.
+
+    Schema initialization runs once per process; voice recognition is loaded
+    lazily, or in a background thread when ``warm`` (or ZELDA_WARMUP=1) is set.
+    Due-date reminders start unless ZELDA_REMINDERS=off (in a worker, with
+    ZELDA_PREFORK=1), and old data is
+    archived every ZELDA_ARCHIVE_INTERVAL_HOURS (0 turns it off). With ZELDA_SHARD_DIR
+    set, each user's data is kept in its own shard database. The expensive
+    routes are rate limited (see admission.py).
+    """
+    configure_logging()
+    ensure_db()
+    if shard_router is None and single_db.watcher.version is None:
+        single_db.watcher.reset()
+    
+    app = Flask(__name__)
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=PROXY_HOPS, x_proto=PROXY_HOPS)
+    app.register_blueprint(bp)
+    
+    # Fingerprinted, precompressed static files served with immutable caching
+    AssetPipeline(os.path.join(app.root_path, 'static')).init_app(app)
+    PageCache(app)
+    # Request/DB/LLM/stage timings and cache ratios at /metrics
+    metrics.init_app(app)
+    # Opt-in request profiling; nothing is installed unless ZELDA_PROFILE_SECRET
+    # or ZELDA_PROFILE_SAMPLE_RATE is set
+    RequestProfiler.from_env().init_app(app)
+    # Token buckets and concurrency caps for chat, voice and import, so they
+    # can't starve the cheap endpoints (ZELDA_ADMISSION=off to disable)
+    admission = AdmissionController.from_env(client_key=admission_client)
+    if admission is not None:
+        admission.init_app(app)
+    if shard_router is not None:
+        metrics.REGISTRY.register(metrics.GaugeFunc(
+            'zelda_shards_open', 'User shard databases open in this process',
+            lambda: shard_router.stats()['open']), replace=True)
+        log.info("Multi-user mode: shards in %s", shard_router.directory)
+    
+    # In a pre-fork master threads would not survive the fork: init_worker()
+    # starts them in the workers instead
+    if not PREFORK:
+        if warm is None:
+            warm = os.environ.get('ZELDA_WARMUP', '1') == '1'
+        if warm:
+            warm_up()
+        start_background_jobs()
+    
+    return app
+
+def init_worker():
+    """Per-process setup in a pre-fork worker (called from gunicorn's post_fork).
+
+    The app was created once in the master (preload), so only state tied to
+    the master process is reset here, and each worker follows the data
+    version from the current value. Threads don't survive fork, so they
+    start here: the warm-up in every worker, reminders and archiving in
+    whichever worker holds the jobs lock.
+    """
+    global _reminder_scheduler, _reminder_follower, _archiver, _jobs_lock
+    _reminder_scheduler = None
+    _reminder_follower = None
+    _archiver = None
+    _jobs_lock = None
+    single_db.habit_index = None
+    single_db.summary.version = None
+    conversation.after_fork()
+    if shard_router is None:
+        single_db.watcher.after_fork()
+    else:
+        shard_router.after_fork()
+    if os.environ.get('ZELDA_WARMUP', '1') == '1':
+        warm_up()
+    threading.Thread(target=_run_background_jobs_when_elected, name='zelda-jobs-election', daemon=True).start()
+
 if __name__ == '__main__':
-    app.run(debug=True)
+    create_app().run(debug=True)
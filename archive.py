@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""
+Hot/cold archival of old tasks and habit history.
+
+The tasks and habit_dates tables only ever grew, so every task list and
+habit grid query got slower with age. The archiver moves cold rows out of
+them:
+
+* tasks completed more than ZELDA_ARCHIVE_TASK_DAYS days ago (default 90)
+  go to tasks_archive, a plain copy of the table;
+* habit_dates rows from calendar years that ended more than
+  ZELDA_ARCHIVE_HABIT_DAYS days ago (default 400, so the habit grid's
+  current year and the one before stay hot) are compacted into one
+  bitmap per habit and year in habit_history_archive.
+
+Read APIs only look at the archive when a request asks for an older range
+(see app.get_tasks and app.habits_api). The job runs every
+ZELDA_ARCHIVE_INTERVAL_HOURS (default 24, 0 disables it) in the process
+that owns the reminders.
+
+Maintenance on demand (VACUUM takes an exclusive lock and rewrites the file):
+
+    python archive.py --db habits.db              # archive now
+    python archive.py --db habits.db --vacuum     # archive, then ANALYZE and VACUUM
+    python archive.py --shard-dir shards/ --analyze
+"""
+
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+log = logging.getLogger(__name__)
+
+TASK_COLUMNS = ('id', 'title', 'description', 'priority', 'category', 'due_date', 'completed',
+                'created_at', 'title_key', 'completed_at', 'recurrence')
+YEAR_BYTES = 46    # 366 day bits
+
+
+def create_tables(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS tasks_archive (
+            id INTEGER PRIMARY KEY,
+            title TEXT NOT NULL,
+            description TEXT,
+            priority TEXT,
+            category TEXT,
+            due_date TEXT,
+            completed BOOLEAN,
+            created_at TEXT NOT NULL,
+            title_key TEXT,
+            completed_at TEXT,
+            archived_at TEXT NOT NULL,
+            recurrence TEXT
+        )
+    ''')
+    if 'recurrence' not in {row[1] for row in cursor.execute('PRAGMA table_info(tasks_archive)')}:
+        cursor.execute('ALTER TABLE tasks_archive ADD COLUMN recurrence TEXT')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS habit_history_archive (
+            habit_id INTEGER NOT NULL,
+            year INTEGER NOT NULL,
+            days BLOB NOT NULL,         -- bit n set: checked on day n of the year (Jan 1 = 0)
+            PRIMARY KEY (habit_id, year)
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS tasks_archive_completed ON tasks_archive (coalesce(completed_at, created_at))')
+
+
+# --- Per-year bitmaps ---
+
+def set_day(days, day, checked):
+    """Set or clear one date's bit in a year bitmap (a bytearray)"""
+    index = day.timetuple().tm_yday - 1
+    if checked:
+        days[index // 8] |= 1 << (index % 8)
+    else:
+        days[index // 8] &= ~(1 << (index % 8))
+
+
+def checked_days(year, days):
+    """ISO dates whose bit is set in a year bitmap"""
+    start = date(year, 1, 1).toordinal()
+    for byte_index, byte in enumerate(days):
+        while byte:
+            bit = (byte & -byte).bit_length() - 1
+            yield date.fromordinal(start + byte_index * 8 + bit).isoformat()
+            byte &= byte - 1
+
+
+# --- Archiving ---
+
+def task_cutoff(today, task_days):
+    return (today - timedelta(days=task_days)).isoformat()
+
+
+def habit_cutoff(today, habit_days):
+    """Jan 1 of the oldest year still kept hot: whole years are archived at once"""
+    return date((today - timedelta(days=habit_days)).year, 1, 1).isoformat()
+
+
+def archive_database(conn, today=None, task_days=90, habit_days=400):
+    """Move cold rows of one database into its archive tables. Returns counts."""
+    today = today or date.today()
+    tasks_before = task_cutoff(today, task_days)
+    dates_before = habit_cutoff(today, habit_days)
+    columns = ', '.join(TASK_COLUMNS)
+
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        cold = 'completed AND coalesce(completed_at, created_at) < ?'
+        tasks = conn.execute(f'''
+            INSERT OR REPLACE INTO tasks_archive ({columns}, archived_at)
+            SELECT {columns}, ? FROM tasks WHERE {cold}
+        ''', (datetime.now().isoformat(), tasks_before)).rowcount
+        conn.execute(f'DELETE FROM tasks WHERE {cold}', (tasks_before,))
+
+        rows = conn.execute(
+            'SELECT habit_id, date, checked FROM habit_dates WHERE date < ? ORDER BY habit_id, date', (dates_before,)
+        ).fetchall()
+        years = {}
+        moved = []
+        for habit_id, day, checked in rows:
+            try:
+                parsed = date.fromisoformat(day)
+            except (TypeError, ValueError):
+                continue    # leave malformed rows where they are
+            key = (habit_id, parsed.year)
+            if key not in years:
+                existing = conn.execute(
+                    'SELECT days FROM habit_history_archive WHERE habit_id = ? AND year = ?', key
+                ).fetchone()
+                years[key] = bytearray(existing[0] if existing else YEAR_BYTES)
+            set_day(years[key], parsed, checked)
+            moved.append((habit_id, day))
+        conn.executemany('INSERT OR REPLACE INTO habit_history_archive (habit_id, year, days) VALUES (?, ?, ?)',
+                         [(habit_id, year, bytes(days)) for (habit_id, year), days in years.items()])
+        conn.executemany('DELETE FROM habit_dates WHERE habit_id = ? AND date = ?', moved)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    # Let SQLite refresh statistics for the tables that just shrank
+    conn.execute('PRAGMA optimize')
+    return {'tasks': tasks, 'habit_dates': len(moved), 'habit_years': len(years)}
+
+
+def maintain(conn, vacuum=False):
+    """ANALYZE (and optionally VACUUM) a database after archiving"""
+    start = time.perf_counter()
+    try:
+        conn.execute("INSERT INTO tasks_fts (tasks_fts) VALUES ('optimize')")
+        conn.commit()
+    except sqlite3.OperationalError:
+        pass    # built without FTS5
+    conn.execute('ANALYZE')
+    conn.commit()
+    if vacuum:
+        conn.execute('VACUUM')
+    return round(time.perf_counter() - start, 3)
+
+
+# --- Reading ---
+
+def archived_tasks(conn, since=None):
+    """Archived task rows (as tasks rows) completed on or after since, or all of them"""
+    sql = f"SELECT {', '.join(TASK_COLUMNS)} FROM tasks_archive"
+    params = ()
+    if since:
+        sql += ' WHERE coalesce(completed_at, created_at) >= ?'
+        params = (since,)
+    return conn.execute(sql + ' ORDER BY coalesce(completed_at, created_at) DESC', params).fetchall()
+
+
+def archived_habit_dates(conn, since):
+    """{habit_id: [ISO date, ...]} of archived checks on or after since"""
+    result = {}
+    rows = conn.execute('SELECT habit_id, year, days FROM habit_history_archive WHERE year >= ?',
+                        (int(since[:4]),))
+    for habit_id, year, days in rows:
+        result.setdefault(habit_id, []).extend(day for day in checked_days(year, days) if day >= since)
+    return result
+
+
+# --- Background job ---
+
+class ArchiveSettings:
+    def __init__(self, task_days=90, habit_days=400, interval_hours=24):
+        self.task_days = task_days
+        self.habit_days = habit_days
+        self.interval_hours = interval_hours
+
+    @classmethod
+    def from_env(cls):
+        return cls(int(os.environ.get('ZELDA_ARCHIVE_TASK_DAYS', '90')),
+                   int(os.environ.get('ZELDA_ARCHIVE_HABIT_DAYS', '400')),
+                   float(os.environ.get('ZELDA_ARCHIVE_INTERVAL_HOURS', '24')))
+
+
+class Archiver:
+    """Archive every database on a timer in a background thread"""
+
+    def __init__(self, databases, settings=None, first_delay=60, connect=sqlite3.connect):
+        self.databases = databases      # callable returning database paths
+        self.settings = settings or ArchiveSettings.from_env()
+        self.first_delay = first_delay
+        self.connect = connect
+        self.runs = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def run_once(self, today=None):
+        totals = {'databases': 0, 'tasks': 0, 'habit_dates': 0}
+        for path in self.databases():
+            conn = self.connect(path)
+            try:
+                counts = archive_database(conn, today, self.settings.task_days, self.settings.habit_days)
+            except sqlite3.Error:
+                log.exception("Archiving %s failed", path)
+                continue
+            finally:
+                conn.close()
+            totals['databases'] += 1
+            totals['tasks'] += counts['tasks']
+            totals['habit_dates'] += counts['habit_dates']
+        self.runs += 1
+        log.info("Archived %d tasks and %d habit dates from %d database(s)",
+                 totals['tasks'], totals['habit_dates'], totals['databases'])
+        return totals
+
+    def start(self):
+        if self.settings.interval_hours <= 0 or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='zelda-archiver', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread = None
+
+    def _run(self):
+        delay = self.first_delay
+        while not self._stop.wait(delay):
+            try:
+                self.run_once()
+            except Exception:
+                log.exception("Archive run failed")
+            delay = self.settings.interval_hours * 3600
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument('--db', help='database file')
+    target.add_argument('--shard-dir', help='directory of user shard databases')
+    parser.add_argument('--task-days', type=int, help='archive tasks completed more than this many days ago')
+    parser.add_argument('--habit-days', type=int, help='archive habit years that ended more than this many days ago')
+    parser.add_argument('--no-archive', action='store_true', help='only run maintenance')
+    parser.add_argument('--analyze', action='store_true', help='run ANALYZE afterwards')
+    parser.add_argument('--vacuum', action='store_true', help='run ANALYZE and VACUUM afterwards')
+    args = parser.parse_args()
+
+    # Open through the app so the schema (and archive tables) are up to date
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import app as zelda_app
+    if args.db:
+        zelda_app.DB_FILE = args.db
+        zelda_app.init_db()
+        paths = [args.db]
+    else:
+        from shards import ShardRouter
+        router = ShardRouter(args.shard_dir, init=zelda_app.init_shard)
+        router.migrate_all()
+        paths = [router.path_for(key) for key in router.keys()]
+
+    settings = ArchiveSettings.from_env()
+    if args.task_days is not None:
+        settings.task_days = args.task_days
+    if args.habit_days is not None:
+        settings.habit_days = args.habit_days
+
+    report = {}
+    for path in paths:
+        conn = sqlite3.connect(path)
+        try:
+            entry = {}
+            if not args.no_archive:
+                entry.update(archive_database(conn, None, settings.task_days, settings.habit_days))
+            if args.analyze or args.vacuum:
+                entry['maintenance_seconds'] = maintain(conn, vacuum=args.vacuum)
+            entry['bytes'] = os.path.getsize(path)
+            report[path] = entry
+        finally:
+            conn.close()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+"""
+Fingerprinted, precompressed static assets.
+
+At startup every file under static/ is read once, content-hashed and
+precompressed (gzip, plus brotli when the ``brotli`` package is installed).
+Templates link to ``{{ asset_url('habit.js') }}``, which renders as
+``/assets/habit.<hash>.js``. Because the URL changes whenever the content does,
+those responses can be cached by browsers forever.
+"""
+
+import gzip
+import hashlib
+import mimetypes
+import os
+
+from flask import abort, request, Response
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+# Only text formats are worth compressing
+COMPRESSIBLE_TYPES = ('text/', 'application/javascript', 'application/json', 'image/svg+xml')
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+
+class Asset:
+    """A single static file with its fingerprint and encoded variants"""
+
+    def __init__(self, name, path, content):
+        self.name = name
+        self.path = path
+        self.mtime = os.path.getmtime(path)
+        self.digest = hashlib.sha256(content).hexdigest()[:12]
+        stem, ext = os.path.splitext(name)
+        self.hashed_name = f"{stem}.{self.digest}{ext}"
+        self.content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+        if self.content_type.startswith('text/'):
+            self.content_type += '; charset=utf-8'
+
+        self.variants = {'identity': content}
+        if self.content_type.startswith(COMPRESSIBLE_TYPES):
+            compressed = gzip.compress(content, compresslevel=9, mtime=0)
+            if len(compressed) < len(content):
+                self.variants['gzip'] = compressed
+            if BROTLI_AVAILABLE:
+                compressed = brotli.compress(content, quality=11)
+                if len(compressed) < len(content):
+                    self.variants['br'] = compressed
+
+
+class AssetPipeline:
+    """Serve static/ under content-hashed URLs with immutable caching"""
+
+    def __init__(self, static_dir, url_prefix='/assets'):
+        self.static_dir = static_dir
+        self.url_prefix = url_prefix
+        self.by_name = {}       # 'habit.js' -> Asset
+        self.by_hashed = {}     # 'habit.1a2b3c4d5e6f.js' -> Asset
+        self.version = 0        # bumped on every rebuild, so rendered pages know to re-render
+        self.auto_refresh = False
+
+    def init_app(self, app):
+        self.build()
+        self.auto_refresh = app.debug
+        app.add_url_rule(f"{self.url_prefix}/<path:filename>", 'assets', self.serve)
+        app.context_processor(lambda: {'asset_url': self.url_for})
+        app.extensions['assets'] = self
+
+    def build(self):
+        """Hash and compress every file under the static directory"""
+        by_name = {}
+        for root, _, files in os.walk(self.static_dir):
+            for filename in files:
+                path = os.path.join(root, filename)
+                name = os.path.relpath(path, self.static_dir).replace(os.sep, '/')
+                with open(path, 'rb') as f:
+                    by_name[name] = Asset(name, path, f.read())
+        self.by_name = by_name
+        self.by_hashed = {asset.hashed_name: asset for asset in by_name.values()}
+        self.version += 1
+
+    def refresh(self):
+        """Rebuild if any file changed (used in debug mode so edits show up)"""
+        for asset in self.by_name.values():
+            if not os.path.exists(asset.path) or os.path.getmtime(asset.path) != asset.mtime:
+                self.build()
+                return
+
+    def manifest(self):
+        """Original name -> fingerprinted name"""
+        return {name: asset.hashed_name for name, asset in self.by_name.items()}
+
+    def url_for(self, name):
+        """Fingerprinted URL for a static file (plain /static/ URL if unknown)"""
+        if self.auto_refresh:
+            self.refresh()
+        asset = self.by_name.get(name)
+        if asset is None:
+            return f"/static/{name}"
+        return f"{self.url_prefix}/{asset.hashed_name}"
+
+    def serve(self, filename):
+        asset = self.by_hashed.get(filename)
+        if asset is None:
+            abort(404)
+
+        # Each encoding gets its own strong ETag
+        encoding = self._choose_encoding(asset)
+        tag = asset.digest if encoding == 'identity' else f"{asset.digest}-{encoding}"
+        etag = f'"{tag}"'
+        if request.if_none_match.contains(tag):
+            response = Response(status=304)
+            response.headers['ETag'] = etag
+            response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+            return response
+
+        response = Response(asset.variants[encoding], content_type=asset.content_type)
+        if encoding != 'identity':
+            response.headers['Content-Encoding'] = encoding
+        response.headers['Vary'] = 'Accept-Encoding'
+        response.headers['ETag'] = etag
+        response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+        return response
+
+    @staticmethod
+    def _choose_encoding(asset):
+        accepted = request.accept_encodings
+        for encoding in ('br', 'gzip'):
+            if encoding in asset.variants and accepted[encoding]:
+                return encoding
+        return 'identity'
+
+
+if __name__ == '__main__':
+    # Print the fingerprint manifest and compression savings
+    pipeline = AssetPipeline(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static'))
+    pipeline.build()
+    for name, asset in sorted(pipeline.by_name.items()):
+        sizes = ', '.join(f"{encoding} {len(body)}B" for encoding, body in asset.variants.items())
+        print(f"{name} -> {asset.hashed_name} ({sizes})")
@@ -1,18 +1,42 @@
-import requests
+import logging
+import os
 import random
+import time
+from stages import stage
+import metrics
 
+log = logging.getLogger(__name__)
 
-def get_ai_reply(user_message):
-    """Get AI reply with fallback responses if Ollama is not available"""
-    prompt = (
-        "You are Zelda, an intelligent and sophisticated AI personal assistant. You are professional, helpful, and empathetic. Your purpose is to help users manage their daily tasks, build productive habits, and achieve their goals through personalized guidance and support. You provide clear, actionable advice while maintaining a warm but professional tone. You can help with task management, habit tracking, productivity tips, and general life organization. Always be encouraging and focus on helping users organize their lives better.\n\nUser: "
-        f"{user_message}\nZelda:"
-    )
+# Point at another Ollama (or the benchmark stub) with OLLAMA_URL
+OLLAMA_URL = os.environ.get('OLLAMA_URL', 'http://localhost:11434').rstrip('/')
+
+# requests is imported inside the Ollama helpers so importing this module
+# (and therefore app.py) stays cheap until the first chat message.
+
+
+SYSTEM_PROMPT = "You are Zelda, an intelligent and sophisticated AI personal assistant. You are professional, helpful, and empathetic. Your purpose is to help users manage their daily tasks, build productive habits, and achieve their goals through personalized guidance and support. You provide clear, actionable advice while maintaining a warm but professional tone. You can help with task management, habit tracking, productivity tips, and general life organization. Always be encouraging and focus on helping users organize their lives better."
+
+
+def get_ai_reply(user_message, context=''):
+    """Get AI reply with fallback responses if Ollama is not available.
+
+    ``context`` is the earlier conversation (see conversation.py), already cut to the prompt budget.
+    """
+    with stage('llm_reply'):
+        return _generate_reply(user_message, context)
+
+
+def _generate_reply(user_message, context=''):
+    history = f"{context}\n" if context else ''
+    prompt = f"{SYSTEM_PROMPT}\n\n{history}User: {user_message}\nZelda:"
+    
+    import requests
     
     try:
-        print("🤖 Attempting to connect to Ollama...")
+        log.debug("Requesting chat reply from Ollama")
+        start = time.perf_counter()
         response = requests.post(
-            'http://localhost:11434/api/generate',
+            f'{OLLAMA_URL}/api/generate',
             json={
                 'model': 'llama3.2',
                 'prompt': prompt,
@@ -22,15 +46,18 @@ def get_ai_reply(user_message):
         )
         response.raise_for_status()
         data = response.json()
+        metrics.record_ollama('chat', data, time.perf_counter() - start)
         reply = data.get('response', 'I am here for you. How can I help?')
-        print("✅ Got response from Ollama")
+        log.debug("Got chat reply from Ollama")
         return reply
         
     except requests.exceptions.ConnectionError:
-        print("❌ Ollama not available, using fallback responses")
+        log.warning("Ollama not available, using fallback responses")
+        metrics.record_ollama_failure('chat', 'unavailable')
         return get_fallback_response(user_message)
     except Exception as e:
-        print(f"❌ Error with Ollama: {str(e)}")
+        log.warning("Error with Ollama, using fallback responses: %s", e)
+        metrics.record_ollama_failure('chat', 'error')
         return get_fallback_response(user_message)
 
 
@@ -98,12 +125,47 @@ def get_fallback_response(user_message):
     return random.choice(responses)
 
 
+def summarize_conversation(summary, transcript):
+    """Fold transcript lines into a running conversation summary. Returns None if Ollama fails."""
+    import requests
+    
+    previous = f"Summary so far:\n{summary}\n\n" if summary else ''
+    prompt = (
+        "Summarize this conversation between a user and Zelda, their personal assistant, in a few sentences. "
+        "Keep names, goals, tasks, habits, preferences and open questions; drop small talk.\n\n"
+        f"{previous}New messages:\n{transcript}\n\nUpdated summary:"
+    )
+    try:
+        start = time.perf_counter()
+        with stage('chat_summary'):
+            response = requests.post(
+                f'{OLLAMA_URL}/api/generate',
+                json={
+                    'model': 'llama3.2',
+                    'prompt': prompt,
+                    'stream': False
+                },
+                timeout=30     # off the request path
+            )
+        response.raise_for_status()
+        data = response.json()
+        metrics.record_ollama('summary', data, time.perf_counter() - start)
+        return data.get('response') or None
+    except Exception as e:
+        log.info("Could not summarize conversation: %s", e)
+        metrics.record_ollama_failure('summary', 'error')
+        return None
+
+
 def get_motivation_message():
     """Get motivational message with fallback if Ollama is not available"""
+    import requests
+    
     try:
-        print("🤖 Getting motivation from Ollama...")
+        log.debug("Requesting motivation from Ollama")
+        start = time.perf_counter()
         response = requests.post(
-            'http://localhost:11434/api/generate',
+            f'{OLLAMA_URL}/api/generate',
             json={
                 'model': 'llama3.2',
                 'prompt': "Give me a short, positive motivational message for today.",
@@ -113,12 +175,14 @@ def get_motivation_message():
         )
         response.raise_for_status()
         data = response.json()
+        metrics.record_ollama('motivation', data, time.perf_counter() - start)
         message = data.get('response', 'Stay motivated!')
-        print("✅ Got motivation from Ollama")
+        log.debug("Got motivation from Ollama")
         return message
         
     except Exception:
-        print("❌ Using fallback motivation")
+        log.info("Using fallback motivation")
+        metrics.record_ollama_failure('motivation', 'error')
         motivational_messages = [
             "Every small step counts! You're building something amazing. 🌟",
             "Today is full of possibilities. Let's make it count! 💪",
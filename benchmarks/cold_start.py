@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Cold start benchmark for the Zelda web process.
+
+Each run starts a fresh interpreter, imports app.py, builds the app with
+create_app() and times the first successful responses for / and /api/tasks.
+Results are printed as JSON so they can be compared across commits.
+
+Usage:
+    python benchmarks/cold_start.py --runs 10
+    python benchmarks/cold_start.py --max-first-response-ms 500   # fail on regression
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs inside the child interpreter; prints one JSON line of timings in ms
+CHILD_SCRIPT = r'''
+import json, time
+start = time.perf_counter()
+import app as zelda_app
+imported = time.perf_counter()
+flask_app = zelda_app.create_app(warm=False)
+created = time.perf_counter()
+client = flask_app.test_client()
+assert client.get('/').status_code == 200
+home = time.perf_counter()
+assert client.get('/api/tasks').status_code == 200
+tasks = time.perf_counter()
+print(json.dumps({
+    'import_ms': (imported - start) * 1000,
+    'create_app_ms': (created - imported) * 1000,
+    'first_home_ms': (home - created) * 1000,
+    'first_tasks_ms': (tasks - home) * 1000,
+    'first_response_ms': (tasks - start) * 1000,
+}))
+'''
+
+
+def run_once(db_path):
+    env = dict(os.environ, ZELDA_DB=db_path, ZELDA_WARMUP='0')
+    output = subprocess.run(
+        [sys.executable, '-c', CHILD_SCRIPT],
+        cwd=REPO_ROOT, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def summarize(samples):
+    summary = {}
+    for key in samples[0]:
+        values = sorted(sample[key] for sample in samples)
+        summary[key] = {
+            'median': round(statistics.median(values), 2),
+            'min': round(values[0], 2),
+            'max': round(values[-1], 2),
+        }
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5, help='number of fresh interpreters to start')
+    parser.add_argument('--db', help='database to copy for the runs (default: empty database)')
+    parser.add_argument('--max-first-response-ms', type=float,
+                        help='exit non-zero if the median time to first /api/tasks response exceeds this')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='zelda-cold-start-')
+    try:
+        samples = []
+        for i in range(args.runs):
+            db_path = os.path.join(workdir, f'run{i}.db')
+            if args.db:
+                shutil.copy(args.db, db_path)
+            samples.append(run_once(db_path))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    result = {'benchmark': 'cold_start', 'runs': args.runs, 'timings_ms': summarize(samples)}
+    print(json.dumps(result, indent=2))
+
+    if args.max_first_response_ms is not None:
+        median = result['timings_ms']['first_response_ms']['median']
+        if median > args.max_first_response_ms:
+            print(f"Cold start regression: {median}ms > {args.max_first_response_ms}ms", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
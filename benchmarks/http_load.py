@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+HTTP load test for the Zelda API.
+
+Seeds a throwaway database (see seed_data.py), starts a stub Ollama and the
+app in a separate process, then drives each endpoint scenario at a fixed
+concurrency for a fixed time. Throughput, error counts and p50/p95/p99
+latencies are printed as JSON for regression tracking.
+
+Scenarios:
+    tasks          GET  /api/tasks
+    habits         GET  /api/habits
+    habit_toggle   POST /api/habits (toggle a random habit on a random day)
+    chat           POST /api/chat (Ollama stubbed, see --ollama-latency-ms)
+    motivation     GET  /api/motivation
+    summary        GET  /api/summary
+
+Usage:
+    python benchmarks/http_load.py                               # 100k tasks, 500 habits x 3 years
+    python benchmarks/http_load.py --tasks 10000 --habits 50 --duration 5 --concurrency 16
+    python benchmarks/http_load.py --db seeded.db --scenarios tasks,summary --output load.json
+    python benchmarks/http_load.py --url http://127.0.0.1:8000   # an already running server
+"""
+
+import argparse
+import http.client
+import json
+import math
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+from datetime import date, timedelta
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from seed_data import seed  # noqa: E402
+from stub_ollama import start_stub_ollama  # noqa: E402
+
+# The app under test runs in its own interpreter so the load generator doesn't share its GIL
+SERVER_SCRIPT = r'''
+import sys
+from app import create_app
+create_app(warm=False).run(host='127.0.0.1', port=int(sys.argv[1]), threaded=True)
+'''
+
+CHAT_MESSAGES = [
+    'how can I be more productive this week',
+    'what is a good morning routine',
+    'I feel tired today',
+    'give me tips for focusing',
+]
+
+
+def scenario_request(name, rng, habit_names, years):
+    """(method, path, json body or None) for one request of a scenario"""
+    if name == 'tasks':
+        return 'GET', '/api/tasks', None
+    if name == 'habits':
+        return 'GET', '/api/habits', None
+    if name == 'habit_toggle':
+        day = date.today() - timedelta(days=rng.randrange(365 * years))
+        return 'POST', '/api/habits', {'habit': rng.choice(habit_names), 'date': day.isoformat()}
+    if name == 'chat':
+        return 'POST', '/api/chat', {'message': rng.choice(CHAT_MESSAGES)}
+    if name == 'motivation':
+        return 'GET', '/api/motivation', None
+    if name == 'summary':
+        return 'GET', '/api/summary', None
+    raise ValueError(f'unknown scenario: {name}')
+
+
+SCENARIOS = ['tasks', 'habits', 'habit_toggle', 'chat', 'motivation', 'summary']
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_until_up(base_url, process=None, timeout=30):
+    parsed = urllib.parse.urlsplit(base_url)
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process is not None and process.poll() is not None:
+            sys.exit(f'app server exited early: {process.stderr.read().decode(errors="replace")}')
+        try:
+            conn = http.client.HTTPConnection(parsed.hostname, parsed.port, timeout=2)
+            conn.request('GET', '/')
+            conn.getresponse().read()
+            conn.close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    sys.exit(f'app server at {base_url} did not come up within {timeout}s')
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, math.ceil(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class Worker(threading.Thread):
+    """Sends requests over one keep-alive connection until the deadline"""
+
+    def __init__(self, base_url, name, deadline, seed, habit_names, years):
+        super().__init__(daemon=True)
+        parsed = urllib.parse.urlsplit(base_url)
+        self.host, self.port = parsed.hostname, parsed.port
+        self.scenario = name
+        self.deadline = deadline
+        self.rng = random.Random(seed)
+        self.habit_names = habit_names
+        self.years = years
+        self.latencies = []
+        self.errors = 0
+        self.bytes = 0
+
+    def run(self):
+        conn = http.client.HTTPConnection(self.host, self.port, timeout=60)
+        while time.perf_counter() < self.deadline:
+            method, path, body = scenario_request(self.scenario, self.rng, self.habit_names, self.years)
+            payload = json.dumps(body).encode() if body is not None else None
+            headers = {'Content-Type': 'application/json'} if payload else {}
+            start = time.perf_counter()
+            try:
+                conn.request(method, path, body=payload, headers=headers)
+                response = conn.getresponse()
+                data = response.read()
+            except (OSError, http.client.HTTPException):
+                self.errors += 1
+                conn.close()
+                conn = http.client.HTTPConnection(self.host, self.port, timeout=60)
+                continue
+            elapsed = time.perf_counter() - start
+            if response.status >= 400:
+                self.errors += 1
+            else:
+                self.latencies.append(elapsed)
+                self.bytes += len(data)
+        conn.close()
+
+
+def run_scenario(base_url, name, concurrency, duration, seed, habit_names, years):
+    deadline = time.perf_counter() + duration
+    workers = [Worker(base_url, name, deadline, seed + i, habit_names, years) for i in range(concurrency)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    wall = time.perf_counter() - started
+
+    latencies = sorted(latency for worker in workers for latency in worker.latencies)
+    ok = len(latencies)
+    return {
+        'requests': ok,
+        'errors': sum(worker.errors for worker in workers),
+        'throughput_rps': round(ok / wall, 1),
+        'latency_ms': {
+            'p50': round(percentile(latencies, 50) * 1000, 2),
+            'p95': round(percentile(latencies, 95) * 1000, 2),
+            'p99': round(percentile(latencies, 99) * 1000, 2),
+            'max': round(latencies[-1] * 1000, 2) if latencies else 0.0,
+            'mean': round(sum(latencies) / ok * 1000, 2) if ok else 0.0,
+        },
+        'mean_response_bytes': round(sum(worker.bytes for worker in workers) / ok) if ok else 0,
+    }
+
+
+def fetch_habit_names(base_url):
+    parsed = urllib.parse.urlsplit(base_url)
+    conn = http.client.HTTPConnection(parsed.hostname, parsed.port, timeout=60)
+    conn.request('GET', '/api/habits')
+    names = list(json.loads(conn.getresponse().read()).get('habits', {}))
+    conn.close()
+    return names or ['Benchmark habit']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tasks', type=int, default=100000, help='tasks to seed')
+    parser.add_argument('--habits', type=int, default=500, help='habits to seed')
+    parser.add_argument('--years', type=int, default=3, help='years of habit history to seed')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--db', help='copy this already seeded database instead of generating one')
+    parser.add_argument('--url', help='benchmark a running server instead of starting one (no seeding, no stub)')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help='comma-separated scenarios to run')
+    parser.add_argument('--concurrency', type=int, default=8, help='concurrent keep-alive connections')
+    parser.add_argument('--duration', type=float, default=10, help='seconds per scenario')
+    parser.add_argument('--warmup', type=float, default=1, help='seconds of unmeasured load per scenario')
+    parser.add_argument('--ollama-latency-ms', type=float, default=300, help='stub Ollama generation time')
+    parser.add_argument('--ollama-jitter-ms', type=float, default=50)
+    parser.add_argument('--output', help='also write the JSON report to this file')
+    args = parser.parse_args()
+
+    scenarios = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    for name in scenarios:
+        if name not in SCENARIOS:
+            parser.error(f'unknown scenario {name!r} (choose from {", ".join(SCENARIOS)})')
+
+    workdir = tempfile.mkdtemp(prefix='zelda-load-')
+    server = stub = None
+    report = {
+        'benchmark': 'http_load',
+        'concurrency': args.concurrency,
+        'duration_s': args.duration,
+        'ollama_latency_ms': args.ollama_latency_ms,
+    }
+    try:
+        if args.url:
+            base_url = args.url.rstrip('/')
+            report['target'] = base_url
+        else:
+            db_path = os.path.join(workdir, 'load.db')
+            if args.db:
+                shutil.copy(args.db, db_path)
+                report['dataset'] = {'db': args.db}
+            else:
+                report['dataset'] = seed(db_path, args.tasks, args.habits, args.years, args.seed)
+                report['dataset'].pop('db')
+
+            stub = start_stub_ollama(latency_ms=args.ollama_latency_ms, jitter_ms=args.ollama_jitter_ms)
+            port = free_port()
+            env = dict(os.environ, ZELDA_DB=db_path, OLLAMA_URL=stub.url, ZELDA_WARMUP='0',
+                       ZELDA_REMINDERS='off', ZELDA_ARCHIVE_INTERVAL_HOURS='0', ZELDA_ADMISSION='off',
+                       ZELDA_LOG_LEVEL='WARNING')
+            server = subprocess.Popen([sys.executable, '-c', SERVER_SCRIPT, str(port)], cwd=REPO_ROOT, env=env,
+                                      stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+            base_url = f'http://127.0.0.1:{port}'
+        wait_until_up(base_url, server)
+
+        habit_names = fetch_habit_names(base_url)
+        results = {}
+        for name in scenarios:
+            if args.warmup:
+                run_scenario(base_url, name, args.concurrency, args.warmup, args.seed, habit_names, args.years)
+            results[name] = run_scenario(base_url, name, args.concurrency, args.duration, args.seed, habit_names, args.years)
+            print(f"{name}: {results[name]['throughput_rps']} req/s, p95 {results[name]['latency_ms']['p95']}ms",
+                  file=sys.stderr)
+        report['scenarios'] = results
+        if stub is not None:
+            report['ollama_requests'] = stub.requests
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=10)
+        if stub is not None:
+            stub.shutdown()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+
+
+if __name__ == '__main__':
+    main()
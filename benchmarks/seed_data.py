@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Deterministic dataset generator for benchmarks.
+
+Creates a Zelda database with the app's own schema and fills it with
+synthetic tasks, habits and several years of habit history. The same
+--seed and --end-date always produce the same data.
+
+Usage:
+    python benchmarks/seed_data.py --db /tmp/zelda-bench.db
+    python benchmarks/seed_data.py --db big.db --tasks 100000 --habits 500 --years 3
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PRIORITIES = [('high', 0.2), ('medium', 0.5), ('low', 0.3)]
+CATEGORIES = ['work', 'personal', 'health', 'learning', 'other']
+VERBS = ['Call', 'Email', 'Review', 'Write', 'Plan', 'Buy', 'Fix', 'Read', 'Prepare', 'Clean']
+OBJECTS = ['report', 'groceries', 'dentist', 'budget', 'slides', 'car', 'garden', 'invoice', 'mom', 'notes']
+HABIT_WORDS = ['Read', 'Run', 'Meditate', 'Stretch', 'Journal', 'Walk', 'Practice', 'Drink water', 'Study', 'Cook']
+
+
+def habit_names(count):
+    return [f"{HABIT_WORDS[i % len(HABIT_WORDS)]} {i // len(HABIT_WORDS) + 1}" for i in range(count)]
+
+
+def seed(db_path, tasks=100000, habits=500, years=3, seed=42, end_date=None, batch=10000):
+    """Create db_path and fill it. Returns row counts and timing."""
+    sys.path.insert(0, REPO_ROOT)
+    import app as zelda_app
+
+    rng = random.Random(seed)
+    end_date = end_date or date.today()
+    start = time.perf_counter()
+
+    zelda_app.DB_FILE = db_path
+    zelda_app.init_db()
+    conn = zelda_app.connect_db()
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=OFF')
+
+    weights = [w for _, w in PRIORITIES]
+    priorities = [p for p, _ in PRIORITIES]
+    span_days = 365 * years
+    rows = []
+    for i in range(tasks):
+        created = datetime.combine(end_date, datetime.min.time()) - timedelta(minutes=rng.randrange(span_days * 24 * 60))
+        due = created.date() + timedelta(days=rng.randrange(-3, 30)) if rng.random() < 0.6 else None
+        rows.append((
+            f"{rng.choice(VERBS)} {rng.choice(OBJECTS)} #{i}",
+            'Generated for benchmarks' if rng.random() < 0.3 else '',
+            rng.choices(priorities, weights)[0],
+            rng.choice(CATEGORIES),
+            due.isoformat() if due else None,
+            1 if rng.random() < 0.55 else 0,
+            created.isoformat()
+        ))
+        if len(rows) >= batch:
+            _insert_tasks(conn, rows)
+            rows = []
+    _insert_tasks(conn, rows)
+
+    names = habit_names(habits)
+    conn.executemany('INSERT OR IGNORE INTO habits (name, color) VALUES (?, ?)',
+                     [(name, f"#{rng.randrange(0x1000000):06x}") for name in names])
+    habit_ids = [row[0] for row in conn.execute('SELECT id FROM habits ORDER BY id')]
+
+    checked = 0
+    for habit_id in habit_ids:
+        # Each habit has its own consistency, so the grid isn't uniform noise
+        consistency = rng.uniform(0.2, 0.95)
+        rows = [(habit_id, (end_date - timedelta(days=d)).isoformat(), 1)
+                for d in range(span_days) if rng.random() < consistency]
+        conn.executemany('INSERT OR IGNORE INTO habit_dates (habit_id, date, checked) VALUES (?, ?, ?)', rows)
+        checked += len(rows)
+    conn.commit()
+    conn.execute('PRAGMA journal_mode=DELETE')
+    conn.close()
+
+    return {
+        'db': db_path,
+        'tasks': tasks,
+        'habits': len(habit_ids),
+        'habit_dates': checked,
+        'seed': seed,
+        'end_date': end_date.isoformat(),
+        'seconds': round(time.perf_counter() - start, 2)
+    }
+
+
+def _insert_tasks(conn, rows):
+    if rows:
+        conn.executemany('''
+            INSERT INTO tasks (title, description, priority, category, due_date, completed, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', required=True, help='database file to create')
+    parser.add_argument('--tasks', type=int, default=100000)
+    parser.add_argument('--habits', type=int, default=500)
+    parser.add_argument('--years', type=int, default=3, help='years of habit history')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--end-date', type=date.fromisoformat, help='last day of generated history (default: today)')
+    parser.add_argument('--force', action='store_true', help='overwrite an existing database')
+    args = parser.parse_args()
+
+    if os.path.exists(args.db):
+        if not args.force:
+            sys.exit(f'{args.db} already exists (use --force to overwrite)')
+        os.unlink(args.db)
+    print(json.dumps(seed(args.db, args.tasks, args.habits, args.years, args.seed, args.end_date), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Stub Ollama server for benchmarks.
+
+Answers POST /api/generate like Ollama with ``"stream": false``: a canned
+reply plus the timing fields (load/prompt_eval/eval durations in ns and
+token counts) that the app records in /metrics. Latency is simulated
+with a sleep, so the server handles many concurrent requests cheaply.
+
+Usage:
+    python benchmarks/stub_ollama.py --port 11434 --latency-ms 400 --jitter-ms 100
+    OLLAMA_URL=http://127.0.0.1:11434 python app.py
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+REPLY = "Here's a thought: pick the one task that matters most today and start with ten focused minutes."
+
+
+class StubOllamaServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency_ms=0.0, jitter_ms=0.0):
+        super().__init__(address, _Handler)
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.requests = 0
+        self._count_lock = threading.Lock()
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        if self.path != '/api/generate':
+            self.send_error(404)
+            return
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)) or 0)
+        try:
+            prompt = json.loads(body or b'{}').get('prompt', '')
+        except ValueError:
+            self.send_error(400)
+            return
+
+        server = self.server
+        with server._count_lock:
+            server.requests += 1
+        delay = max(0.0, server.latency_ms + random.uniform(-server.jitter_ms, server.jitter_ms)) / 1000
+        time.sleep(delay)
+
+        # Split the simulated time roughly like a real model: short prompt eval, longer generation
+        total_ns = int(delay * 1e9)
+        payload = json.dumps({
+            'model': 'stub',
+            'response': REPLY,
+            'done': True,
+            'total_duration': total_ns,
+            'load_duration': 0,
+            'prompt_eval_count': len(prompt.split()),
+            'prompt_eval_duration': total_ns // 5,
+            'eval_count': len(REPLY.split()),
+            'eval_duration': total_ns - total_ns // 5,
+        }).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub_ollama(host='127.0.0.1', port=0, latency_ms=0.0, jitter_ms=0.0):
+    """Start the stub in a background thread and return the server (see .url)"""
+    server = StubOllamaServer((host, port), latency_ms, jitter_ms)
+    threading.Thread(target=server.serve_forever, name='stub-ollama', daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=11434)
+    parser.add_argument('--latency-ms', type=float, default=300, help='mean simulated generation time')
+    parser.add_argument('--jitter-ms', type=float, default=0, help='uniform +/- jitter around the latency')
+    args = parser.parse_args()
+
+    server = StubOllamaServer((args.host, args.port), args.latency_ms, args.jitter_ms)
+    print(f"Stub Ollama listening on {server.url} ({args.latency_ms}ms +/- {args.jitter_ms}ms)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Voice pipeline benchmark.
+
+Generates deterministic synthetic audio fixtures (speech-band tones separated
+by silence), then drives handle_voice_command and process_command with a
+stubbed speech-to-text engine against a throwaway database. Reports per-stage
+p50/p95/p99 latencies and peak RSS as JSON:
+
+    upload_read  reading the uploaded clip
+    decode       ffmpeg conversion (webm fixtures only) and WAV reading
+    vad          ambient noise calibration
+    recognition  speech-to-text (stubbed, see --stt-latency-ms)
+    routing      process_command, including the two stages below
+    db_write     task/habit inserts
+    llm_reply    Ollama reply (stubbed, see --llm-latency-ms)
+
+Usage:
+    python benchmarks/voice_pipeline.py --iterations 50
+    python benchmarks/voice_pipeline.py --webm --stt-latency-ms 300 --output voice.json
+"""
+
+import argparse
+import io
+import json
+import math
+import os
+import resource
+import shutil
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+import wave
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLE_RATE = 16000
+
+# (fixture name, seconds of "speech", transcript the stub engine returns)
+COMMANDS = [
+    ('task_short', 1.5, 'remind me to call mom tomorrow'),
+    ('habit_complete', 2.5, 'I completed my reading habit today'),
+    ('time_query', 1.0, 'what time is it'),
+    ('chat_long', 6.0, 'tell me how I can be more productive this week'),
+]
+
+STAGES = ['upload_read', 'decode', 'vad', 'recognition', 'routing', 'db_write', 'llm_reply']
+
+
+def synth_wav(path, speech_seconds, seed):
+    """Write a mono 16-bit WAV: leading silence, a modulated tone, trailing silence"""
+    lead, tail = 0.3, 0.5
+    frames = bytearray()
+    total = int((lead + speech_seconds + tail) * SAMPLE_RATE)
+    base = 180 + 40 * seed
+    for i in range(total):
+        t = i / SAMPLE_RATE
+        if lead <= t < lead + speech_seconds:
+            # Syllable-like amplitude envelope over a couple of harmonics
+            envelope = 0.5 + 0.5 * math.sin(2 * math.pi * 4 * t)
+            value = envelope * (0.6 * math.sin(2 * math.pi * base * t) + 0.3 * math.sin(2 * math.pi * base * 2.5 * t))
+            sample = int(12000 * value)
+        else:
+            sample = 0
+        frames += struct.pack('<h', sample)
+    with wave.open(path, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(SAMPLE_RATE)
+        wav.writeframes(bytes(frames))
+
+
+def build_fixtures(directory, webm):
+    fixtures = []
+    for seed, (name, seconds, transcript) in enumerate(COMMANDS):
+        path = os.path.join(directory, f'{name}.wav')
+        synth_wav(path, seconds, seed)
+        if webm:
+            webm_path = os.path.join(directory, f'{name}.webm')
+            subprocess.run(['ffmpeg', '-loglevel', 'error', '-y', '-i', path, '-c:a', 'libopus', webm_path], check=True)
+            path = webm_path
+        with open(path, 'rb') as f:
+            fixtures.append((name, f.read(), transcript))
+    return fixtures
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, math.ceil(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(values):
+    values = sorted(values)
+    return {
+        'count': len(values),
+        'p50': round(percentile(values, 50) * 1000, 3),
+        'p95': round(percentile(values, 95) * 1000, 3),
+        'p99': round(percentile(values, 99) * 1000, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=20, help='runs per fixture')
+    parser.add_argument('--webm', action='store_true', help='encode fixtures as webm/opus (needs ffmpeg)')
+    parser.add_argument('--stt-latency-ms', type=float, default=0, help='simulated recognition latency')
+    parser.add_argument('--llm-latency-ms', type=float, default=0, help='simulated Ollama reply latency')
+    parser.add_argument('--cache', action='store_true', help='leave the transcription cache enabled')
+    parser.add_argument('--output', help='also write the JSON report to this file')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='zelda-voice-bench-')
+    os.environ['ZELDA_DB'] = os.path.join(workdir, 'bench.db')
+    os.environ['ZELDA_WARMUP'] = '0'
+    sys.path.insert(0, REPO_ROOT)
+
+    import app as zelda_app
+    import assistant
+    import voice_assistant
+    from stages import collect_stages, stage
+    from transcription_cache import TranscriptionCache
+
+    if not voice_assistant.SPEECH_RECOGNITION_AVAILABLE:
+        sys.exit('speech_recognition is required: pip install -r requirements.txt')
+
+    zelda_app.ensure_db()
+    zelda_app.add_habit_to_db('Reading')
+
+    # Stub engines: the benchmark measures our pipeline, not Google or Ollama
+    expected = {}
+
+    def stub_recognize(recognizer, audio_data):
+        if args.stt_latency_ms:
+            time.sleep(args.stt_latency_ms / 1000)
+        return expected['transcript']
+
+    def stub_reply(user_message):
+        with stage('llm_reply'):
+            if args.llm_latency_ms:
+                time.sleep(args.llm_latency_ms / 1000)
+            return f'Stub reply to: {user_message}'
+
+    voice_assistant.recognize_audio = stub_recognize
+    assistant.get_ai_reply = stub_reply
+    if not args.cache:
+        voice_assistant.transcription_cache = TranscriptionCache(max_entries=0)
+
+    # The pipeline prints progress for every request; keep the report clean
+    devnull = open(os.devnull, 'w')
+    real_stdout = sys.stdout
+
+    try:
+        fixtures = build_fixtures(workdir, args.webm)
+        stage_samples = {name: [] for name in STAGES}
+        voice_totals = []
+        text_totals = []
+        per_command = {}
+
+        for _ in range(args.iterations):
+            for name, audio, transcript in fixtures:
+                expected['transcript'] = transcript
+                sys.stdout = devnull
+                try:
+                    with collect_stages() as timings:
+                        start = time.perf_counter()
+                        result = voice_assistant.handle_voice_command(io.BytesIO(audio))
+                        elapsed = time.perf_counter() - start
+                    text_start = time.perf_counter()
+                    voice_assistant.process_command(transcript)
+                    text_elapsed = time.perf_counter() - text_start
+                finally:
+                    sys.stdout = real_stdout
+
+                if result.get('action') == 'error':
+                    sys.exit(f'{name}: pipeline returned an error: {result}')
+                voice_totals.append(elapsed)
+                text_totals.append(text_elapsed)
+                per_command.setdefault(name, []).append(elapsed)
+                for stage_name in STAGES:
+                    if stage_name in timings:
+                        stage_samples[stage_name].append(timings[stage_name])
+
+        report = {
+            'benchmark': 'voice_pipeline',
+            'iterations': args.iterations,
+            'fixture_format': 'webm' if args.webm else 'wav',
+            'stt_latency_ms': args.stt_latency_ms,
+            'llm_latency_ms': args.llm_latency_ms,
+            'transcription_cache': args.cache,
+            'stages_ms': {name: summarize(values) for name, values in stage_samples.items() if values},
+            'handle_voice_command_ms': summarize(voice_totals),
+            'process_command_ms': summarize(text_totals),
+            'per_command_ms': {name: summarize(values) for name, values in per_command.items()},
+            # ru_maxrss is KiB on Linux and bytes on macOS
+            'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1),
+        }
+    finally:
+        devnull.close()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+
+
+if __name__ == '__main__':
+    main()
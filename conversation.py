@@ -0,0 +1,264 @@
+"""
+Bounded conversation memory for the chat assistant.
+
+Every chat message used to go to the model on its own, so follow-up
+questions lost their context; resending the whole transcript instead would
+make each reply slower the longer a conversation runs. Each chat session
+keeps instead:
+
+* the most recent turns, in chat_turns, as a ring buffer of at most
+  ZELDA_CHAT_MAX_TURNS rows per session;
+* a rolling summary of everything older, in chat_sessions.
+
+Only turns already folded into the summary leave the ring, so a summary
+that is late (or a model that is down) never loses turns it hasn't seen.
+Unsummarized turns are capped separately at ZELDA_CHAT_MAX_PENDING_TURNS;
+past that the oldest are dropped with a warning.
+
+The prompt context is assembled under a fixed budget of
+ZELDA_CHAT_CONTEXT_TOKENS: the summary (at most ZELDA_CHAT_SUMMARY_TOKENS)
+followed by as many of the newest unsummarized turns as fit. Once the
+unsummarized turns no longer fit, the oldest of them are folded into the
+summary by a background thread, so the request that triggered it doesn't
+wait for the extra model call. Token counts are estimated (about four
+characters per token), which is close enough for budgeting.
+"""
+
+import itertools
+import logging
+import math
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+log = logging.getLogger(__name__)
+
+CHARS_PER_TOKEN = 4
+PRUNE_EVERY = 256           # turns recorded between prunes of idle sessions
+ROLES = {'user': 'User', 'assistant': 'Zelda'}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def create_tables(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS chat_turns (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session TEXT NOT NULL,
+            role TEXT NOT NULL,             -- 'user' or 'assistant'
+            content TEXT NOT NULL,
+            tokens INTEGER NOT NULL,
+            created_at REAL NOT NULL
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS chat_turns_session ON chat_turns (session, id)')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS chat_sessions (
+            session TEXT PRIMARY KEY,
+            summary TEXT NOT NULL DEFAULT '',
+            summarized_through INTEGER NOT NULL DEFAULT 0,     -- last chat_turns.id folded into the summary
+            updated_at REAL NOT NULL
+        )
+    ''')
+
+
+def estimate_tokens(text):
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def truncate(text, tokens, keep='start'):
+    """Cut text to about ``tokens`` tokens, keeping its start or its end"""
+    limit = tokens * CHARS_PER_TOKEN
+    if len(text) <= limit:
+        return text
+    return text[:limit].rstrip() + '…' if keep == 'start' else '…' + text[-limit:].lstrip()
+
+
+def format_turns(turns):
+    return '\n'.join(f"{ROLES.get(role, role)}: {content}" for role, content in turns)
+
+
+def _background():
+    """The single summarization thread, started on first use"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='zelda-summarizer')
+        return _executor
+
+
+def after_fork():
+    """Forget the parent's summarization thread"""
+    global _executor, _executor_lock
+    _executor = None
+    _executor_lock = threading.Lock()
+
+
+class ConversationMemory:
+    """Recent turns and a rolling summary per chat session, in one database"""
+
+    def __init__(self, connect, summarize, context_tokens=1024, summary_tokens=256, max_turns=50,
+                 max_pending_turns=200, session_ttl_days=30):
+        self.connect = connect
+        self.summarize = summarize          # summarize(previous summary, transcript) -> str or None
+        self.context_tokens = context_tokens
+        self.summary_tokens = summary_tokens
+        self.max_turns = max_turns
+        self.max_pending_turns = max(max_pending_turns, max_turns)
+        self.session_ttl = session_ttl_days * 86400
+        self._summarizing = set()
+        self._lock = threading.Lock()
+        self._recorded = itertools.count(1)
+
+    @classmethod
+    def from_env(cls, connect, summarize):
+        return cls(connect, summarize,
+                   context_tokens=int(os.environ.get('ZELDA_CHAT_CONTEXT_TOKENS', '1024')),
+                   summary_tokens=int(os.environ.get('ZELDA_CHAT_SUMMARY_TOKENS', '256')),
+                   max_turns=int(os.environ.get('ZELDA_CHAT_MAX_TURNS', '50')),
+                   max_pending_turns=int(os.environ.get('ZELDA_CHAT_MAX_PENDING_TURNS', '200')),
+                   session_ttl_days=float(os.environ.get('ZELDA_CHAT_SESSION_TTL_DAYS', '30')))
+
+    @property
+    def turn_budget(self):
+        return self.context_tokens - self.summary_tokens
+
+    def _state(self, conn, session):
+        row = conn.execute('SELECT summary, summarized_through FROM chat_sessions WHERE session = ?',
+                           (session,)).fetchone()
+        return row or ('', 0)
+
+    def context(self, session):
+        """Prompt context for the next message: the summary plus the newest turns that fit the budget"""
+        conn = self.connect()
+        try:
+            summary, summarized_through = self._state(conn, session)
+            rows = conn.execute('''
+                SELECT role, content, tokens FROM chat_turns
+                WHERE session = ? AND id > ? ORDER BY id DESC LIMIT ?
+            ''', (session, summarized_through, self.max_turns))
+            budget = self.context_tokens - min(estimate_tokens(summary), self.summary_tokens)
+            turns = []
+            for role, content, tokens in rows:
+                if tokens > budget:
+                    break
+                budget -= tokens
+                turns.append((role, content))
+        finally:
+            conn.close()
+        parts = []
+        if summary:
+            parts.append('Summary of the conversation so far: ' + truncate(summary, self.summary_tokens))
+        if turns:
+            parts.append(format_turns(reversed(turns)))
+        return '\n\n'.join(parts)
+
+    def record(self, session, user_message, reply):
+        """Store one exchange, trim the ring buffer and summarize in the background if needed"""
+        now = time.time()
+        # A single huge message shouldn't push everything else out of the context
+        turn_limit = self.turn_budget // 2
+        turns = [(role, truncate(content, turn_limit)) for role, content in
+                 (('user', user_message), ('assistant', reply))]
+        conn = self.connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.executemany('''
+                INSERT INTO chat_turns (session, role, content, tokens, created_at) VALUES (?, ?, ?, ?, ?)
+            ''', [(session, role, content, estimate_tokens(content) + 2, now) for role, content in turns])
+            conn.execute('''
+                INSERT INTO chat_sessions (session, updated_at) VALUES (?, ?)
+                ON CONFLICT (session) DO UPDATE SET updated_at = excluded.updated_at
+            ''', (session, now))
+            summarized_through = self._state(conn, session)[1]
+            self._trim(conn, session, summarized_through)
+            if next(self._recorded) % PRUNE_EVERY == 0:
+                self._prune(conn, now)
+            pending = conn.execute('SELECT coalesce(sum(tokens), 0) FROM chat_turns WHERE session = ? AND id > ?',
+                                   (session, summarized_through)).fetchone()[0]
+            conn.commit()
+        finally:
+            conn.close()
+        if pending > self.turn_budget:
+            self.schedule_summary(session)
+
+    def _trim(self, conn, session, summarized_through):
+        """Drop summarized turns beyond the ring, and unsummarized ones beyond the hard cap"""
+        conn.execute('''
+            DELETE FROM chat_turns WHERE session = ? AND id <= ? AND id <= (
+                SELECT id FROM chat_turns WHERE session = ? ORDER BY id DESC LIMIT 1 OFFSET ?
+            )
+        ''', (session, summarized_through, session, self.max_turns))
+        dropped = conn.execute('''
+            DELETE FROM chat_turns WHERE session = ? AND id > ? AND id <= (
+                SELECT id FROM chat_turns WHERE session = ? AND id > ? ORDER BY id DESC LIMIT 1 OFFSET ?
+            )
+        ''', (session, summarized_through, session, summarized_through, self.max_pending_turns)).rowcount
+        if dropped:
+            log.warning("Dropped %d chat turns that were never summarized (is the model down?)", dropped)
+
+    def _prune(self, conn, now):
+        idle = conn.execute('SELECT session FROM chat_sessions WHERE updated_at < ?',
+                            (now - self.session_ttl,)).fetchall()
+        conn.executemany('DELETE FROM chat_turns WHERE session = ?', idle)
+        conn.executemany('DELETE FROM chat_sessions WHERE session = ?', idle)
+
+    def schedule_summary(self, session):
+        with self._lock:
+            if session in self._summarizing:
+                return
+            self._summarizing.add(session)
+        _background().submit(self._summarize_safely, session)
+
+    def _summarize_safely(self, session):
+        try:
+            self.update_summary(session)
+        except Exception:
+            log.exception("Summarizing chat session failed")
+        finally:
+            with self._lock:
+                self._summarizing.discard(session)
+
+    def update_summary(self, session):
+        """Fold the oldest unsummarized turns into the summary, leaving half the turn budget unsummarized"""
+        conn = self.connect()
+        try:
+            summary, summarized_through = self._state(conn, session)
+            rows = conn.execute('SELECT id, role, content, tokens FROM chat_turns WHERE session = ? AND id > ? '
+                                'ORDER BY id DESC', (session, summarized_through)).fetchall()
+        finally:
+            conn.close()
+        keep = self.turn_budget // 2
+        kept = 0
+        while rows and kept + rows[0][3] <= keep:
+            kept += rows.pop(0)[3]
+        if not rows:
+            return False
+        rows.reverse()
+        started = time.perf_counter()
+        new_summary = self.summarize(summary, format_turns((role, content) for _, role, content, _ in rows))
+        if not new_summary:
+            return False    # the model is unavailable; try again after the next message
+        conn = self.connect()
+        try:
+            # Only advance from the state this summary was built on
+            conn.execute('''
+                UPDATE chat_sessions SET summary = ?, summarized_through = ?
+                WHERE session = ? AND summarized_through = ?
+            ''', (truncate(new_summary.strip(), self.summary_tokens), rows[-1][0], session, summarized_through))
+            conn.commit()
+        finally:
+            conn.close()
+        log.debug("Summarized %d chat turns in %.2fs", len(rows), time.perf_counter() - started)
+        return True
+
+    def forget(self, session):
+        conn = self.connect()
+        try:
+            conn.execute('DELETE FROM chat_turns WHERE session = ?', (session,))
+            conn.execute('DELETE FROM chat_sessions WHERE session = ?', (session,))
+            conn.commit()
+        finally:
+            conn.close()
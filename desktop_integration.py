@@ -7,66 +7,78 @@ This script provides system-level integration for the Zelda AI assistant.
 import os
 import sys
 import time
+import socket
+import socketserver
 import subprocess
 import threading
 import webbrowser
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 import json
 
+# Unix socket the daemon listens on; CLI commands talk to it when it is running
+SOCKET_PATH = os.environ.get('ZELDA_DESKTOP_SOCKET', os.path.expanduser('~/.zelda/desktop.sock'))
+
+# How often the daemon refreshes battery and network status (seconds)
+SAMPLE_INTERVAL = float(os.environ.get('ZELDA_DESKTOP_SAMPLE_INTERVAL', '30'))
+
+# macOS application names, launched with `open -a <name>`
+APP_NAMES = {
+    'safari': 'Safari',
+    'chrome': 'Google Chrome',
+    'firefox': 'Firefox',
+    'mail': 'Mail',
+    'calendar': 'Calendar',
+    'notes': 'Notes',
+    'messages': 'Messages',
+    'facetime': 'FaceTime',
+    'music': 'Music',
+    'spotify': 'Spotify',
+    'finder': 'Finder',
+    'terminal': 'Terminal',
+    'vscode': 'Visual Studio Code',
+    'xcode': 'Xcode'
+}
+
 def open_app(app_name):
     """Open applications on macOS"""
-    app_commands = {
-        'safari': 'open -a Safari',
-        'chrome': 'open -a "Google Chrome"',
-        'firefox': 'open -a Firefox',
-        'mail': 'open -a Mail',
-        'calendar': 'open -a Calendar',
-        'notes': 'open -a Notes',
-        'messages': 'open -a Messages',
-        'facetime': 'open -a FaceTime',
-        'music': 'open -a Music',
-        'spotify': 'open -a Spotify',
-        'finder': 'open -a Finder',
-        'terminal': 'open -a Terminal',
-        'vscode': 'open -a "Visual Studio Code"',
-        'xcode': 'open -a Xcode'
-    }
-    
     app_name = app_name.lower().strip()
-    if app_name in app_commands:
+    if app_name in APP_NAMES:
         try:
-            subprocess.run(app_commands[app_name], shell=True, check=True)
+            subprocess.run(['open', '-a', APP_NAMES[app_name]], check=True)
             return f"Opened {app_name.title()}"
-        except subprocess.CalledProcessError:
+        except (subprocess.CalledProcessError, OSError):
             return f"Could not open {app_name.title()}"
     else:
-        return f"I don't know how to open {app_name}. Supported apps: {', '.join(app_commands.keys())}"
+        return f"I don't know how to open {app_name}. Supported apps: {', '.join(APP_NAMES.keys())}"
+
+def current_time_string():
+    """Current local time in a spoken-friendly format"""
+    return datetime.now().strftime("%I:%M %p on %A, %B %d, %Y")
+
+def sample_battery():
+    """Battery percentage from pmset (macOS)"""
+    try:
+        battery_info = subprocess.check_output(['pmset', '-g', 'batt'], universal_newlines=True)
+        return battery_info.split('\t')[1].split(';')[0] if '\t' in battery_info else "Unknown"
+    except (subprocess.CalledProcessError, OSError, IndexError):
+        return "Unknown"
+
+def sample_network(timeout=3):
+    """Check connectivity by opening a TCP connection to a public DNS server"""
+    try:
+        with socket.create_connection(('8.8.8.8', 53), timeout=timeout):
+            return "Connected"
+    except OSError:
+        return "Disconnected"
 
 def get_system_info():
     """Get basic system information"""
     try:
-        # Get current time
-        now = datetime.now()
-        time_str = now.strftime("%I:%M %p on %A, %B %d, %Y")
-        
-        # Get battery info (macOS)
-        try:
-            battery_info = subprocess.check_output(['pmset', '-g', 'batt'], universal_newlines=True)
-            battery_percentage = battery_info.split('\t')[1].split(';')[0] if '\t' in battery_info else "Unknown"
-        except:
-            battery_percentage = "Unknown"
-        
-        # Get network status
-        try:
-            network_check = subprocess.run(['ping', '-c', '1', '8.8.8.8'], capture_output=True, timeout=3)
-            network_status = "Connected" if network_check.returncode == 0 else "Disconnected"
-        except:
-            network_status = "Unknown"
-        
         return {
-            'time': time_str,
-            'battery': battery_percentage,
-            'network': network_status
+            'time': current_time_string(),
+            'battery': sample_battery(),
+            'network': sample_network()
         }
     except Exception as e:
         return {'error': str(e)}
@@ -74,13 +86,15 @@ def get_system_info():
 def create_reminder(text, when=None):
     """Create a system reminder (macOS)"""
     try:
-        # Basic reminder creation using AppleScript
-        script = f'''
-        tell application "Reminders"
-            make new reminder with properties {{name:"{text}"}}
-        end tell
+        # The text is passed as an argument, never spliced into the script
+        script = '''
+        on run argv
+            tell application "Reminders"
+                make new reminder with properties {name:item 1 of argv}
+            end tell
+        end run
         '''
-        subprocess.run(['osascript', '-e', script], check=True)
+        subprocess.run(['osascript', '-e', script, text], check=True)
         return f"Created reminder: {text}"
     except:
         return "Could not create system reminder"
@@ -88,14 +102,137 @@ def create_reminder(text, when=None):
 def show_notification(title, message):
     """Show a system notification"""
     try:
+        # Task titles end up here: pass them as arguments so quotes in them
+        # can't break out of the AppleScript string
         subprocess.run([
-            'osascript', '-e', 
-            f'display notification "{message}" with title "{title}"'
+            'osascript',
+            '-e', 'on run argv',
+            '-e', 'display notification (item 2 of argv) with title (item 1 of argv)',
+            '-e', 'end run',
+            title, message
         ], check=True)
         return True
     except:
         return False
 
+# --- DAEMON MODE ---
+# A long-running process that samples battery/network status in the background
+# and serves cached values instantly over a local Unix socket. Notifications and
+# reminders are dispatched on a single reused worker thread. Requests and
+# responses are single JSON lines.
+
+class SystemSampler:
+    """Refresh slow system information on an interval in a background thread"""
+
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        self.interval = interval
+        self._info = {'battery': "Unknown", 'network': "Unknown", 'sampled_at': None}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='zelda-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def snapshot(self):
+        """Cached battery/network status plus the current time"""
+        return {'time': current_time_string(), **self._info}
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._info = {
+                'battery': sample_battery(),
+                'network': sample_network(),
+                'sampled_at': datetime.now().isoformat()
+            }
+            self._stop.wait(self.interval)
+
+class _DaemonHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        line = self.rfile.readline()
+        try:
+            request = json.loads(line)
+            result = self.server.dispatch(request.get('command'), request.get('args', []))
+            response = {'ok': True, 'result': result}
+        except Exception as e:
+            response = {'ok': False, 'error': str(e)}
+        self.wfile.write((json.dumps(response) + '\n').encode('utf-8'))
+
+class DesktopDaemon(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Serve desktop integration commands over a local Unix socket"""
+
+    daemon_threads = True
+
+    def __init__(self, socket_path=SOCKET_PATH, sample_interval=SAMPLE_INTERVAL):
+        os.makedirs(os.path.dirname(socket_path), exist_ok=True)
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        super().__init__(socket_path, _DaemonHandler)
+        os.chmod(socket_path, 0o600)
+        self.socket_path = socket_path
+        self.sampler = SystemSampler(sample_interval)
+        self.worker = ThreadPoolExecutor(max_workers=1, thread_name_prefix='zelda-dispatch')
+
+    def serve(self):
+        self.sampler.start()
+        try:
+            self.serve_forever()
+        finally:
+            self.sampler.stop()
+            self.worker.shutdown(wait=False)
+            self.server_close()
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+
+    def dispatch(self, command, args):
+        if command == 'ping':
+            return 'pong'
+        if command == 'info':
+            return self.sampler.snapshot()
+        if command == 'open':
+            return open_app(args[0])
+        if command == 'reminder':
+            return self.worker.submit(create_reminder, *args).result(timeout=30)
+        if command == 'notify':
+            # Fire and forget: the caller doesn't wait on osascript
+            self.worker.submit(show_notification, *args)
+            return True
+        if command == 'shutdown':
+            threading.Thread(target=self.shutdown, daemon=True).start()
+            return 'stopping'
+        raise ValueError(f"Unknown command: {command}")
+
+def send_to_daemon(command, *args, socket_path=SOCKET_PATH, timeout=35):
+    """Run a command in the daemon. Returns (True, result), or (False, None) if no daemon is running."""
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+            client.settimeout(timeout)
+            client.connect(socket_path)
+            client.sendall((json.dumps({'command': command, 'args': list(args)}) + '\n').encode('utf-8'))
+            response = json.loads(client.makefile('r', encoding='utf-8').readline())
+    except (OSError, ValueError):
+        return False, None
+    if not response.get('ok'):
+        raise RuntimeError(response.get('error', 'daemon error'))
+    return True, response['result']
+
+def run_command(command, *args):
+    """Run a command through the daemon when available, otherwise in-process"""
+    reached, result = send_to_daemon(command, *args)
+    if reached:
+        return result
+    if command == 'info':
+        return get_system_info()
+    if command == 'open':
+        return open_app(*args)
+    if command == 'reminder':
+        return create_reminder(*args)
+    if command == 'notify':
+        return show_notification(*args)
+    raise ValueError(f"Unknown command: {command}")
+
 def start_voice_listener():
     """Start continuous voice listening (placeholder for now)"""
     print("Voice listener would start here...")
@@ -113,17 +250,19 @@ def main():
         print("  python desktop_integration.py reminder '<text>'")
         print("  python desktop_integration.py notify '<title>' '<message>'")
         print("  python desktop_integration.py web")
+        print("  python desktop_integration.py daemon")
+        print("  python desktop_integration.py stop")
         return
     
     command = sys.argv[1].lower()
     
     if command == 'open' and len(sys.argv) > 2:
         app_name = sys.argv[2]
-        result = open_app(app_name)
+        result = run_command('open', app_name)
         print(result)
         
     elif command == 'info':
-        info = get_system_info()
+        info = run_command('info')
         print(f"System Information:")
         print(f"Time: {info.get('time', 'Unknown')}")
         print(f"Battery: {info.get('battery', 'Unknown')}")
@@ -131,13 +270,13 @@ def main():
         
     elif command == 'reminder' and len(sys.argv) > 2:
         text = ' '.join(sys.argv[2:])
-        result = create_reminder(text)
+        result = run_command('reminder', text)
         print(result)
         
     elif command == 'notify' and len(sys.argv) > 3:
         title = sys.argv[2]
         message = ' '.join(sys.argv[3:])
-        success = show_notification(title, message)
+        success = run_command('notify', title, message)
         print("Notification sent" if success else "Could not send notification")
         
     elif command == 'web':
@@ -145,12 +284,23 @@ def main():
         webbrowser.open('http://localhost:5000')
         print("Opening Zelda web interface...")
         
+    elif command == 'daemon':
+        print(f"Desktop daemon listening on {SOCKET_PATH}")
+        try:
+            DesktopDaemon().serve()
+        except KeyboardInterrupt:
+            pass
+        
+    elif command == 'stop':
+        reached, _ = send_to_daemon('shutdown')
+        print("Daemon stopping" if reached else "Daemon is not running")
+        
     elif command == 'listen':
         print("Starting voice listener...")
         start_voice_listener()
         
     else:
-        print("Unknown command. Use: open, info, reminder, notify, web, or listen")
+        print("Unknown command. Use: open, info, reminder, notify, web, daemon, stop, or listen")
 
 if __name__ == '__main__':
     main()
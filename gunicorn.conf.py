@@ -0,0 +1,45 @@
+"""
+Gunicorn settings for running Zelda with several worker processes.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+The app is imported once in the master (preload_app), so schema setup, the
+static asset manifest and template loading happen once before forking. Each
+worker then resets its per-process state in post_fork, and workers keep
+their in-memory caches coherent through the shared data version (see
+invalidation.py). The master starts no threads: due-date reminders and
+archiving run in one worker at a time (see init_worker in app.py).
+
+Environment:
+    ZELDA_BIND      address to listen on (default 127.0.0.1:8000)
+    ZELDA_WORKERS   worker processes (default: 2 x CPUs + 1, at most 8)
+    ZELDA_THREADS   threads per worker (default 4)
+"""
+
+import multiprocessing
+import os
+
+# Read by app.create_app() during preload, so it leaves threads to the workers
+os.environ['ZELDA_PREFORK'] = '1'
+
+bind = os.environ.get('ZELDA_BIND', '127.0.0.1:8000')
+workers = int(os.environ.get('ZELDA_WORKERS', min(8, multiprocessing.cpu_count() * 2 + 1)))
+worker_class = 'gthread'
+threads = int(os.environ.get('ZELDA_THREADS', '4'))
+preload_app = True
+
+# Voice transcription and LLM replies can take a while
+timeout = 60
+graceful_timeout = 30
+keepalive = 5
+
+
+def on_starting(server):
+    import app
+    app.ensure_db()
+    app.enable_wal()
+
+
+def post_fork(server, worker):
+    import app
+    app.init_worker()
@@ -0,0 +1,158 @@
+"""
+In-memory index of habit names for fuzzy matching spoken or typed names.
+
+Voice and chat commands such as "I finished my reading habit" need to map a
+rough name onto an existing habit. The index keeps normalized tokens and
+character trigrams for every habit name so a lookup only scores habits that
+share trigrams with the query, without touching habit_dates.
+"""
+
+import re
+import threading
+
+
+# A habit completion command. The name comes after the keyword ("mark habit
+# reading done") or before it ("I completed my reading habit today").
+COMPLETE_PATTERN = re.compile(
+    r"\b(?:complete|completed|finished|did|mark|marked|check|checked|done)\b(.*?)"
+    r"\b(?:habit|task|chore|activity|goal)\b(.*)$", re.IGNORECASE)
+_LEADING_FILLER = re.compile(r"^(?:called|named|labeled|known as|my|the|off|as|of)\s+", re.IGNORECASE)
+_TRAILING_FILLER = re.compile(
+    r"\s*\b(?:as done|as complete|done|complete|just now|now|for today|for the day|today|off)$", re.IGNORECASE)
+
+
+def _strip_filler(text):
+    previous = None
+    while text != previous:
+        previous = text
+        text = _LEADING_FILLER.sub('', text.strip(' .!?"\''))
+        text = _TRAILING_FILLER.sub('', text).strip(' .!?"\'')
+    return text
+
+
+def completed_habit_name(text):
+    """The habit named by a completion command ('' if it names none), or None if it isn't one"""
+    match = COMPLETE_PATTERN.search(text)
+    if not match:
+        return None
+    return _strip_filler(match.group(2)) or _strip_filler(match.group(1))
+
+
+def normalize_name(name):
+    """Lowercase, drop punctuation and collapse whitespace"""
+    return ' '.join(re.sub(r'[^\w\s]', ' ', name.lower()).split())
+
+
+def trigrams(normalized):
+    """Character trigrams of a normalized name, padded at word boundaries"""
+    padded = f"  {normalized} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class HabitNameIndex:
+    """Trigram and token index over habit names with ranked lookups"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._names = {}        # habit name -> (normalized, tokens, trigrams)
+        self._by_trigram = {}   # trigram -> set of habit names
+        self._by_normalized = {}  # normalized name -> habit name
+
+    def __len__(self):
+        return len(self._names)
+
+    def __contains__(self, name):
+        return name in self._names
+
+    def add(self, name):
+        """Index a habit name (no-op if already indexed)"""
+        with self._lock:
+            self._add(name)
+
+    def remove(self, name):
+        """Drop a habit name from the index"""
+        with self._lock:
+            self._remove(name)
+
+    def equivalent(self, name):
+        """The indexed habit whose name normalizes the same as ``name`` ("read!" -> "Read"), or None"""
+        with self._lock:
+            return self._by_normalized.get(normalize_name(name))
+
+    def rename(self, old_name, new_name):
+        """Re-index a renamed habit"""
+        with self._lock:
+            self._remove(old_name)
+            self._add(new_name)
+
+    def search(self, query, limit=5):
+        """Return up to ``limit`` (name, score) pairs, best first"""
+        normalized = normalize_name(query)
+        if not normalized:
+            return []
+        query_tokens = set(normalized.split())
+        query_grams = trigrams(normalized)
+
+        with self._lock:
+            shared = {}
+            for gram in query_grams:
+                for name in self._by_trigram.get(gram, ()):
+                    shared[name] = shared.get(name, 0) + 1
+
+            scored = []
+            for name, common in shared.items():
+                name_normalized, name_tokens, name_grams = self._names[name]
+                scored.append((name, self._score(
+                    normalized, query_tokens, len(query_grams),
+                    name_normalized, name_tokens, len(name_grams), common
+                )))
+
+        scored.sort(key=lambda item: (-item[1], len(item[0])))
+        return scored[:limit]
+
+    def best_match(self, query, min_score=0.4):
+        """Return the best scoring habit name, or None if nothing is close enough"""
+        results = self.search(query, limit=1)
+        if results and results[0][1] >= min_score:
+            return results[0][0]
+        return None
+
+    @staticmethod
+    def _score(query, query_tokens, query_gram_count, name, name_tokens, name_gram_count, common):
+        # Dice coefficient over trigrams tolerates small transcription errors
+        dice = 2 * common / (query_gram_count + name_gram_count)
+        token_overlap = len(query_tokens & name_tokens) / len(query_tokens | name_tokens)
+        score = 0.7 * dice + 0.3 * token_overlap
+        # Whole-name containment ("my reading" vs "Reading") is a strong signal
+        if name in query or query in name:
+            shorter, longer = sorted((len(name), len(query)))
+            score = max(score, 0.7 + 0.3 * shorter / longer)
+        return round(score, 4)
+
+    def _add(self, name):
+        if name in self._names:
+            return
+        normalized = normalize_name(name)
+        grams = trigrams(normalized)
+        self._names[name] = (normalized, set(normalized.split()), grams)
+        self._by_normalized.setdefault(normalized, name)
+        for gram in grams:
+            self._by_trigram.setdefault(gram, set()).add(name)
+
+    def _remove(self, name):
+        entry = self._names.pop(name, None)
+        if entry is None:
+            return
+        if self._by_normalized.get(entry[0]) == name:
+            del self._by_normalized[entry[0]]
+            # Another habit may normalize the same (created before habits were de-duplicated)
+            for other, (normalized, _, _) in self._names.items():
+                if normalized == entry[0]:
+                    self._by_normalized[normalized] = other
+                    break
+        for gram in entry[2]:
+            names = self._by_trigram.get(gram)
+            if names is not None:
+                names.discard(name)
+                if not names:
+                    del self._by_trigram[gram]
@@ -0,0 +1,158 @@
+"""
+Idempotency keys for create endpoints.
+
+A client that may retry a POST (a flaky connection, the offline sync queue)
+sends an ``Idempotency-Key`` header. The first request with a key runs
+normally and its response is stored; a retry with the same key gets the
+stored response back instead of running again, so it can't create a second
+task. A key reused with a different request body is rejected (views that stream
+their body, like imports, are compared by its headers and length instead).
+
+Keys live in the idempotency_keys table, so every worker process sees them
+(and in multi-user mode each user's keys stay in their own shard). The store
+is bounded: keys expire after ZELDA_IDEMPOTENCY_TTL seconds (default a day)
+and only the newest ZELDA_IDEMPOTENCY_MAX_KEYS (default 10000) are kept.
+"""
+
+import hashlib
+import itertools
+import os
+import time
+from collections import namedtuple
+from functools import wraps
+
+from flask import jsonify, make_response, request
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+PRUNE_EVERY = 64     # new keys between prunes
+
+StoredResponse = namedtuple('StoredResponse', 'fingerprint status body')
+
+
+def create_table(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS idempotency_keys (
+            key TEXT PRIMARY KEY,
+            fingerprint TEXT NOT NULL,
+            status INTEGER,             -- NULL while the first request is still running
+            body TEXT,
+            created_at REAL NOT NULL
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idempotency_keys_created ON idempotency_keys (created_at)')
+
+
+class IdempotencyStore:
+    """Remembers responses by idempotency key in the app database"""
+
+    def __init__(self, connect, ttl=86400, max_keys=10000):
+        self.connect = connect
+        self.ttl = ttl
+        self.max_keys = max_keys
+        self._inserts = itertools.count(1)
+
+    @classmethod
+    def from_env(cls, connect):
+        return cls(connect,
+                   ttl=float(os.environ.get('ZELDA_IDEMPOTENCY_TTL', '86400')),
+                   max_keys=int(os.environ.get('ZELDA_IDEMPOTENCY_MAX_KEYS', '10000')))
+
+    def begin(self, key, fingerprint):
+        """Claim a key. Returns None if the request should run, else the StoredResponse
+        (status None means the first request with this key hasn't finished yet)."""
+        now = time.time()
+        conn = self.connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute(
+                'SELECT fingerprint, status, body, created_at FROM idempotency_keys WHERE key = ?', (key,)
+            ).fetchone()
+            if row is not None and row[3] >= now - self.ttl:
+                conn.commit()
+                return StoredResponse(*row[:3])
+            conn.execute('''
+                INSERT OR REPLACE INTO idempotency_keys (key, fingerprint, status, body, created_at)
+                VALUES (?, ?, NULL, NULL, ?)
+            ''', (key, fingerprint, now))
+            if next(self._inserts) % PRUNE_EVERY == 0:
+                self._prune(conn, now)
+            conn.commit()
+            return None
+        finally:
+            conn.close()
+
+    def finish(self, key, status, body):
+        """Store the response for a claimed key"""
+        self._execute('UPDATE idempotency_keys SET status = ?, body = ? WHERE key = ?', (status, body, key))
+
+    def abandon(self, key):
+        """Release a claimed key after a failure, so a retry runs again"""
+        self._execute('DELETE FROM idempotency_keys WHERE key = ? AND status IS NULL', (key,))
+
+    def _execute(self, sql, params):
+        conn = self.connect()
+        try:
+            conn.execute(sql, params)
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _prune(self, conn, now):
+        conn.execute('DELETE FROM idempotency_keys WHERE created_at < ?', (now - self.ttl,))
+        conn.execute('''
+            DELETE FROM idempotency_keys WHERE created_at <= (
+                SELECT created_at FROM idempotency_keys ORDER BY created_at DESC LIMIT 1 OFFSET ?
+            )
+        ''', (self.max_keys,))
+
+
+def request_fingerprint():
+    digest = hashlib.sha256(f"{request.method} {request.path}\n".encode())
+    digest.update(request.get_data())
+    return digest.hexdigest()
+
+
+def streamed_request_fingerprint():
+    """Fingerprint of a request whose body is streamed by the view: the body
+    isn't read, so only its query string, type and length are compared"""
+    digest = hashlib.sha256(f"{request.method} {request.full_path}\n".encode())
+    digest.update(f"{request.content_type}\n{request.content_length}".encode())
+    return digest.hexdigest()
+
+
+def idempotent(store, fingerprint=request_fingerprint):
+    """Decorator: honour an Idempotency-Key header on a view (requests without one run as usual)"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            key = request.headers.get(HEADER)
+            if not key:
+                return view(*args, **kwargs)
+            if len(key) > MAX_KEY_LENGTH:
+                return jsonify({'success': False, 'error': f'{HEADER} is too long'}), 400
+
+            request_hash = fingerprint()
+            stored = store.begin(key, request_hash)
+            if stored is not None:
+                if stored.fingerprint != request_hash:
+                    return jsonify({'success': False, 'error': f'{HEADER} was already used for a different request'}), 422
+                if stored.status is None:
+                    return jsonify({'success': False, 'error': f'A request with this {HEADER} is in progress'}), 409, {'Retry-After': '1'}
+                response = make_response(stored.body, stored.status)
+                response.mimetype = 'application/json'
+                response.headers['Idempotent-Replayed'] = 'true'
+                return response
+
+            try:
+                response = make_response(view(*args, **kwargs))
+            except Exception:
+                store.abandon(key)
+                raise
+            if response.status_code >= 500:
+                store.abandon(key)
+            else:
+                store.finish(key, response.status_code, response.get_data(as_text=True))
+            return response
+        return wrapper
+    return decorator
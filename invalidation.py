@@ -0,0 +1,95 @@
+"""
+Cross-process cache invalidation through the SQLite data version.
+
+Under a pre-fork server every worker keeps its own in-memory state (the
+habit name index, the reminder heap, dashboard counters). The triggers
+created by init_db() bump ``sync_state.version`` on every change to tasks,
+habits or habit_dates, whichever process makes it, so that one row is a
+cheap shared "something changed" signal.
+
+DataVersionWatcher reads it at most once per interval. A process's own
+writes are reported through saw() and don't count as changes, so callbacks
+only run when another process changed the data.
+"""
+
+import logging
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+
+class DataVersionWatcher:
+    """Run callbacks when another process changes the database"""
+
+    def __init__(self, read_version, interval=1.0):
+        self.read_version = read_version
+        self.interval = interval
+        self.version = None
+        self._callbacks = []
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def on_change(self, callback):
+        """Register ``callback()`` to run after a change made elsewhere"""
+        self._callbacks.append(callback)
+        return callback
+
+    def reset(self, version=None):
+        """Start from a known version (e.g. in a freshly forked worker)"""
+        with self._lock:
+            self.version = self.read_version() if version is None else version
+            self._next_check = time.monotonic() + self.interval
+
+    def after_fork(self):
+        """Drop the parent's polling thread and locks and start from the current version"""
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.reset()
+
+    def saw(self, before, after):
+        """Record a write made by this process that moved the version from before to after"""
+        with self._lock:
+            if self.version == before:
+                self.version = after
+
+    def check(self, force=False):
+        """Poll the version (rate limited). Returns True if callbacks ran."""
+        now = time.monotonic()
+        if not force and now < self._next_check:
+            return False
+        with self._lock:
+            if not force and now < self._next_check:
+                return False
+            self._next_check = now + self.interval
+            current = self.read_version()
+            changed = self.version is not None and current != self.version
+            self.version = current
+        if changed:
+            for callback in self._callbacks:
+                try:
+                    callback()
+                except Exception:
+                    log.exception("Invalidation callback %r failed", callback)
+        return changed
+
+    def start(self):
+        """Poll in a background thread (for processes that serve no requests)"""
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='zelda-invalidation', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.check(force=True)
+            except Exception:
+                log.exception("Data version check failed")
@@ -0,0 +1,170 @@
+"""
+Non-blocking structured logging.
+
+Request handlers log through the standard ``logging`` module, but the only
+handler on the root logger is a QueueHandler: a log call formats the message,
+puts the record on an in-memory queue and returns. A QueueListener thread
+does the actual (blocking) writes, so slow terminals or pipes never add
+request latency and lines from different threads never interleave. Forked
+worker processes get their own writer thread automatically.
+
+Configuration (arguments to configure_logging() override the environment):
+
+    ZELDA_LOG_LEVEL    default level, e.g. INFO (the default) or DEBUG
+    ZELDA_LOG_FORMAT   "text" (default) or "json" (one object per line)
+    ZELDA_LOG_LEVELS   per-module levels, e.g. "voice_assistant=DEBUG,werkzeug=WARNING"
+    ZELDA_LOG_SAMPLE   keep only a fraction of INFO/DEBUG records per module,
+                       e.g. "voice_assistant=0.1"
+
+A single high-volume call can also be sampled with ``extra={'sample': 0.01}``.
+Warnings and errors are never sampled.
+"""
+
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+
+TEXT_FORMAT = '%(asctime)s %(levelname)-7s %(name)s: %(message)s'
+
+# Attributes every LogRecord has; anything else was passed via extra=
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'sample'}
+
+_listener = None
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per record, including any extra= fields"""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'thread': record.threadName
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class SamplingFilter(logging.Filter):
+    """Drop a share of low-severity records before they are queued"""
+
+    def __init__(self, rates=None):
+        super().__init__()
+        self.rates = dict(rates or {})     # logger name prefix -> fraction kept
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = getattr(record, 'sample', None)
+        if rate is None:
+            rate = self._rate_for(record.name)
+        return rate >= 1 or random.random() < rate
+
+    def _rate_for(self, name):
+        while name:
+            if name in self.rates:
+                return self.rates[name]
+            name = name.rpartition('.')[0]
+        return 1.0
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that keeps the traceback separate from the message"""
+
+    _traceback_formatter = logging.Formatter()
+
+    def prepare(self, record):
+        # Merge args and render the traceback now, while the frames still exist;
+        # the writer's formatter (text or JSON) decides how to lay them out.
+        record = copy.copy(record)
+        record.message = record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = self._traceback_formatter.formatException(record.exc_info)
+        record.exc_info = None
+        return record
+
+
+def _parse_pairs(spec, convert):
+    pairs = {}
+    for item in (spec or '').split(','):
+        name, sep, value = item.partition('=')
+        if sep and name.strip():
+            pairs[name.strip()] = convert(value.strip())
+    return pairs
+
+
+def configure_logging(level=None, json_output=None, module_levels=None, sample=None, stream=None):
+    """Route all logging through a background writer thread. Safe to call more than once."""
+    global _listener
+    level = level or os.environ.get('ZELDA_LOG_LEVEL', 'INFO')
+    if json_output is None:
+        json_output = os.environ.get('ZELDA_LOG_FORMAT', 'text') == 'json'
+    if module_levels is None:
+        module_levels = _parse_pairs(os.environ.get('ZELDA_LOG_LEVELS'), str.upper)
+    if sample is None:
+        sample = _parse_pairs(os.environ.get('ZELDA_LOG_SAMPLE'), float)
+
+    stop_logging()
+
+    writer = logging.StreamHandler(stream or sys.stderr)
+    writer.setFormatter(JSONFormatter() if json_output else logging.Formatter(TEXT_FORMAT))
+
+    log_queue = queue.SimpleQueue()
+    handler = _QueueHandler(log_queue)
+    handler.addFilter(SamplingFilter(sample))
+
+    root = logging.getLogger()
+    for old in [h for h in root.handlers if isinstance(h, _QueueHandler)]:
+        root.removeHandler(old)
+    root.addHandler(handler)
+    root.setLevel(level)
+    for name, module_level in module_levels.items():
+        logging.getLogger(name).setLevel(module_level)
+
+    _listener = logging.handlers.QueueListener(log_queue, writer, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+
+def _restart_after_fork():
+    # The writer thread doesn't exist in a forked child; give the child its
+    # own queue and writer so records logged by workers aren't stranded.
+    global _listener
+    if _listener is None:
+        return
+    handler = next((h for h in logging.getLogger().handlers if isinstance(h, _QueueHandler)), None)
+    if handler is None:
+        _listener = None
+        return
+    handler.queue = queue.SimpleQueue()
+    _listener = logging.handlers.QueueListener(handler.queue, *_listener.handlers, respect_handler_level=True)
+    _listener.start()
+
+
+def stop_logging():
+    """Flush queued records and stop the writer thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(stop_logging)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_restart_after_fork)
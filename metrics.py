@@ -0,0 +1,364 @@
+"""
+Prometheus-style metrics for Zelda.
+
+Counters and histograms are cheap enough to leave on all the time: every
+thread writes into its own preallocated shard (a list of bucket counts), so
+recording a value never takes a lock. A scrape of ``/metrics`` sums the shards.
+Shards of threads that have exited are folded into a single retired shard, so
+per-request threads do not make the registry grow without bound.
+
+What is recorded:
+
+    zelda_http_request_duration_seconds   per route, method and status
+    zelda_db_queries_per_request          SQLite statements per request
+    zelda_db_time_per_request_seconds     time spent in SQLite per request
+    zelda_db_query_duration_seconds       per statement type (via connect_db())
+    zelda_ollama_duration_seconds         load / prompt_eval / eval / overhead / total
+    zelda_ollama_tokens_total             prompt and completion tokens
+    zelda_stage_duration_seconds          voice/chat pipeline stages
+    zelda_cache_*                         hit/miss counts and ratios
+"""
+
+import bisect
+import contextvars
+import sqlite3
+import threading
+import time
+
+from flask import g, request, Response
+
+# Seconds; covers sub-millisecond SQLite calls up to slow LLM replies
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class _Metric:
+    """Common shard bookkeeping: one dict of label values -> cells per thread"""
+
+    kind = None
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._shards = []            # (thread, shard) pairs
+        self._retired = {}
+        self._lock = threading.Lock()
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = {}
+            with self._lock:
+                self._shards.append((threading.current_thread(), shard))
+                if len(self._shards) > 2 * threading.active_count() + 16:
+                    self._retire_dead()
+        return shard
+
+    def _retire_dead(self):
+        live = []
+        for thread, shard in self._shards:
+            if thread.is_alive():
+                live.append((thread, shard))
+            else:
+                self._merge(self._retired, shard)
+        self._shards = live
+
+    def _collect(self):
+        """Sum of every shard, keyed by label values"""
+        with self._lock:
+            self._retire_dead()
+            total = {}
+            self._merge(total, self._retired)
+            for _, shard in self._shards:
+                self._merge(total, dict(shard))
+        return total
+
+    @staticmethod
+    def _merge(into, shard):
+        for labels, cells in shard.items():
+            current = into.get(labels)
+            if current is None:
+                into[labels] = list(cells)
+            else:
+                for i, value in enumerate(cells):
+                    current[i] += value
+
+    def _label_text(self, labels, extra=None):
+        pairs = list(zip(self.labelnames, labels))
+        if extra:
+            pairs.append(extra)
+        if not pairs:
+            return ''
+        return '{' + ','.join(f'{k}="{_escape(str(v))}"' for k, v in pairs) + '}'
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for labels, cells in sorted(self._collect().items()):
+            lines.extend(self._render_cells(labels, cells))
+        return lines
+
+
+class Counter(_Metric):
+    """Monotonic counter"""
+
+    kind = 'counter'
+
+    def inc(self, *labels, amount=1):
+        shard = self._shard()
+        cells = shard.get(labels)
+        if cells is None:
+            cells = shard[labels] = [0]
+        cells[0] += amount
+
+    def _render_cells(self, labels, cells):
+        return [f"{self.name}{self._label_text(labels)} {_number(cells[0])}"]
+
+
+class Histogram(_Metric):
+    """Histogram with fixed, preallocated buckets"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *labels):
+        shard = self._shard()
+        cells = shard.get(labels)
+        if cells is None:
+            # One count per bucket plus +Inf, then sum and count
+            cells = shard[labels] = [0] * (len(self.buckets) + 3)
+        cells[bisect.bisect_left(self.buckets, value)] += 1
+        cells[-2] += value
+        cells[-1] += 1
+
+    def _render_cells(self, labels, cells):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), cells):
+            cumulative += count
+            le = '+Inf' if bound == float('inf') else _number(bound)
+            lines.append(f"{self.name}_bucket{self._label_text(labels, ('le', le))} {cumulative}")
+        lines.append(f"{self.name}_sum{self._label_text(labels)} {_number(cells[-2])}")
+        lines.append(f"{self.name}_count{self._label_text(labels)} {cells[-1]}")
+        return lines
+
+
+class GaugeFunc:
+    """Gauge (or counter) read from a callback at scrape time.
+
+    The callback returns a number, or a dict of label-value tuples -> number.
+    """
+
+    def __init__(self, name, help, callback, labelnames=(), kind='gauge'):
+        self.name = name
+        self.help = help
+        self.callback = callback
+        self.labelnames = tuple(labelnames)
+        self.kind = kind
+
+    def render(self):
+        try:
+            values = self.callback()
+        except Exception:
+            return []
+        if not isinstance(values, dict):
+            values = {(): values}
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for labels, value in sorted(values.items()):
+            label_text = ','.join(f'{k}="{_escape(str(v))}"' for k, v in zip(self.labelnames, labels))
+            lines.append(f"{self.name}{{{label_text}}} {_number(value)}" if label_text else f"{self.name} {_number(value)}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric, replace=False):
+        """Register a metric (returns the existing one if the name is taken, unless replace)"""
+        if replace:
+            self._metrics[metric.name] = metric
+            return metric
+        return self._metrics.setdefault(metric.name, metric)
+
+    def render(self):
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return value.replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+def _number(value):
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+REGISTRY = Registry()
+
+http_request_duration = REGISTRY.register(Histogram(
+    'zelda_http_request_duration_seconds', 'HTTP request latency', ('route', 'method', 'status')))
+db_queries_per_request = REGISTRY.register(Histogram(
+    'zelda_db_queries_per_request', 'SQLite statements executed per HTTP request', ('route',), QUERY_COUNT_BUCKETS))
+db_time_per_request = REGISTRY.register(Histogram(
+    'zelda_db_time_per_request_seconds', 'Time spent in SQLite per HTTP request', ('route',)))
+db_query_duration = REGISTRY.register(Histogram(
+    'zelda_db_query_duration_seconds', 'SQLite statement latency', ('operation',)))
+ollama_duration = REGISTRY.register(Histogram(
+    'zelda_ollama_duration_seconds', 'Ollama request time, split using the response timing fields', ('endpoint', 'phase')))
+ollama_requests = REGISTRY.register(Counter(
+    'zelda_ollama_requests_total', 'Ollama requests by outcome', ('endpoint', 'outcome')))
+ollama_tokens = REGISTRY.register(Counter(
+    'zelda_ollama_tokens_total', 'Tokens processed by Ollama', ('endpoint', 'kind')))
+stage_duration = REGISTRY.register(Histogram(
+    'zelda_stage_duration_seconds', 'Voice and chat pipeline stage latency', ('stage',)))
+
+
+# --- SQLite instrumentation ---
+
+# [statements, seconds] for the current request, when one is being measured
+_request_queries = contextvars.ContextVar('zelda_request_queries', default=None)
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    def execute(self, sql, parameters=()):
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            _record_query(sql, time.perf_counter() - start)
+
+    def executemany(self, sql, seq_of_parameters):
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            _record_query(sql, time.perf_counter() - start)
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """sqlite3 connection that times every statement (pass as ``factory=``)"""
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+def _record_query(sql, elapsed):
+    words = sql.split(None, 1)
+    operation = words[0].upper() if words else 'EMPTY'
+    db_query_duration.observe(elapsed, operation)
+    counts = _request_queries.get()
+    if counts is not None:
+        counts[0] += 1
+        counts[1] += elapsed
+
+
+# --- Ollama ---
+
+def record_ollama(endpoint, data, elapsed):
+    """Record an Ollama /api/generate response.
+
+    Ollama reports its own timings in nanoseconds; the remainder of the wall
+    time (HTTP and queueing) is recorded as the ``overhead`` phase.
+    """
+    ollama_requests.inc(endpoint, 'ok')
+    reported = 0.0
+    for field, phase in (('load_duration', 'load'), ('prompt_eval_duration', 'prompt_eval'), ('eval_duration', 'eval')):
+        if data.get(field) is not None:
+            seconds = data[field] / 1e9
+            reported += seconds
+            ollama_duration.observe(seconds, endpoint, phase)
+    ollama_duration.observe(elapsed, endpoint, 'total')
+    if reported:
+        ollama_duration.observe(max(0.0, elapsed - reported), endpoint, 'overhead')
+    if data.get('prompt_eval_count') is not None:
+        ollama_tokens.inc(endpoint, 'prompt', amount=data['prompt_eval_count'])
+    if data.get('eval_count') is not None:
+        ollama_tokens.inc(endpoint, 'completion', amount=data['eval_count'])
+
+
+def record_ollama_failure(endpoint, outcome):
+    ollama_requests.inc(endpoint, outcome)
+
+
+# --- Flask integration ---
+
+def _cache_stats(app):
+    """{cache name: stats dict} for every cache that is currently loaded"""
+    import sys
+    caches = {}
+    page_cache = app.extensions.get('page_cache')
+    if page_cache is not None:
+        caches['page'] = page_cache.stats()
+    voice = sys.modules.get('voice_assistant')
+    if voice is not None:
+        caches['transcription'] = voice.transcription_cache.stats()
+    return caches
+
+
+_stage_listener_added = False
+
+
+def init_app(app, registry=REGISTRY):
+    """Time every request and serve the registry at /metrics"""
+    from stages import add_stage_listener
+
+    @app.before_request
+    def _start_timer():
+        g._metrics_start = time.perf_counter()
+        g._metrics_queries = [0, 0.0]
+        g._metrics_token = _request_queries.set(g._metrics_queries)
+
+    @app.after_request
+    def _observe(response):
+        start = g.get('_metrics_start')
+        if start is not None:
+            route = request.url_rule.rule if request.url_rule else 'unmatched'
+            http_request_duration.observe(time.perf_counter() - start, route, request.method, str(response.status_code))
+            queries, seconds = g._metrics_queries
+            db_queries_per_request.observe(queries, route)
+            db_time_per_request.observe(seconds, route)
+        return response
+
+    @app.teardown_request
+    def _stop_counting(exc):
+        token = g.pop('_metrics_token', None)
+        if token is not None:
+            _request_queries.reset(token)
+
+    def metrics():
+        return Response(registry.render(), content_type=CONTENT_TYPE)
+
+    app.add_url_rule('/metrics', 'metrics', metrics)
+    global _stage_listener_added
+    if not _stage_listener_added:
+        add_stage_listener(lambda name, seconds: stage_duration.observe(seconds, name))
+        _stage_listener_added = True
+
+    stats = lambda: _cache_stats(app)
+    registry.register(GaugeFunc(
+        'zelda_cache_hits_total', 'Cache hits', lambda: {(name,): s['hits'] for name, s in stats().items()},
+        ('cache',), kind='counter'), replace=True)
+    registry.register(GaugeFunc(
+        'zelda_cache_misses_total', 'Cache misses', lambda: {(name,): s['misses'] for name, s in stats().items()},
+        ('cache',), kind='counter'), replace=True)
+    registry.register(GaugeFunc(
+        'zelda_cache_hit_ratio', 'Cache hit ratio since start', lambda: {(name,): s['hit_ratio'] for name, s in stats().items()},
+        ('cache',)), replace=True)
+    app.extensions['metrics'] = registry
@@ -0,0 +1,113 @@
+"""
+Rendered-page cache for the static page routes.
+
+The page templates (home, habits, chat, ...) contain no per-request data, so
+each one is rendered once and the bytes, a gzip variant and an ETag are kept in
+memory. Browsers revalidate with If-None-Match/If-Modified-Since and get a 304.
+
+In debug mode the template file's mtime (and the asset manifest) is checked on
+every request, so edits show up without a restart.
+"""
+
+import gzip
+import hashlib
+import os
+import threading
+from datetime import datetime, timezone
+
+from flask import render_template, request, Response
+
+
+class CachedPage:
+    def __init__(self, body, source_mtime, assets_version):
+        self.body = body
+        self.gzipped = gzip.compress(body, compresslevel=6, mtime=0)
+        self.etag = hashlib.sha256(body).hexdigest()[:16]
+        self.last_modified = datetime.now(timezone.utc).replace(microsecond=0)
+        self.source_mtime = source_mtime
+        self.assets_version = assets_version
+
+
+class PageCache:
+    """Render each page template once and serve the cached bytes"""
+
+    def __init__(self, app=None):
+        self.app = None
+        self._pages = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['page_cache'] = self
+
+    def render(self, template_name):
+        """Response for a page template, re-rendered only when it changed"""
+        page = self._pages.get(template_name)
+        if page is None or self._is_stale(template_name, page):
+            self.misses += 1
+            page = self._render(template_name)
+        else:
+            self.hits += 1
+
+        # Each encoding gets its own strong ETag
+        use_gzip = bool(request.accept_encodings['gzip'])
+        etag = f"{page.etag}-gz" if use_gzip else page.etag
+
+        if request.if_none_match.contains(etag) or (
+            not request.if_none_match and request.if_modified_since
+            and request.if_modified_since >= page.last_modified
+        ):
+            response = Response(status=304)
+        else:
+            response = Response(page.gzipped if use_gzip else page.body, content_type='text/html; charset=utf-8')
+            if use_gzip:
+                response.headers['Content-Encoding'] = 'gzip'
+        response.headers['ETag'] = f'"{etag}"'
+        response.last_modified = page.last_modified
+        response.headers['Vary'] = 'Accept-Encoding'
+        # Pages must be revalidated so new deploys (and new asset hashes) show up
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+
+    def clear(self):
+        with self._lock:
+            self._pages.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'pages': len(self._pages),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+    def _assets_version(self):
+        assets = self.app.extensions.get('assets')
+        if assets is None:
+            return 0
+        if self.app.debug:
+            assets.refresh()
+        return assets.version
+
+    def _source_mtime(self, template_name):
+        _, filename, _ = self.app.jinja_loader.get_source(self.app.jinja_env, template_name)
+        return os.path.getmtime(filename) if filename else None
+
+    def _is_stale(self, template_name, page):
+        if page.assets_version != self._assets_version():
+            return True
+        if self.app.debug or self.app.config.get('TEMPLATES_AUTO_RELOAD'):
+            return self._source_mtime(template_name) != page.source_mtime
+        return False
+
+    def _render(self, template_name):
+        with self._lock:
+            body = render_template(template_name).encode('utf-8')
+            page = CachedPage(body, self._source_mtime(template_name), self._assets_version())
+            self._pages[template_name] = page
+            return page
@@ -0,0 +1,251 @@
+"""
+On-demand request profiling.
+
+Nothing is installed unless profiling is configured, so a normal deployment
+pays nothing. When it is, a request is profiled if either
+
+* it carries the secret in an ``X-Zelda-Profile`` header (never in the
+  URL, where it would end up in access logs and browser history), or
+* it is picked by random sampling (ZELDA_PROFILE_SAMPLE_RATE), capped at
+  ZELDA_PROFILE_MAX_PER_MINUTE profiles per minute.
+
+Two profilers are available (``X-Zelda-Profile-Mode``, default
+ZELDA_PROFILE_MODE):
+
+    cprofile   deterministic, saved as a .prof file for pstats/snakeviz
+    sample     stack sampling every ZELDA_PROFILE_INTERVAL_MS, saved as a
+               .speedscope.json file (open at https://www.speedscope.app)
+
+Only one request per process is profiled with cProfile at a time; others
+profiled meanwhile are sampled instead. Streamed responses are passed on
+chunk by chunk and the profile ends when the server closes the response.
+
+Profiles are written to ZELDA_PROFILE_DIR (default ./profiles).
+"""
+
+import cProfile
+import hmac
+import json
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+from datetime import datetime
+
+from werkzeug.wsgi import ClosingIterator
+
+log = logging.getLogger(__name__)
+
+HEADER = 'HTTP_X_ZELDA_PROFILE'
+MODE_HEADER = 'HTTP_X_ZELDA_PROFILE_MODE'
+MODES = ('cprofile', 'sample')
+
+
+class StackSampler:
+    """Sample one thread's Python stack on a timer (a poor man's py-spy)"""
+
+    def __init__(self, thread_id, interval=0.001):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.frames = []            # speedscope frame dicts
+        self._frame_index = {}
+        self.samples = []           # lists of frame indexes, root first
+        self.weights = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='zelda-profile-sampler', daemon=True)
+
+    def start(self):
+        self.started = time.perf_counter()
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.duration = time.perf_counter() - self.started
+
+    def _run(self):
+        # The sampler needs the GIL, so while the target runs pure Python it
+        # gets in about every sys.getswitchinterval(); each sample is weighted
+        # by the real time since the previous one, so the profile stays proportional.
+        last = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            now = time.perf_counter()
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(self._index(frame.f_code))
+                frame = frame.f_back
+            stack.reverse()
+            self.samples.append(stack)
+            self.weights.append(now - last)
+            last = now
+
+    def _index(self, code):
+        key = (code.co_filename, code.co_firstlineno, code.co_name)
+        index = self._frame_index.get(key)
+        if index is None:
+            index = self._frame_index[key] = len(self.frames)
+            self.frames.append({'name': code.co_name, 'file': code.co_filename, 'line': code.co_firstlineno})
+        return index
+
+    def speedscope(self, name):
+        return {
+            '$schema': 'https://www.speedscope.app/file-format-schema.json',
+            'name': name,
+            'exporter': 'zelda',
+            'shared': {'frames': self.frames},
+            'profiles': [{
+                'type': 'sampled',
+                'name': name,
+                'unit': 'seconds',
+                'startValue': 0,
+                'endValue': self.duration,
+                'samples': self.samples,
+                'weights': self.weights
+            }]
+        }
+
+
+class RequestProfiler:
+    """WSGI middleware that profiles selected requests"""
+
+    def __init__(self, output_dir='profiles', secret=None, sample_rate=0.0, max_per_minute=6,
+                 mode='cprofile', interval_ms=1.0):
+        self.output_dir = output_dir
+        self.secret = secret or None
+        self.sample_rate = sample_rate
+        self.max_per_minute = max_per_minute
+        self.mode = mode if mode in MODES else 'cprofile'
+        self.interval = interval_ms / 1000
+        self.wsgi_app = None
+        self._window_start = 0.0
+        self._window_count = 0
+        self._lock = threading.Lock()
+        # One cProfile at a time: Python 3.12+ allows only one active profiler
+        self._cprofile_lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            output_dir=os.environ.get('ZELDA_PROFILE_DIR', 'profiles'),
+            secret=os.environ.get('ZELDA_PROFILE_SECRET'),
+            sample_rate=float(os.environ.get('ZELDA_PROFILE_SAMPLE_RATE', '0')),
+            max_per_minute=int(os.environ.get('ZELDA_PROFILE_MAX_PER_MINUTE', '6')),
+            mode=os.environ.get('ZELDA_PROFILE_MODE', 'cprofile'),
+            interval_ms=float(os.environ.get('ZELDA_PROFILE_INTERVAL_MS', '1'))
+        )
+
+    @property
+    def enabled(self):
+        return bool(self.secret) or self.sample_rate > 0
+
+    def init_app(self, app):
+        """Wrap the app's WSGI callable, but only if profiling is configured"""
+        if not self.enabled:
+            return
+        os.makedirs(self.output_dir, exist_ok=True)
+        self.wsgi_app = app.wsgi_app
+        app.wsgi_app = self
+        app.extensions['profiler'] = self
+        log.info("Request profiling enabled (%s, sample rate %s) writing to %s",
+                 'secret' if self.secret else 'no secret', self.sample_rate, self.output_dir)
+
+    def __call__(self, environ, start_response):
+        requested, mode = self._requested(environ)
+        if not requested and not self._sampled():
+            return self.wsgi_app(environ, start_response)
+        return self._profile(environ, start_response, mode, explicit=requested)
+
+    def _requested(self, environ):
+        """(secret matched, profiler mode) for this request"""
+        if not self.secret:
+            return False, self.mode
+        token = environ.get(HEADER)
+        mode = environ.get(MODE_HEADER)
+        if token is None or not hmac.compare_digest(token.encode(), self.secret.encode()):
+            return False, self.mode
+        return True, mode if mode in MODES else self.mode
+
+    def _sampled(self):
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            return False
+        with self._lock:
+            now = time.monotonic()
+            if now - self._window_start >= 60:
+                self._window_start, self._window_count = now, 0
+            if self._window_count >= self.max_per_minute:
+                return False
+            self._window_count += 1
+            return True
+
+    def _start_profiler(self, mode):
+        """(profiler, mode) for a request; cprofile falls back to sample while another request holds it"""
+        if mode == 'cprofile' and self._cprofile_lock.acquire(blocking=False):
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+                return profiler, mode
+            except ValueError:
+                # Another profiler (or debugger) is active in this process
+                self._cprofile_lock.release()
+        profiler = StackSampler(threading.get_ident(), self.interval)
+        profiler.start()
+        return profiler, 'sample'
+
+    def _stop_profiler(self, profiler, mode):
+        if mode == 'sample':
+            profiler.stop()
+        else:
+            profiler.disable()
+            self._cprofile_lock.release()
+
+    def _profile(self, environ, start_response, mode, explicit):
+        start = time.perf_counter()
+        profiler, mode = self._start_profiler(mode)
+        filename = self._filename(environ, mode)
+        status_holder = {}
+
+        def capture_start_response(status, headers, exc_info=None):
+            status_holder['status'] = status
+            if explicit:
+                headers = list(headers) + [('X-Zelda-Profile-File', filename)]
+            return start_response(status, headers, exc_info)
+
+        def finish():
+            self._stop_profiler(profiler, mode)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            self._save(profiler, mode, filename, environ)
+            log.info("Profiled %s %s in %.1fms -> %s", environ.get('REQUEST_METHOD'), environ.get('PATH_INFO'),
+                     elapsed_ms, filename, extra={'status': status_holder.get('status')})
+
+        try:
+            iterable = self.wsgi_app(environ, capture_start_response)
+        except BaseException:
+            finish()
+            raise
+        # The profile keeps running while the server iterates the body, so
+        # streamed responses are covered without buffering them
+        return ClosingIterator(iterable, finish)
+
+    def _filename(self, environ, mode):
+        path = re.sub(r'[^A-Za-z0-9]+', '_', environ.get('PATH_INFO', '/')).strip('_') or 'root'
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+        suffix = '.speedscope.json' if mode == 'sample' else '.prof'
+        return f"{stamp}-{environ.get('REQUEST_METHOD', 'GET')}-{path}{suffix}"
+
+    def _save(self, profiler, mode, filename, environ):
+        path = os.path.join(self.output_dir, filename)
+        try:
+            if mode == 'sample':
+                name = f"{environ.get('REQUEST_METHOD')} {environ.get('PATH_INFO')}"
+                with open(path, 'w') as f:
+                    json.dump(profiler.speedscope(name), f)
+            else:
+                profiler.dump_stats(path)
+        except OSError:
+            log.exception("Could not save profile %s", path)
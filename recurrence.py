@@ -0,0 +1,252 @@
+"""
+Recurring tasks.
+
+A recurring task is one tasks row whose ``recurrence`` column holds its rule,
+in an RRULE-like form:
+
+    FREQ=DAILY;INTERVAL=2;START=2026-10-19
+    FREQ=WEEKLY;BYDAY=MO,TH;START=2026-10-19;UNTIL=2026-12-31
+    FREQ=MONTHLY;BYMONTHDAY=15;COUNT=6;START=2026-10-19
+
+Occurrences are never stored up front. occurrences() expands a rule lazily
+for whatever date window is asked for, jumping straight to the window
+instead of stepping from the start date when it can (rules without COUNT).
+Only completed occurrences are written, one task_occurrences row each, so a
+daily task costs one row per day it was actually done.
+
+rule_from_text() recognizes spoken and typed phrases such as "every day",
+"every other week", "on weekdays", "on Mondays" or "every Monday and
+Thursday".
+"""
+
+import calendar
+import math
+import re
+from collections import namedtuple
+from datetime import date, timedelta
+
+FREQUENCIES = ('DAILY', 'WEEKLY', 'MONTHLY')
+WEEKDAYS = ('MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU')
+DAY_NAMES = ('monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday')
+MAX_INTERVAL = 366
+
+Rule = namedtuple('Rule', 'freq interval byday bymonthday start until count')
+
+
+def create_table(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS task_occurrences (
+            task_id INTEGER NOT NULL,
+            date TEXT NOT NULL,             -- the occurrence (YYYY-MM-DD)
+            completed_at TEXT NOT NULL,
+            PRIMARY KEY (task_id, date)
+        )
+    ''')
+
+
+# --- Rules ---
+
+def _parse_date(value):
+    value = value.strip()
+    if len(value) == 8 and value.isdigit():
+        value = f'{value[:4]}-{value[4:6]}-{value[6:]}'
+    return date.fromisoformat(value[:10])
+
+
+def parse(text, default_start=None):
+    """Rule from its string form. Raises ValueError for anything it doesn't understand."""
+    text = text.strip().upper()
+    if text.startswith('RRULE:'):
+        text = text[len('RRULE:'):]
+    parts = {}
+    for item in filter(None, text.split(';')):
+        name, sep, value = item.partition('=')
+        if not sep:
+            raise ValueError(f'invalid recurrence part {item!r}')
+        parts[name.strip()] = value.strip()
+
+    freq = parts.pop('FREQ', None)
+    if freq not in FREQUENCIES:
+        raise ValueError(f'recurrence FREQ must be one of {", ".join(FREQUENCIES)}')
+    interval = int(parts.pop('INTERVAL', '1'))
+    if not 1 <= interval <= MAX_INTERVAL:
+        raise ValueError('recurrence INTERVAL out of range')
+    byday = ()
+    if 'BYDAY' in parts:
+        try:
+            byday = tuple(sorted({WEEKDAYS.index(day.strip()) for day in parts.pop('BYDAY').split(',')}))
+        except ValueError:
+            raise ValueError('recurrence BYDAY takes MO,TU,WE,TH,FR,SA,SU') from None
+        if freq != 'WEEKLY':
+            raise ValueError('recurrence BYDAY is only supported with FREQ=WEEKLY')
+    bymonthday = None
+    if 'BYMONTHDAY' in parts:
+        bymonthday = int(parts.pop('BYMONTHDAY'))
+        if freq != 'MONTHLY' or not 1 <= bymonthday <= 31:
+            raise ValueError('recurrence BYMONTHDAY takes 1-31 with FREQ=MONTHLY')
+    start = parts.pop('START', None) or parts.pop('DTSTART', None)
+    start = _parse_date(start) if start else (default_start or date.today())
+    if bymonthday and bymonthday > _longest_month(start.month, interval):
+        # e.g. day 31 every 12 months from February would never occur
+        raise ValueError(f'recurrence BYMONTHDAY={bymonthday} never falls in the months this rule repeats in')
+    until = _parse_date(parts.pop('UNTIL')) if 'UNTIL' in parts else None
+    count = int(parts.pop('COUNT')) if 'COUNT' in parts else None
+    if count is not None and count < 1:
+        raise ValueError('recurrence COUNT must be positive')
+    if parts:
+        raise ValueError(f'unsupported recurrence parts: {", ".join(sorted(parts))}')
+    return Rule(freq, interval, byday, bymonthday, start, until, count)
+
+
+def _longest_month(first_month, interval):
+    """Most days any month reached from first_month in steps of interval months can have"""
+    months = {(first_month - 1 + k * interval) % 12 + 1 for k in range(12)}
+    return max(29 if month == 2 else calendar.monthrange(2001, month)[1] for month in months)
+
+
+def format_rule(rule):
+    parts = [f'FREQ={rule.freq}']
+    if rule.interval != 1:
+        parts.append(f'INTERVAL={rule.interval}')
+    if rule.byday:
+        parts.append('BYDAY=' + ','.join(WEEKDAYS[day] for day in rule.byday))
+    if rule.bymonthday:
+        parts.append(f'BYMONTHDAY={rule.bymonthday}')
+    if rule.count:
+        parts.append(f'COUNT={rule.count}')
+    if rule.until:
+        parts.append(f'UNTIL={rule.until.isoformat()}')
+    parts.append(f'START={rule.start.isoformat()}')
+    return ';'.join(parts)
+
+
+def describe(rule):
+    """Short English description ("every 2 weeks on Monday, Thursday")"""
+    unit = {'DAILY': 'day', 'WEEKLY': 'week', 'MONTHLY': 'month'}[rule.freq]
+    text = f'every {unit}' if rule.interval == 1 else f'every {rule.interval} {unit}s'
+    if rule.byday == (0, 1, 2, 3, 4) and rule.interval == 1:
+        text = 'every weekday'
+    elif rule.byday:
+        text += ' on ' + ', '.join(DAY_NAMES[day].title() for day in rule.byday)
+    if rule.bymonthday:
+        text += f' on day {rule.bymonthday}'
+    return text
+
+
+# --- Expansion ---
+
+def _candidates(rule, window_start):
+    """Possible occurrence dates in order, ignoring UNTIL and COUNT. Without a
+    COUNT there is nothing to number, so it starts near window_start."""
+    start = rule.start
+    skip = rule.count is None and window_start is not None and window_start > start
+    if rule.freq == 'DAILY':
+        n = math.ceil((window_start - start).days / rule.interval) if skip else 0
+        while True:
+            yield start + timedelta(days=n * rule.interval)
+            n += 1
+    elif rule.freq == 'WEEKLY':
+        days = rule.byday or (start.weekday(),)
+        monday = start - timedelta(days=start.weekday())
+        period = (window_start - monday).days // (7 * rule.interval) if skip else 0
+        while True:
+            week = monday + timedelta(weeks=period * rule.interval)
+            for day in days:
+                candidate = week + timedelta(days=day)
+                if candidate >= start:
+                    yield candidate
+            period += 1
+    else:
+        day = rule.bymonthday or start.day
+        months = start.year * 12 + start.month - 1
+        period = 0
+        if skip:
+            target = window_start.year * 12 + window_start.month - 1
+            period = max(0, (target - months) // rule.interval)
+        # The months and leap years reached repeat every 400 years, so a rule
+        # that misses for that long (Feb 29 in odd years only) never occurs
+        give_up = 4800 // math.gcd(rule.interval, 4800)
+        misses = 0
+        while misses < give_up:
+            year, month = divmod(months + period * rule.interval, 12)
+            # Months without the day (Feb 30) are skipped, as in RFC 5545
+            if day <= calendar.monthrange(year, month + 1)[1]:
+                misses = 0
+                candidate = date(year, month + 1, day)
+                if candidate >= start:
+                    yield candidate
+            else:
+                misses += 1
+            period += 1
+
+
+def occurrences(rule, window_start=None, window_end=None):
+    """Yield the rule's occurrence dates from window_start to window_end (inclusive).
+
+    Infinite when neither the window nor the rule ends it; slice it.
+    """
+    seen = 0
+    for candidate in _candidates(rule, window_start):
+        if rule.count is not None:
+            seen += 1
+            if seen > rule.count:
+                return
+        if (rule.until and candidate > rule.until) or (window_end and candidate > window_end):
+            return
+        if window_start is None or candidate >= window_start:
+            yield candidate
+
+
+def is_occurrence(rule, day):
+    return next(occurrences(rule, day, day), None) == day
+
+
+def latest_occurrence(rule, on_or_before):
+    """Last occurrence on or before a day (scanning back at most a year and a month), else None"""
+    window_start = max(rule.start, on_or_before - timedelta(days=400))
+    latest = None
+    for latest in occurrences(rule, window_start, on_or_before):
+        pass
+    return latest
+
+
+# --- Natural language ---
+
+_DAY = r'(?:mon|tues|wednes|thurs|fri|satur|sun)days?'
+_DAYS = r'(?:mon|tues|wednes|thurs|fri|satur|sun)days'
+# Only phrases that clearly repeat: "every"/"each", or a plural day ("on
+# Mondays"). "On Monday" is one Monday, and "the weekly report" is a report.
+_PHRASES = [
+    (re.compile(r'\b(?:every|each)\s+weekday\b|\bon\s+weekdays\b', re.I),
+     lambda m: 'FREQ=WEEKLY;BYDAY=MO,TU,WE,TH,FR'),
+    (re.compile(rf'\b(?:every|each)\s+{_DAY}(?:\s*(?:,|and|&|,\s*and)\s*{_DAY})*'
+                rf'|\bon\s+{_DAYS}(?:\s*(?:,|and|&|,\s*and)\s*{_DAYS})*\b', re.I),
+     lambda m: 'FREQ=WEEKLY;BYDAY=' + ','.join(name[:2].upper() for name in re.findall(_DAY, m.group(0), re.I))),
+    (re.compile(r'\b(?:every|each)\s+(other\s+|\d+\s+)?days?\b', re.I),
+     lambda m: 'FREQ=DAILY' + _interval(m.group(1))),
+    (re.compile(r'\b(?:every|each)\s+(other\s+|\d+\s+)?weeks?\b', re.I),
+     lambda m: 'FREQ=WEEKLY' + _interval(m.group(1))),
+    (re.compile(r'\b(?:every|each)\s+(other\s+|\d+\s+)?months?\b', re.I),
+     lambda m: 'FREQ=MONTHLY' + _interval(m.group(1))),
+]
+
+
+def _interval(text):
+    text = (text or '').strip().lower()
+    if text == 'other':
+        return ';INTERVAL=2'
+    if text.isdigit() and int(text) > 1:
+        return f';INTERVAL={min(int(text), MAX_INTERVAL)}'
+    return ''
+
+
+def rule_from_text(text, start=None):
+    """(rule string, text without the recurrence phrase) for a phrase like
+    "water the plants every Monday", or (None, text) if it doesn't recur."""
+    for pattern, build in _PHRASES:
+        match = pattern.search(text)
+        if match:
+            rule = parse(build(match), default_start=start)
+            rest = (text[:match.start()] + text[match.end():])
+            return format_rule(rule), ' '.join(rest.split()).strip(' ,.')
+    return None, text
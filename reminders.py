@@ -0,0 +1,302 @@
+"""
+Due-date reminders for tasks.
+
+Upcoming due tasks are loaded once into a min-heap keyed by reminder time. After
+that the scheduler is kept in sync by hooks on the task write paths in app.py
+(create, complete, delete) and by the task change log below, so the tasks
+table is never scanned again. A single timer
+thread sleeps until the earliest reminder is due and hands it to a sink.
+
+Cancelling or rescheduling a task only drops its entry from a dict; the stale
+heap entry is skipped when it surfaces, and the heap is compacted once stale
+entries outnumber live ones.
+
+Writes made by other processes (other gunicorn workers, or whichever worker
+serves a user's shard) reach the scheduler through the task_changes log:
+triggers append the id of every task whose title, due date or completion
+changes, and ReminderFollower applies just those tasks, for each database
+whose files changed since it last looked.
+"""
+
+import heapq
+import itertools
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+log = logging.getLogger(__name__)
+
+# Tasks with a date-only due date are reminded at this local hour
+REMINDER_HOUR = int(os.environ.get('ZELDA_REMINDER_HOUR', '9'))
+CHANGE_LOG_ROWS = 10000     # task_changes rows kept; a follower further behind reloads everything
+FULL_CHECK_EVERY = 60       # polls between checks of databases whose files look unchanged
+
+REMINDER_QUERY = 'SELECT id, title, due_date FROM tasks WHERE completed = 0 AND due_date IS NOT NULL'
+
+
+def create_table(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS task_changes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            task_id INTEGER NOT NULL
+        )
+    ''')
+    prune = f'DELETE FROM task_changes WHERE seq <= (SELECT max(seq) FROM task_changes) - {CHANGE_LOG_ROWS};'
+    for name, event, task in (('insert', 'INSERT', 'new'), ('update', 'UPDATE OF title, due_date, completed', 'new'),
+                              ('delete', 'DELETE', 'old')):
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS tasks_{name}_reminders AFTER {event} ON tasks
+            BEGIN
+                INSERT INTO task_changes (task_id) VALUES ({task}.id);
+                {prune}
+            END
+        ''')
+
+
+def reminder_time(due_date):
+    """Epoch seconds at which to remind about a due date, or None if unparseable"""
+    if not due_date:
+        return None
+    try:
+        if len(due_date) == 10:
+            due = datetime.strptime(due_date, '%Y-%m-%d').replace(hour=REMINDER_HOUR)
+        else:
+            due = datetime.fromisoformat(due_date)
+    except ValueError:
+        return None
+    return due.timestamp()
+
+
+class LogSink:
+    """Write reminders to the application log"""
+
+    def __call__(self, task_id, title, due_date):
+        log.info("Reminder: '%s' is due %s", title, due_date, extra={'task_id': task_id})
+
+
+class DesktopSink:
+    """Show reminders as desktop notifications (through the desktop daemon if it is running)"""
+
+    def __call__(self, task_id, title, due_date):
+        from desktop_integration import run_command
+        run_command('notify', 'Zelda reminder', f"{title} is due {due_date}")
+
+
+class ListSink:
+    """Collect fired reminders in memory, for tests and benchmarks"""
+
+    def __init__(self):
+        self.fired = []
+
+    def __call__(self, task_id, title, due_date):
+        self.fired.append((task_id, title, due_date))
+
+
+class ReminderScheduler:
+    """Fire a sink for each open task when its due date arrives"""
+
+    def __init__(self, sink=None):
+        self.sink = sink or LogSink()
+        self._heap = []          # (remind_at, seq, task_id)
+        self._entries = {}       # task_id -> (remind_at, seq, title, due_date)
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._thread = None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def load(self, rows):
+        """Bulk load (task_id, title, due_date) rows, replacing any scheduled reminders"""
+        now = time.time()
+        with self._cond:
+            self._entries = {}
+            for task_id, title, due_date in rows:
+                remind_at = reminder_time(due_date)
+                if remind_at is not None and remind_at > now:
+                    self._entries[task_id] = (remind_at, next(self._seq), title, due_date)
+            self._heap = [(remind_at, seq, task_id) for task_id, (remind_at, seq, _, _) in self._entries.items()]
+            heapq.heapify(self._heap)
+            self._cond.notify()
+
+    def schedule(self, task_id, title, due_date):
+        """Add or reschedule a task's reminder. Past or missing due dates cancel it."""
+        remind_at = reminder_time(due_date)
+        with self._cond:
+            if remind_at is None or remind_at <= time.time():
+                self._entries.pop(task_id, None)
+                return
+            seq = next(self._seq)
+            self._entries[task_id] = (remind_at, seq, title, due_date)
+            heapq.heappush(self._heap, (remind_at, seq, task_id))
+            if self._heap[0][1] == seq:
+                self._cond.notify()
+            self._maybe_compact()
+
+    def cancel(self, task_id):
+        """Forget a task's reminder (completed or deleted)"""
+        with self._cond:
+            if self._entries.pop(task_id, None) is not None:
+                self._maybe_compact()
+
+    def replace(self, owns, rows):
+        """Swap the reminders of one database (the task ids for which ``owns(task_id)``) for rows"""
+        with self._cond:
+            for task_id in [task_id for task_id in self._entries if owns(task_id)]:
+                del self._entries[task_id]
+            self._maybe_compact()
+        for task_id, title, due_date in rows:
+            self.schedule(task_id, title, due_date)
+
+    def next_due(self):
+        """(remind_at, task_id) of the earliest live reminder, or None"""
+        with self._cond:
+            self._drop_stale()
+            return (self._heap[0][0], self._heap[0][2]) if self._heap else None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='zelda-reminders', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+
+    def _is_live(self, item):
+        entry = self._entries.get(item[2])
+        return entry is not None and entry[1] == item[1]
+
+    def _drop_stale(self):
+        while self._heap and not self._is_live(self._heap[0]):
+            heapq.heappop(self._heap)
+
+    def _maybe_compact(self):
+        if len(self._heap) > 2 * len(self._entries) + 64:
+            self._heap = [(remind_at, seq, task_id) for task_id, (remind_at, seq, _, _) in self._entries.items()]
+            heapq.heapify(self._heap)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    if self._stopped:
+                        return
+                    self._drop_stale()
+                    if not self._heap:
+                        self._cond.wait()
+                        continue
+                    delay = self._heap[0][0] - time.time()
+                    if delay <= 0:
+                        _, _, task_id = heapq.heappop(self._heap)
+                        _, _, title, due_date = self._entries.pop(task_id)
+                        break
+                    self._cond.wait(delay)
+            try:
+                self.sink(task_id, title, due_date)
+            except Exception:
+                log.exception("Reminder delivery failed")
+
+
+class ReminderFollower:
+    """Apply task writes made by any process to a scheduler, reading only changed tasks.
+
+    ``databases()`` lists the (key, path) of every database to follow;
+    ``task_key(key, task_id)`` is the id the scheduler knows the task by.
+    """
+
+    def __init__(self, scheduler, databases, task_key=lambda key, task_id: task_id, interval=1.0,
+                 connect=sqlite3.connect):
+        self.scheduler = scheduler
+        self.databases = databases
+        self.task_key = task_key
+        self.interval = interval
+        self.connect = connect
+        self.full_loads = 0
+        self._seen = {}         # key -> (last task_changes seq or None, file signature)
+        self._polls = itertools.count(1)
+        self._stop = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def _signature(path):
+        signature = []
+        for name in (path, path + '-wal'):
+            try:
+                stat = os.stat(name)
+                signature.append((stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                signature.append(None)
+        return tuple(signature)
+
+    def poll(self, force=False):
+        """Sync every database whose files changed (all of them when forced). Returns how many were read."""
+        synced = 0
+        for key, path in self.databases():
+            seen = self._seen.get(key)
+            signature = self._signature(path)
+            if seen is not None and seen[1] == signature and not force:
+                continue
+            try:
+                self.sync(key, path, signature)
+                synced += 1
+            except sqlite3.Error:
+                log.warning("Could not read reminders from %s", path, exc_info=True)
+        return synced
+
+    def sync(self, key, path, signature=None):
+        signature = signature or self._signature(path)
+        last = self._seen.get(key, (None, None))[0]
+        conn = self.connect(path)
+        try:
+            try:
+                oldest, newest = conn.execute('SELECT min(seq), max(seq) FROM task_changes').fetchone()
+            except sqlite3.OperationalError:
+                oldest = newest = None      # not migrated yet: read everything
+                last = None
+            newest = newest or 0
+            if last is None or (oldest is not None and oldest > last + 1):
+                # First look, or so far behind that the log no longer reaches back
+                rows = conn.execute(REMINDER_QUERY).fetchall()
+                self.scheduler.replace(lambda task: self._belongs_to(key, task),
+                                       [(self.task_key(key, task_id), title, due) for task_id, title, due in rows])
+                self.full_loads += 1
+            elif newest > last:
+                changed = [row[0] for row in conn.execute(
+                    'SELECT DISTINCT task_id FROM task_changes WHERE seq > ? AND seq <= ?', (last, newest))]
+                for task_id in changed:
+                    row = conn.execute('SELECT title, due_date, completed FROM tasks WHERE id = ?',
+                                       (task_id,)).fetchone()
+                    if row is None or row[2] or not row[1]:
+                        self.scheduler.cancel(self.task_key(key, task_id))
+                    else:
+                        self.scheduler.schedule(self.task_key(key, task_id), row[0], row[1])
+        finally:
+            conn.close()
+        self._seen[key] = (newest, signature)
+
+    def _belongs_to(self, key, task):
+        """Whether a scheduler task id was produced by task_key for this database"""
+        task_id = task[-1] if isinstance(task, tuple) else task
+        return self.task_key(key, task_id) == task
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='zelda-reminder-follower', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                # File times can miss a write landing within their granularity
+                self.poll(force=next(self._polls) % FULL_CHECK_EVERY == 0)
+            except Exception:
+                log.exception("Following task changes for reminders failed")
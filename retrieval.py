@@ -0,0 +1,289 @@
+"""
+Retrieval of the user's most relevant tasks and habits for chat prompts.
+
+A question like "what should I focus on today?" needs the user's lists, but
+pasting every task and habit into each prompt would make prompt evaluation
+slower with every item added. Instead open tasks (title and description)
+and habit names are embedded into vectors, and only the top-k items most
+similar to the message go into the prompt.
+
+Embedders (ZELDA_EMBEDDER):
+
+    hashing  signed feature hashing of words and character trigrams
+             (default; deterministic and offline, good for lexical overlap)
+    ollama   Ollama's /api/embed with ZELDA_EMBED_MODEL (default nomic-embed-text)
+    off      no retrieval
+
+The vectors are kept in memory, one matrix per database, in a NumPy array
+when NumPy is installed (plain lists otherwise). The index follows the data
+version: when it moved, the open tasks and habits are re-read and only new
+or edited items are embedded, in batches; deleted and completed ones are
+dropped. A search scores every item with one matrix-vector product.
+"""
+
+import logging
+import math
+import os
+import re
+import threading
+import time
+import zlib
+
+import metrics
+import recurrence
+from stages import stage
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+
+log = logging.getLogger(__name__)
+
+EMBED_BATCH = 64
+ITEM_TOKENS = 40            # prompt budget per retrieved item (about four characters per token)
+
+
+# --- Embedders ---
+
+def _tokens(text):
+    return re.findall(r'\w+', text.lower())
+
+
+class HashingEmbedder:
+    """Words and character trigrams hashed into a fixed number of signed buckets"""
+
+    name = 'hashing'
+
+    def __init__(self, dim=512):
+        self.dim = dim
+
+    def _features(self, text):
+        words = _tokens(text)
+        features = [(f'w:{word}', 1.0) for word in words]
+        for word in words:
+            padded = f' {word} '
+            features.extend((f't:{padded[i:i + 3]}', 0.5) for i in range(len(padded) - 2))
+        return features
+
+    def embed(self, texts):
+        rows = []
+        for text in texts:
+            row = [0.0] * self.dim
+            for feature, weight in self._features(text):
+                # crc32 rather than hash(): vectors must not change between processes
+                h = zlib.crc32(feature.encode())
+                row[h % self.dim] += weight if h & 0x80000000 else -weight
+            norm = math.sqrt(sum(value * value for value in row))
+            rows.append([value / norm for value in row] if norm else row)
+        return rows
+
+
+class OllamaEmbedder:
+    """Embeddings from a local Ollama model"""
+
+    name = 'ollama'
+
+    def __init__(self, url, model='nomic-embed-text', timeout=30):
+        self.url = url
+        self.model = model
+        self.timeout = timeout
+
+    def embed(self, texts):
+        import requests
+
+        vectors = []
+        for start in range(0, len(texts), EMBED_BATCH):
+            began = time.perf_counter()
+            try:
+                response = requests.post(f'{self.url}/api/embed', json={
+                    'model': self.model,
+                    'input': texts[start:start + EMBED_BATCH]
+                }, timeout=self.timeout)
+                response.raise_for_status()
+            except Exception:
+                metrics.record_ollama_failure('embed', 'error')
+                raise
+            data = response.json()
+            metrics.record_ollama('embed', data, time.perf_counter() - began)
+            vectors.extend(_normalized(vector) for vector in data['embeddings'])
+        return vectors
+
+
+def _normalized(vector):
+    norm = math.sqrt(sum(value * value for value in vector))
+    return [value / norm for value in vector] if norm else list(vector)
+
+
+def embedder_from_env(ollama_url):
+    kind = os.environ.get('ZELDA_EMBEDDER', 'hashing')
+    if kind == 'off':
+        return None
+    if kind == 'ollama':
+        return OllamaEmbedder(ollama_url, os.environ.get('ZELDA_EMBED_MODEL', 'nomic-embed-text'))
+    return HashingEmbedder(int(os.environ.get('ZELDA_EMBED_DIM', '512')))
+
+
+# --- Vector storage ---
+
+class VectorIndex:
+    """Unit vectors by key with cosine top-k search (NumPy when available)"""
+
+    def __init__(self):
+        self.keys = []
+        self._rows = {}         # key -> row number
+        self._matrix = None     # NumPy: capacity x dim, first len(keys) rows in use; else a list of rows
+
+    def __len__(self):
+        return len(self.keys)
+
+    def upsert(self, keys, vectors):
+        if not keys:
+            return
+        if NUMPY_AVAILABLE:
+            vectors = np.asarray(vectors, dtype=np.float32)
+            if self._matrix is None:
+                self._matrix = np.empty((0, vectors.shape[1]), dtype=np.float32)
+        elif self._matrix is None:
+            self._matrix = []
+        for key, vector in zip(keys, vectors):
+            row = self._rows.get(key)
+            if row is None:
+                row = self._rows[key] = len(self.keys)
+                self.keys.append(key)
+                self._grow()
+            self._matrix[row] = vector
+
+    def _grow(self):
+        if not NUMPY_AVAILABLE:
+            self._matrix.append(None)
+        elif len(self.keys) > len(self._matrix):
+            # Double the capacity so appends stay amortized O(1)
+            grown = np.empty((max(16, 2 * len(self._matrix)), self._matrix.shape[1]), dtype=np.float32)
+            grown[:len(self._matrix)] = self._matrix
+            self._matrix = grown
+
+    def remove(self, keys):
+        for key in keys:
+            row = self._rows.pop(key, None)
+            if row is None:
+                continue
+            # Move the last row into the gap
+            last = len(self.keys) - 1
+            if row != last:
+                moved = self.keys[last]
+                self.keys[row] = moved
+                self._rows[moved] = row
+                self._matrix[row] = self._matrix[last]
+            self.keys.pop()
+            if not NUMPY_AVAILABLE:
+                self._matrix.pop()
+
+    def search(self, queries, k):
+        """[(key, score), ...] best first, for each query vector"""
+        n = len(self.keys)
+        if not n or not queries:
+            return [[] for _ in queries]
+        k = min(k, n)
+        if NUMPY_AVAILABLE:
+            scores = np.asarray(queries, dtype=np.float32) @ self._matrix[:n].T
+            results = []
+            for row in scores:
+                top = np.argpartition(-row, k - 1)[:k]
+                top = top[np.argsort(-row[top])]
+                results.append([(self.keys[i], float(row[i])) for i in top])
+            return results
+        results = []
+        for query in queries:
+            scored = [(sum(a * b for a, b in zip(query, vector)), i) for i, vector in enumerate(self._matrix)]
+            scored.sort(reverse=True)
+            results.append([(self.keys[i], score) for score, i in scored[:k]])
+        return results
+
+
+# --- Task and habit retrieval ---
+
+class RetrievalIndex:
+    """Embedded open tasks and habits of one database, kept in step with its data version"""
+
+    def __init__(self, embedder, max_tasks=2000, top_k=5, min_score=0.2):
+        self.embedder = embedder
+        self.max_tasks = max_tasks
+        self.top_k = top_k
+        self.min_score = min_score
+        self.version = None
+        self.vectors = VectorIndex()
+        self._texts = {}        # key -> embedded text
+        self._items = {}        # key -> prompt line
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, embedder):
+        return cls(embedder,
+                   max_tasks=int(os.environ.get('ZELDA_RETRIEVAL_MAX_TASKS', '2000')),
+                   top_k=int(os.environ.get('ZELDA_RETRIEVAL_TOP_K', '5')),
+                   min_score=float(os.environ.get('ZELDA_RETRIEVAL_MIN_SCORE', '0.2')))
+
+    def _current_items(self, conn):
+        items = {}
+        # Most urgent first, so the cap keeps what is most likely to be asked about
+        rows = conn.execute('''
+            SELECT id, title, description, priority, due_date, recurrence FROM tasks WHERE NOT completed
+            ORDER BY due_date IS NULL, due_date, id DESC LIMIT ?
+        ''', (self.max_tasks,))
+        for task_id, title, description, priority, due_date, rule in rows:
+            text = f"{title}. {description}" if description else title
+            when = f', due {due_date[:10]}' if due_date else ''
+            if rule:
+                try:
+                    when = f', {recurrence.describe(recurrence.parse(rule))}'
+                except ValueError:
+                    pass
+            line = f"Task: {title} ({priority or 'medium'} priority{when})"
+            items[('task', task_id)] = (text, line)
+        for habit_id, name in conn.execute('SELECT id, name FROM habits'):
+            items[('habit', habit_id)] = (name, f"Habit: {name}")
+        return items
+
+    def refresh(self, conn, version):
+        """Embed new or edited items and drop removed ones if the data changed since the last refresh"""
+        if self.version == version:
+            return
+        with self._lock:
+            if self.version == version:
+                return
+            items = self._current_items(conn)
+            removed = [key for key in self._texts if key not in items]
+            changed = [key for key, (text, _) in items.items() if self._texts.get(key) != text]
+            if changed:
+                with stage('embed'):
+                    vectors = self.embedder.embed([items[key][0] for key in changed])
+                self.vectors.upsert(changed, vectors)
+            self.vectors.remove(removed)
+            for key in removed:
+                del self._texts[key]
+                del self._items[key]
+            for key in changed:
+                self._texts[key] = items[key][0]
+            self._items.update((key, line) for key, (_, line) in items.items())
+            self.version = version
+            log.debug("Retrieval index refreshed: %d embedded, %d removed, %d total",
+                      len(changed), len(removed), len(self.vectors))
+
+    def search(self, text):
+        """Prompt lines of the top_k items most similar to text"""
+        with stage('retrieve'):
+            query = self.embedder.embed([text])
+            with self._lock:
+                hits = self.vectors.search(query, self.top_k)[0]
+                return [self._items[key] for key, score in hits if score >= self.min_score]
+
+
+def format_context(lines):
+    if not lines:
+        return ''
+    limit = ITEM_TOKENS * 4
+    return "Relevant items from the user's lists:\n" + '\n'.join(
+        f"- {line if len(line) <= limit else line[:limit] + '…'}" for line in lines)
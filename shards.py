@@ -0,0 +1,227 @@
+"""
+Per-user SQLite shards.
+
+With one habits.db every user shares one write lock. In multi-user mode each
+user (or, with buckets, each hash bucket of users) gets their own database
+file under the shard directory, so writes for different users never wait on
+each other.
+
+ShardRouter maps a user to a Shard. Shards are opened lazily: the first time
+a process touches a shard (or at startup, through migrate_all()) it runs the
+schema hook on it, so new shard files
+are created with the current schema and existing ones are migrated. Each
+open shard keeps a few idle connections for reuse, and only the
+ZELDA_SHARD_MAX_OPEN most recently used shards stay open; older ones have
+their idle connections closed and their in-memory state dropped.
+"""
+
+import logging
+import os
+import re
+import sqlite3
+import threading
+import zlib
+from collections import OrderedDict
+
+import metrics
+
+log = logging.getLogger(__name__)
+
+SHARD_SUFFIX = '.db'
+
+
+class PooledConnection(metrics.InstrumentedConnection):
+    """Shard connection whose close() hands it back to the shard's idle pool"""
+
+    shard = None
+
+    def close(self):
+        shard = self.shard
+        if shard is None or not shard.release(self):
+            self.shard = None
+            super().close()
+
+
+class Shard:
+    """One shard database file with its idle connections and per-shard state"""
+
+    def __init__(self, key, path, pool_size=4):
+        self.key = key
+        self.path = path
+        self.pool_size = pool_size
+        self.state = None           # whatever the router's make_state built
+        self.closed = False
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def connect(self):
+        """An idle connection if there is one, else a new one"""
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        # Pooled connections move between request threads, one at a time
+        conn = sqlite3.connect(self.path, factory=PooledConnection, check_same_thread=False)
+        conn.shard = self
+        return conn
+
+    def release(self, conn):
+        """Take a connection back into the pool. Returns False if it should really close."""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            return False
+        conn.row_factory = None
+        with self._lock:
+            if self.closed or len(self._idle) >= self.pool_size:
+                return False
+            self._idle.append(conn)
+            return True
+
+    def close(self):
+        """Close idle connections; connections still in use close when released"""
+        with self._lock:
+            self.closed = True
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.shard = None
+            conn.close()
+
+
+class ShardRouter:
+    """Resolve users to shard files, opening them lazily and closing the least recently used"""
+
+    def __init__(self, directory, buckets=0, max_open=64, pool_size=4, init=None, make_state=None):
+        self.directory = directory
+        self.buckets = buckets          # 0: one shard per user
+        self.max_open = max_open
+        self.pool_size = pool_size
+        self.init = init                # init(conn): create or migrate the schema
+        self.make_state = make_state    # make_state(shard): in-memory state for a shard
+        self._shards = OrderedDict()    # key -> Shard, least recently used first
+        self._lock = threading.Lock()
+        self._initialized = set()       # keys whose schema this process has already checked
+        self.opened = 0
+        self.evicted = 0
+
+    @classmethod
+    def from_env(cls, **kwargs):
+        """Router for ZELDA_SHARD_DIR, or None when sharding is off"""
+        directory = os.environ.get('ZELDA_SHARD_DIR')
+        if not directory:
+            return None
+        return cls(
+            directory,
+            buckets=int(os.environ.get('ZELDA_SHARD_BUCKETS', '0')),
+            max_open=int(os.environ.get('ZELDA_SHARD_MAX_OPEN', '64')),
+            pool_size=int(os.environ.get('ZELDA_SHARD_POOL', '4')),
+            **kwargs
+        )
+
+    def key_for(self, user):
+        """Shard key (and file name stem) for a user id"""
+        user = str(user)
+        if self.buckets:
+            # crc32 rather than hash(): it must not change between processes or restarts
+            return f"bucket-{zlib.crc32(user.encode()) % self.buckets:04d}"
+        safe = re.sub(r'[^A-Za-z0-9_.-]', '_', user).strip('.')
+        if not safe or safe != user:
+            # Keep distinct users apart when their ids needed escaping
+            safe = f"{safe}-{zlib.crc32(user.encode()):08x}"
+        return f"user-{safe}"
+
+    def path_for(self, key):
+        return os.path.join(self.directory, key + SHARD_SUFFIX)
+
+    def get(self, user):
+        """The open Shard for a user, opening (and initializing) it if needed"""
+        key = self.key_for(user)
+        with self._lock:
+            shard = self._shards.get(key)
+            if shard is not None:
+                self._shards.move_to_end(key)
+                return shard
+        return self._open(key)
+
+    def _open(self, key):
+        shard = Shard(key, self.path_for(key), self.pool_size)
+        # Initialize outside the router lock so a slow migration only blocks this shard
+        os.makedirs(self.directory, exist_ok=True)
+        self._initialize(shard)
+        if self.make_state is not None:
+            shard.state = self.make_state(shard)
+        evicted = []
+        with self._lock:
+            existing = self._shards.get(key)
+            if existing is not None:
+                # Another thread opened it first; use theirs
+                self._shards.move_to_end(key)
+                evicted.append(shard)
+                shard = existing
+            else:
+                self._shards[key] = shard
+                self.opened += 1
+                while len(self._shards) > self.max_open:
+                    _, old = self._shards.popitem(last=False)
+                    evicted.append(old)
+                    self.evicted += 1
+        for old in evicted:
+            old.close()
+        return shard
+
+    def _initialize(self, shard):
+        if self.init is None or shard.key in self._initialized:
+            return
+        conn = shard.connect()
+        try:
+            self.init(conn)
+            conn.commit()
+        finally:
+            conn.close()
+        self._initialized.add(shard.key)
+
+    def keys(self):
+        """Keys of every shard file on disk, open or not"""
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        return sorted(name[:-len(SHARD_SUFFIX)] for name in names if name.endswith(SHARD_SUFFIX))
+
+    def open_keys(self):
+        with self._lock:
+            return list(self._shards)
+
+    def migrate_all(self):
+        """Apply the schema hook to every shard file. Returns the number migrated."""
+        if self.init is None:
+            return 0
+        count = 0
+        for key in self.keys():
+            conn = sqlite3.connect(self.path_for(key), factory=metrics.InstrumentedConnection)
+            try:
+                self.init(conn)
+                conn.commit()
+            finally:
+                conn.close()
+            self._initialized.add(key)
+            count += 1
+        log.info("Migrated %d shard(s) in %s", count, self.directory)
+        return count
+
+    def close_all(self):
+        with self._lock:
+            shards = list(self._shards.values())
+            self._shards.clear()
+        for shard in shards:
+            shard.close()
+
+    def after_fork(self):
+        """Forget shards opened by the parent; SQLite connections must not cross a fork"""
+        self._lock = threading.Lock()
+        self._shards = OrderedDict()
+
+    def stats(self):
+        with self._lock:
+            return {'open': len(self._shards), 'opened': self.opened, 'evicted': self.evicted,
+                    'max_open': self.max_open, 'buckets': self.buckets}
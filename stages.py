@@ -0,0 +1,46 @@
+"""
+Per-stage timing for the voice and chat pipelines.
+
+Code marks interesting sections with ``with stage('decode'):``. When a caller
+has opened ``with collect_stages() as timings:``, elapsed seconds for every
+stage run in that context are accumulated into the ``timings`` dict. Outside a
+collection the only cost is two perf_counter calls.
+"""
+
+import contextvars
+import time
+from contextlib import contextmanager
+
+_current_timings = contextvars.ContextVar('zelda_stage_timings', default=None)
+_listeners = []
+
+
+def add_stage_listener(listener):
+    """Call ``listener(name, seconds)`` for every finished stage"""
+    _listeners.append(listener)
+
+
+@contextmanager
+def collect_stages():
+    """Collect stage timings (in seconds) for the enclosed block"""
+    timings = {}
+    token = _current_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _current_timings.reset(token)
+
+
+@contextmanager
+def stage(name):
+    """Time a named pipeline stage. Nested stages are timed independently."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        timings = _current_timings.get()
+        if timings is not None:
+            timings[name] = timings.get(name, 0.0) + elapsed
+        for listener in _listeners:
+            listener(name, elapsed)
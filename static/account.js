@@ -0,0 +1,80 @@
+// Show feature information
+function showComingSoon(feature) {
+    let message = '';
+    switch(feature) {
+        case 'Preferences':
+            message = 'You can customize your experience through the various pages. Theme and notification settings will be added in future updates.';
+            break;
+        case 'Notifications':
+            message = 'Habit reminders and task notifications are currently managed through your browser. Push notifications coming soon!';
+            break;
+        case 'Privacy':
+            message = 'Your data is stored locally. Export and privacy controls will be enhanced in future versions.';
+            break;
+        case 'Support':
+            message = 'For support, you can use the chat feature to get help with tasks and habits management.';
+            break;
+        default:
+            message = `${feature} settings are being developed.`;
+    }
+    showNotification(message, 'info');
+}
+
+// Load user statistics (a few counters from /api/summary, not the full lists)
+function loadStats() {
+    fetch('/api/summary')
+        .then(response => response.json())
+        .then(summary => {
+            document.getElementById('habitsCount').textContent = summary.habits.total;
+            document.getElementById('tasksCount').textContent = summary.tasks.total;
+            document.getElementById('completionRate').textContent = summary.tasks.completionRate + '%';
+        })
+        .catch(error => console.error('Error loading summary:', error));
+
+    // Placeholder for streak count (could be implemented based on habit consistency)
+    document.getElementById('streakCount').textContent = '1';
+}
+
+// Notification system
+function showNotification(message, type = 'info') {
+    const notification = document.createElement('div');
+    notification.style.cssText = `
+        position: fixed;
+        top: 20px;
+        right: 20px;
+        background: ${type === 'success' ? '#48bb78' : type === 'error' ? '#f56565' : '#667eea'};
+        color: white;
+        padding: 15px 20px;
+        border-radius: 8px;
+        box-shadow: 0 4px 12px rgba(0,0,0,0.1);
+        z-index: 1000;
+        animation: slideIn 0.3s ease;
+    `;
+    notification.textContent = message;
+
+    document.body.appendChild(notification);
+
+    setTimeout(() => {
+        notification.style.animation = 'slideOut 0.3s ease';
+        setTimeout(() => notification.remove(), 300);
+    }, 3000);
+}
+
+// Add CSS animations
+const style = document.createElement('style');
+style.textContent = `
+    @keyframes slideIn {
+        from { transform: translateX(100%); opacity: 0; }
+        to { transform: translateX(0); opacity: 1; }
+    }
+    @keyframes slideOut {
+        from { transform: translateX(0); opacity: 1; }
+        to { transform: translateX(100%); opacity: 0; }
+    }
+`;
+document.head.appendChild(style);
+
+// Initialize page
+document.addEventListener('DOMContentLoaded', () => {
+    loadStats();
+});
@@ -0,0 +1,204 @@
+let conversationStarted = false;
+let questionIndex = 0;
+let userAnswers = [];
+
+const questions = [
+    {
+        text: "What are the top 3 tasks you need to complete this week?",
+        type: "tasks"
+    },
+    {
+        text: "What daily habits would you like to build or improve? (e.g., exercise, reading, meditation)",
+        type: "habits"
+    },
+    {
+        text: "What time of day do you feel most productive for important tasks?",
+        type: "schedule"
+    }
+];
+
+const chatMessages = document.getElementById('chatMessages');
+const chatForm = document.getElementById('chatForm');
+const chatInput = document.getElementById('chatInput');
+const sendButton = document.getElementById('sendButton');
+
+function addMessage(content, isUser = false, isSystem = false) {
+    const messageDiv = document.createElement('div');
+    messageDiv.className = `chat-message ${isUser ? 'user' : 'zelda'}`;
+
+    const avatar = document.createElement('div');
+    avatar.className = 'message-avatar';
+    avatar.innerHTML = isUser ? '<i class="fas fa-user"></i>' : '<i class="fas fa-robot"></i>';
+
+    const bubble = document.createElement('div');
+    bubble.className = 'message-bubble';
+    bubble.textContent = content;
+
+    messageDiv.appendChild(avatar);
+    messageDiv.appendChild(bubble);
+
+    chatMessages.appendChild(messageDiv);
+    chatMessages.scrollTop = chatMessages.scrollHeight;
+}
+
+function showTypingIndicator() {
+    const typingDiv = document.createElement('div');
+    typingDiv.className = 'typing-indicator';
+    typingDiv.id = 'typingIndicator';
+    typingDiv.innerHTML = `
+        <div class="message-avatar">
+            <i class="fas fa-robot"></i>
+        </div>
+        <div>Zelda is typing...</div>
+        <div class="typing-dots">
+            <div class="typing-dot"></div>
+            <div class="typing-dot"></div>
+            <div class="typing-dot"></div>
+        </div>
+    `;
+    chatMessages.appendChild(typingDiv);
+    chatMessages.scrollTop = chatMessages.scrollHeight;
+}
+
+function hideTypingIndicator() {
+    const typingIndicator = document.getElementById('typingIndicator');
+    if (typingIndicator) {
+        typingIndicator.remove();
+    }
+}
+
+function startConversation() {
+    conversationStarted = true;
+    setTimeout(() => {
+        addMessage("Hi! I'm here to help you organize your life better. Let me ask you a few questions to get started.");
+        setTimeout(() => {
+            askNextQuestion();
+        }, 1000);
+    }, 500);
+}
+
+function askNextQuestion() {
+    if (questionIndex < questions.length) {
+        const question = questions[questionIndex];
+        showTypingIndicator();
+        setTimeout(() => {
+            hideTypingIndicator();
+            addMessage(question.text);
+        }, 1500);
+    } else {
+        processAnswersAndUpdateSystem();
+    }
+}
+
+async function processAnswersAndUpdateSystem() {
+    showTypingIndicator();
+
+    try {
+        // Process tasks
+        const taskAnswers = userAnswers.filter(a => a.type === 'tasks');
+        if (taskAnswers.length > 0) {
+            const taskText = taskAnswers[0].answer;
+            const tasks = extractTasksFromText(taskText);
+
+            for (const task of tasks) {
+                await fetch('/api/tasks', {
+                    method: 'POST',
+                    headers: { 'Content-Type': 'application/json' },
+                    body: JSON.stringify({
+                        title: task,
+                        description: 'Added from chat conversation',
+                        priority: 'medium'
+                    })
+                });
+            }
+        }
+
+        // Process habits
+        const habitAnswers = userAnswers.filter(a => a.type === 'habits');
+        if (habitAnswers.length > 0) {
+            const habitText = habitAnswers[0].answer;
+            const habits = extractHabitsFromText(habitText);
+
+            for (const habit of habits) {
+                await fetch('/api/habits/new', {
+                    method: 'POST',
+                    headers: { 'Content-Type': 'application/json' },
+                    body: JSON.stringify({ habit: habit })
+                });
+            }
+        }
+
+        hideTypingIndicator();
+        addMessage("Perfect! I've added your tasks and habits to the system. You can manage them from the Tasks and Habits pages. Is there anything else you'd like to work on?");
+
+    } catch (error) {
+        hideTypingIndicator();
+        addMessage("I've noted your responses! You can manually add your tasks and habits from their respective pages.");
+    }
+}
+
+function extractTasksFromText(text) {
+    // Simple extraction - split by common delimiters and clean up
+    const tasks = text.split(/[,;\n]|and\s+/)
+        .map(task => task.trim())
+        .filter(task => task.length > 3 && task.length < 100)
+        .slice(0, 5); // Limit to 5 tasks
+    return tasks;
+}
+
+function extractHabitsFromText(text) {
+    // Simple extraction for habits
+    const habits = text.split(/[,;\n]|and\s+/)
+        .map(habit => habit.trim())
+        .filter(habit => habit.length > 2 && habit.length < 50)
+        .slice(0, 5); // Limit to 5 habits
+    return habits;
+}
+
+chatForm.addEventListener('submit', async (e) => {
+    e.preventDefault();
+    const message = chatInput.value.trim();
+    if (!message) return;
+
+    addMessage(message, true);
+    chatInput.value = '';
+
+    if (!conversationStarted) {
+        startConversation();
+        return;
+    }
+
+    // Store user answer
+    if (questionIndex < questions.length) {
+        userAnswers.push({
+            question: questions[questionIndex].text,
+            answer: message,
+            type: questions[questionIndex].type
+        });
+        questionIndex++;
+
+        setTimeout(() => {
+            askNextQuestion();
+        }, 1000);
+    } else {
+        // Regular chat after questions
+        showTypingIndicator();
+        try {
+            const response = await fetch('/api/chat', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ message: message, session: chatSessionId() })
+            });
+            const data = await response.json();
+
+            hideTypingIndicator();
+            addMessage(data.reply);
+        } catch (error) {
+            hideTypingIndicator();
+            addMessage("I'm having trouble connecting right now, but I'm here to help when you need me!");
+        }
+    }
+});
+
+// Auto-focus on input
+chatInput.focus();
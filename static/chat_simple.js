@@ -0,0 +1,249 @@
+// === 1. GLOBAL VARIABLES ===
+const messagesContainer = document.getElementById('messages');
+const textInput = document.getElementById('textInput');
+const sendButton = document.getElementById('sendBtn');
+const voiceButton = document.getElementById('voiceBtn');
+
+let isRecording = false;
+let mediaRecorder = null;
+let audioChunks = [];
+
+// === 2. MAIN FUNCTIONS ===
+
+/**
+ * Add a message to the chat
+ * @param {string} sender - 'user' or 'ai'
+ * @param {string} text - The message text
+ */
+function addMessage(sender, text) {
+    const messageDiv = document.createElement('div');
+    messageDiv.className = `message ${sender}`;
+
+    const avatar = document.createElement('div');
+    avatar.className = 'message-avatar';
+    avatar.textContent = sender === 'user' ? '👤' : '🧚';
+
+    const bubble = document.createElement('div');
+    bubble.className = 'message-bubble';
+    bubble.textContent = text;
+
+    messageDiv.appendChild(avatar);
+    messageDiv.appendChild(bubble);
+    messagesContainer.appendChild(messageDiv);
+
+    // Auto-scroll to bottom
+    messagesContainer.scrollTop = messagesContainer.scrollHeight;
+}
+
+/**
+ * Show typing indicator while AI is processing
+ */
+function showTypingIndicator() {
+    const messageDiv = document.createElement('div');
+    messageDiv.className = 'message ai';
+    messageDiv.id = 'typing-indicator';
+
+    const avatar = document.createElement('div');
+    avatar.className = 'message-avatar';
+    avatar.textContent = '🧚';
+
+    const bubble = document.createElement('div');
+    bubble.className = 'message-bubble typing-indicator';
+    bubble.innerHTML = '<div class="typing-dot"></div><div class="typing-dot"></div><div class="typing-dot"></div>';
+
+    messageDiv.appendChild(avatar);
+    messageDiv.appendChild(bubble);
+    messagesContainer.appendChild(messageDiv);
+    messagesContainer.scrollTop = messagesContainer.scrollHeight;
+}
+
+/**
+ * Remove typing indicator
+ */
+function hideTypingIndicator() {
+    const indicator = document.getElementById('typing-indicator');
+    if (indicator) {
+        indicator.remove();
+    }
+}
+
+/**
+ * Send text message to AI
+ * @param {string} message - The text message to send
+ */
+async function sendTextMessage(message) {
+    if (!message.trim()) return;
+
+    // Add user message
+    addMessage('user', message);
+
+    // Show typing indicator
+    showTypingIndicator();
+
+    try {
+        // Send to backend
+        const response = await fetch('/api/chat', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({ message: message, session: chatSessionId() })
+        });
+
+        const data = await response.json();
+
+        // Hide typing indicator
+        hideTypingIndicator();
+
+        // Add AI response
+        if (data.reply) {
+            addMessage('ai', data.reply);
+
+            // Optional: Speak the response
+            if ('speechSynthesis' in window) {
+                const utterance = new SpeechSynthesisUtterance(data.reply);
+                speechSynthesis.speak(utterance);
+            }
+        }
+
+    } catch (error) {
+        hideTypingIndicator();
+        addMessage('ai', 'Sorry, I encountered an error. Please try again.');
+        console.error('Error:', error);
+    }
+}
+
+/**
+ * Start voice recording
+ */
+async function startVoiceRecording() {
+    try {
+        const stream = await navigator.mediaDevices.getUserMedia({ audio: true });
+
+        audioChunks = [];
+        mediaRecorder = new MediaRecorder(stream);
+
+        mediaRecorder.ondataavailable = (event) => {
+            audioChunks.push(event.data);
+        };
+
+        mediaRecorder.onstop = () => {
+            sendVoiceMessage();
+            stream.getTracks().forEach(track => track.stop());
+        };
+
+        // Update UI
+        isRecording = true;
+        voiceButton.classList.add('recording');
+        voiceButton.textContent = '⏹️';
+
+        mediaRecorder.start();
+
+        // Auto-stop after 10 seconds
+        setTimeout(() => {
+            if (isRecording) {
+                stopVoiceRecording();
+            }
+        }, 10000);
+
+    } catch (error) {
+        console.error('Error accessing microphone:', error);
+        alert('Could not access microphone. Please check permissions.');
+    }
+}
+
+/**
+ * Stop voice recording
+ */
+function stopVoiceRecording() {
+    if (mediaRecorder && isRecording) {
+        isRecording = false;
+        voiceButton.classList.remove('recording');
+        voiceButton.textContent = '🎤';
+
+        mediaRecorder.stop();
+    }
+}
+
+/**
+ * Send recorded voice message to AI
+ */
+async function sendVoiceMessage() {
+    const audioBlob = new Blob(audioChunks, { type: 'audio/webm' });
+    const formData = new FormData();
+    formData.append('audio', audioBlob, 'recording.webm');
+
+    // Add user message placeholder
+    addMessage('user', '🎤 Processing voice message...');
+    showTypingIndicator();
+
+    try {
+        const response = await fetch('/api/voice', {
+            method: 'POST',
+            body: formData
+        });
+
+        const data = await response.json();
+
+        hideTypingIndicator();
+
+        // Remove placeholder message
+        const messages = messagesContainer.children;
+        if (messages.length > 0 && messages[messages.length - 2].textContent.includes('Processing voice message')) {
+            messages[messages.length - 2].remove();
+        }
+
+        // Add actual transcription
+        if (data.transcript) {
+            addMessage('user', data.transcript);
+        }
+
+        // Add AI response
+        if (data.reply) {
+            addMessage('ai', data.reply);
+
+            // Speak response
+            if ('speechSynthesis' in window) {
+                const utterance = new SpeechSynthesisUtterance(data.reply);
+                speechSynthesis.speak(utterance);
+            }
+        }
+
+    } catch (error) {
+        hideTypingIndicator();
+        addMessage('ai', 'Sorry, there was an error processing your voice message.');
+        console.error('Error:', error);
+    }
+}
+
+// === 3. EVENT LISTENERS ===
+
+// Send button click
+sendButton.addEventListener('click', () => {
+    const message = textInput.value;
+    textInput.value = '';
+    sendTextMessage(message);
+});
+
+// Enter key in text input
+textInput.addEventListener('keypress', (e) => {
+    if (e.key === 'Enter') {
+        const message = textInput.value;
+        textInput.value = '';
+        sendTextMessage(message);
+    }
+});
+
+// Voice button click
+voiceButton.addEventListener('click', () => {
+    if (isRecording) {
+        stopVoiceRecording();
+    } else {
+        startVoiceRecording();
+    }
+});
+
+// === 4. INITIALIZATION ===
+console.log('✅ Chat interface loaded successfully!');
+console.log('📝 Text input: Type and press Enter or click Send');
+console.log('🎤 Voice input: Click microphone button and speak');
@@ -1 +1,11 @@
 // Shared utilities (if needed)
+
+// Chat session id for conversation memory, kept for the browser tab's lifetime
+function chatSessionId() {
+    let id = sessionStorage.getItem('zelda-chat-session');
+    if (!id) {
+        id = (crypto.randomUUID ? crypto.randomUUID() : Date.now().toString(36) + Math.random().toString(36).slice(2));
+        sessionStorage.setItem('zelda-chat-session', id);
+    }
+    return id;
+}
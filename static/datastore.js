@@ -0,0 +1,215 @@
+// Offline-first data layer for tasks and habits
+//
+// The last known tasks and habits are kept in IndexedDB so pages render
+// instantly from local state. Changes are applied locally first, queued, and
+// sent to /api/sync in small batches. The server's data version tells us
+// whether our copy is still current, so revalidation is usually a 304.
+
+const ZeldaStore = (() => {
+    const DB_NAME = 'zelda';
+    const SYNC_DELAY_MS = 300;
+    const RETRY_DELAY_MS = 5000;
+
+    const state = { tasks: null, habits: null };
+    const versions = { tasks: null, habits: null };
+    const renderers = {};
+    let queue = [];
+    let syncTimer = null;
+    let syncing = false;
+    let retry = null;   // { size, since } of a batch that failed and must be resent unchanged
+    let nextMutationId = Date.now();
+    let dbPromise = null;
+
+    // --- IndexedDB (falls back to memory only if unavailable) ---
+
+    function openDB() {
+        if (!dbPromise) {
+            dbPromise = new Promise(resolve => {
+                if (!window.indexedDB) {
+                    resolve(null);
+                    return;
+                }
+                const request = indexedDB.open(DB_NAME, 1);
+                request.onupgradeneeded = () => request.result.createObjectStore('kv');
+                request.onsuccess = () => resolve(request.result);
+                request.onerror = () => resolve(null);
+            });
+        }
+        return dbPromise;
+    }
+
+    async function idbGet(key) {
+        const db = await openDB();
+        if (!db) return undefined;
+        return new Promise(resolve => {
+            const request = db.transaction('kv').objectStore('kv').get(key);
+            request.onsuccess = () => resolve(request.result);
+            request.onerror = () => resolve(undefined);
+        });
+    }
+
+    async function idbPut(key, value) {
+        const db = await openDB();
+        if (!db) return;
+        db.transaction('kv', 'readwrite').objectStore('kv').put(value, key);
+    }
+
+    function persist(kind) {
+        idbPut(kind, { data: state[kind], version: versions[kind] });
+    }
+
+    function persistQueue() {
+        idbPut('queue', queue);
+    }
+
+    function notify(kind) {
+        if (renderers[kind] && state[kind] !== null) {
+            renderers[kind](state[kind]);
+        }
+    }
+
+    // --- Reads ---
+
+    // Render cached data right away, then revalidate against the server
+    async function load(kind, render) {
+        renderers[kind] = render;
+        if (state[kind] === null) {
+            const cached = await idbGet(kind);
+            if (cached && state[kind] === null) {
+                state[kind] = cached.data;
+                versions[kind] = cached.version;
+                notify(kind);
+            }
+        }
+        return revalidate(kind);
+    }
+
+    async function revalidate(kind) {
+        const headers = {};
+        if (versions[kind] !== null && state[kind] !== null) {
+            headers['If-None-Match'] = `"v${versions[kind]}"`;
+        }
+        try {
+            const response = await fetch(`/api/${kind}`, { headers });
+            if (response.status === 304) return;
+            const body = await response.json();
+            // Local changes still in flight win until the sync round trip finishes
+            if (queue.length) return;
+            state[kind] = body[kind] || (kind === 'tasks' ? [] : {});
+            versions[kind] = body.version;
+            persist(kind);
+            notify(kind);
+        } catch (error) {
+            console.warn(`Could not refresh ${kind}, showing cached data`, error);
+        }
+    }
+
+    // --- Writes ---
+
+    // Apply a change locally, re-render, and queue it for the server.
+    // applyLocal receives the current state and may mutate it or return a replacement.
+    function mutate(kind, mutation, applyLocal) {
+        if (state[kind] === null) {
+            state[kind] = kind === 'tasks' ? [] : {};
+        }
+        const next = applyLocal(state[kind]);
+        if (next !== undefined) state[kind] = next;
+        persist(kind);
+        notify(kind);
+
+        mutation.id = String(nextMutationId++);
+        mutation.kind = kind;
+        queue.push(mutation);
+        persistQueue();
+        scheduleSync(SYNC_DELAY_MS);
+    }
+
+    function scheduleSync(delay) {
+        clearTimeout(syncTimer);
+        syncTimer = setTimeout(sync, delay);
+    }
+
+    async function sync() {
+        if (syncing || !queue.length || !navigator.onLine) return;
+        syncing = true;
+        // A retry resends exactly the same batch under the same Idempotency-Key,
+        // so if the first attempt did reach the server nothing is applied twice
+        const batch = retry ? queue.slice(0, retry.size) : queue.slice();
+        const kinds = [...new Set(batch.map(mutation => mutation.kind))];
+        const known = kinds.map(kind => versions[kind]);
+        const since = retry ? retry.since : (known.includes(null) ? null : Math.min(...known));
+
+        try {
+            const response = await fetch('/api/sync', {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                    'Idempotency-Key': `sync-${batch[0].id}-${batch.length}`
+                },
+                body: JSON.stringify({ mutations: batch, since })
+            });
+            if (!response.ok) throw new Error(`Sync failed with ${response.status}`);
+            const result = await response.json();
+            retry = null;
+
+            queue = queue.slice(batch.length);
+            persistQueue();
+            adoptServerIds(batch, result.results);
+
+            const failed = result.results.some(r => !r.ok);
+            for (const kind of kinds) {
+                if (!result.stale && !failed && versions[kind] === since) {
+                    // Our optimistic state is exactly what the server now has
+                    versions[kind] = result.version;
+                    persist(kind);
+                } else {
+                    versions[kind] = null;
+                    await revalidate(kind);
+                }
+            }
+        } catch (error) {
+            console.warn('Offline or sync failed, will retry', error);
+            retry = { size: batch.length, since };
+            scheduleSync(RETRY_DELAY_MS);
+        } finally {
+            syncing = false;
+        }
+
+        if (queue.length) scheduleSync(SYNC_DELAY_MS);
+    }
+
+    // Replace temporary ids of tasks created offline with the server's ids
+    function adoptServerIds(batch, results) {
+        const byClientId = {};
+        batch.forEach((mutation, i) => {
+            if (mutation.type === 'task.create' && results[i] && results[i].taskId) {
+                byClientId[mutation.task.clientId] = results[i].taskId;
+            }
+        });
+        if (!Object.keys(byClientId).length) return;
+        (state.tasks || []).forEach(task => {
+            if (byClientId[task.id]) task.id = byClientId[task.id];
+        });
+        queue.forEach(mutation => {
+            if (byClientId[mutation.taskId]) mutation.taskId = byClientId[mutation.taskId];
+        });
+        persist('tasks');
+        persistQueue();
+        notify('tasks');
+    }
+
+    function temporaryId() {
+        return `tmp-${Date.now()}-${Math.random().toString(36).slice(2, 8)}`;
+    }
+
+    // Pick up changes queued on a previous visit and flush when back online
+    idbGet('queue').then(saved => {
+        if (saved && saved.length) {
+            queue = saved.concat(queue);
+            scheduleSync(0);
+        }
+    });
+    window.addEventListener('online', () => scheduleSync(0));
+
+    return { load, revalidate, mutate, sync, temporaryId };
+})();
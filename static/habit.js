@@ -26,13 +26,7 @@ function renderAllHabits(habitsData) {
                 <button class="icon-btn popup-btn tick" title="Mark as done">✔️</button>
                 <button class="icon-btn popup-btn cross" title="Dismiss">✖️</button>
             `;
-            popup.querySelector('.tick').onclick = () => {
-                fetch('/api/habits', {
-                    method: 'POST',
-                    headers: { 'Content-Type': 'application/json' },
-                    body: JSON.stringify({ habit: habitName, date: todayStr })
-                }).then(() => loadHabits());
-            };
+            popup.querySelector('.tick').onclick = () => toggleHabit(habitName, todayStr);
             popup.querySelector('.cross').onclick = () => {
                 dismissedPopups[habitName] = true;
                 popup.remove();
@@ -77,36 +71,14 @@ function renderAllHabits(habitsData) {
         applyBtn.title = 'Apply color';
         applyBtn.innerHTML = '✔️';
         applyBtn.onclick = () => {
-            updateHabitColor(habitName, colorInput.value, () => {
-                fetch('/api/habits').then(res => res.json()).then(data => {
-                    const updatedHabit = data.habits[habitName];
-                    if (updatedHabit) {
-                        container.querySelectorAll('.habit-cell.done').forEach(cell => {
-                            cell.style.background = updatedHabit.color || '#39d353';
-                        });
-                        colorInput.value = updatedHabit.color || '#39d353';
-                        colorBtn.style.color = updatedHabit.color || '#39d353';
-                    }
-                });
-            });
+            updateHabitColor(habitName, colorInput.value);
         };
         // Refresh icon
         const refreshBtn = document.createElement('button');
         refreshBtn.className = 'icon-btn';
         refreshBtn.title = 'Refresh habit';
         refreshBtn.innerHTML = '⟳';
-        refreshBtn.onclick = () => {
-            fetch('/api/habits').then(res => res.json()).then(data => {
-                const updatedHabit = data.habits[habitName];
-                if (updatedHabit) {
-                    container.querySelectorAll('.habit-cell.done').forEach(cell => {
-                        cell.style.background = updatedHabit.color || '#39d353';
-                    });
-                    colorInput.value = updatedHabit.color || '#39d353';
-                    colorBtn.style.color = updatedHabit.color || '#39d353';
-                }
-            });
-        };
+        refreshBtn.onclick = () => ZeldaStore.revalidate('habits');
         controls.appendChild(colorBtn);
         controls.appendChild(colorInput);
         controls.appendChild(applyBtn);
@@ -161,11 +133,7 @@ function renderAllHabits(habitsData) {
             input.onblur = () => {
                 const newName = input.value.trim() || habitName;
                 if (newName !== habitName) {
-                    fetch('/api/habits/rename', {
-                        method: 'POST',
-                        headers: { 'Content-Type': 'application/json' },
-                        body: JSON.stringify({ old: habitName, new: newName })
-                    }).then(() => loadHabits());
+                    renameHabit(habitName, newName);
                 } else {
                     input.replaceWith(title);
                 }
@@ -189,11 +157,9 @@ function renderAllHabits(habitsData) {
             e.stopPropagation();
             menuDropdown.style.display = 'none';
             if (confirm('Delete this habit?')) {
-                fetch('/api/habits/delete', {
-                    method: 'POST',
-                    headers: { 'Content-Type': 'application/json' },
-                    body: JSON.stringify({ habit: habitName })
-                }).then(() => loadHabits());
+                ZeldaStore.mutate('habits', { type: 'habit.delete', habit: habitName }, habits => {
+                    delete habits[habitName];
+                });
             }
         };
         menuDropdown.appendChild(deleteBtn);
@@ -342,36 +308,44 @@ if (quickCheckForm) {
         const mm = String(today.getMonth() + 1).padStart(2, '0');
         const dd = String(today.getDate()).padStart(2, '0');
         const dateStr = `${yyyy}-${mm}-${dd}`;
-        fetch('/api/habits', {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ habit: habitName, date: dateStr })
-        }).then(() => loadHabits());
+        toggleHabit(habitName, dateStr);
     });
 }
 
-// Patch loadHabits to also update the quick-check dropdown
+// Render from the local store (cached first, then revalidated) and keep the quick-check dropdown in sync
 function loadHabits() {
-    fetch('/api/habits').then(res => res.json()).then(data => {
-        renderAllHabits(data.habits || {});
-        populateQuickHabitSelect(data.habits || {});
+    ZeldaStore.load('habits', habitsData => {
+        renderAllHabits(habitsData);
+        populateQuickHabitSelect(habitsData);
     });
 }
 
+// Changes are applied locally right away and synced in the background.
+// Checks are sent as explicit on/off so replaying them is harmless.
 function toggleHabit(habitName, dateStr) {
-    fetch('/api/habits', {
-        method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ habit: habitName, date: dateStr })
-    }).then(() => loadHabits());
+    const mutation = { type: 'habit.set', habit: habitName, date: dateStr };
+    ZeldaStore.mutate('habits', mutation, habits => {
+        const habit = habits[habitName] || (habits[habitName] = { dates: {}, color: '#2ecc40' });
+        mutation.checked = !habit.dates[dateStr];
+        habit.dates[dateStr] = mutation.checked;
+    });
+}
+
+function updateHabitColor(habitName, color) {
+    ZeldaStore.mutate('habits', { type: 'habit.color', habit: habitName, color }, habits => {
+        if (habits[habitName]) habits[habitName].color = color;
+    });
 }
 
-function updateHabitColor(habitName, color, cb) {
-    fetch('/api/habits/color', {
-        method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ habit: habitName, color })
-    }).then(() => { if (cb) cb(); });
+function renameHabit(oldName, newName) {
+    ZeldaStore.mutate('habits', { type: 'habit.rename', old: oldName, new: newName }, habits => {
+        // Rebuild so the renamed habit keeps its position
+        const renamed = {};
+        Object.entries(habits).forEach(([name, habit]) => {
+            renamed[name === oldName ? newName : name] = habit;
+        });
+        return renamed;
+    });
 }
 
 // Only add event listeners if the elements exist (for page-specific JS)
@@ -381,14 +355,10 @@ if (addHabitForm) {
         e.preventDefault();
         const name = document.getElementById('new-habit-name').value.trim();
         if (!name) return;
-        fetch('/api/habits/new', {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ habit: name })
-        }).then(() => {
-            document.getElementById('new-habit-name').value = '';
-            loadHabits();
+        ZeldaStore.mutate('habits', { type: 'habit.create', habit: name }, habits => {
+            if (!habits[name]) habits[name] = { dates: {}, color: '#2ecc40' };
         });
+        document.getElementById('new-habit-name').value = '';
     });
 }
 
@@ -405,7 +375,8 @@ window.addEventListener('DOMContentLoaded', () => {
     loadHabits();
     
     // Add voice assistant script and styles
-    if (!document.querySelector('script[src="/static/voice.js"]')) {
+    // (the page may link it under a fingerprinted /assets/voice.<hash>.js URL)
+    if (!document.querySelector('script[src="/static/voice.js"], script[src^="/assets/voice."]')) {
         const voiceScript = document.createElement('script');
         voiceScript.src = '/static/voice.js';
         document.head.appendChild(voiceScript);
@@ -0,0 +1,21 @@
+// Load motivational message
+fetch('/api/motivation')
+    .then(response => response.json())
+    .then(data => {
+        document.getElementById('motivationMessage').textContent = data.message;
+    })
+    .catch(error => {
+        document.getElementById('motivationMessage').textContent =
+            "Welcome back! Ready to make today productive and meaningful? 🌟";
+    });
+
+// Today at a glance
+fetch('/api/summary')
+    .then(response => response.json())
+    .then(summary => {
+        const parts = [`${summary.tasks.open} open tasks`];
+        if (summary.tasks.overdue) parts.push(`${summary.tasks.overdue} overdue`);
+        if (summary.habits.total) parts.push(`${summary.habits.checkedToday}/${summary.habits.total} habits done today`);
+        document.getElementById('homeSummary').textContent = parts.join(' · ');
+    })
+    .catch(() => {});
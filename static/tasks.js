@@ -0,0 +1,234 @@
+// Task management functionality
+let tasks = [];
+
+// Initialize the page
+document.addEventListener('DOMContentLoaded', () => {
+    loadTasks();
+    updateTaskStats();
+    generateAISuggestions();
+});
+
+// Show/hide add task form
+function showAddTaskForm() {
+    document.getElementById('addTaskForm').classList.add('active');
+    document.getElementById('taskTitle').focus();
+}
+
+function hideAddTaskForm() {
+    document.getElementById('addTaskForm').classList.remove('active');
+    document.getElementById('addTaskForm').querySelector('form').reset();
+}
+
+// Create new task
+function createTask(event) {
+    event.preventDefault();
+
+    // Temporary id until the server assigns one during sync
+    const clientId = ZeldaStore.temporaryId();
+    const taskData = {
+        id: clientId,
+        clientId: clientId,
+        title: document.getElementById('taskTitle').value,
+        description: document.getElementById('taskDescription').value,
+        priority: document.getElementById('taskPriority').value,
+        category: document.getElementById('taskCategory').value,
+        dueDate: document.getElementById('taskDueDate').value,
+        completed: false,
+        createdAt: new Date().toISOString()
+    };
+
+    // Shown immediately, sent to the backend in the next sync batch
+    ZeldaStore.mutate('tasks', { type: 'task.create', task: taskData }, list => sortTasks([taskData, ...list]));
+    hideAddTaskForm();
+    showNotification('Task created successfully!', 'success');
+}
+
+// Same order as the server: priority, then newest first
+function sortTasks(list) {
+    const rank = { high: 1, medium: 2 };
+    return list.sort((a, b) =>
+        (rank[a.priority] || 3) - (rank[b.priority] || 3) || b.createdAt.localeCompare(a.createdAt)
+    );
+}
+
+// Load tasks (cached copy first, then revalidated with the backend)
+function loadTasks() {
+    ZeldaStore.load('tasks', list => {
+        tasks = list;
+        renderTasks();
+        updateTaskStats();
+    });
+}
+
+// Render tasks in the grid
+function renderTasks() {
+    const taskGrid = document.getElementById('taskGrid');
+    taskGrid.innerHTML = '';
+
+    if (tasks.length === 0) {
+        taskGrid.innerHTML = `
+            <div style="grid-column: 1/-1; text-align: center; padding: 40px; color: #718096;">
+                <i class="fas fa-tasks" style="font-size: 3em; margin-bottom: 20px; opacity: 0.3;"></i>
+                <h3>No tasks yet</h3>
+                <p>Create your first task to get started with Aurora's intelligent task management</p>
+            </div>
+        `;
+        return;
+    }
+
+    tasks.forEach(task => {
+        const taskCard = createTaskCard(task);
+        taskGrid.appendChild(taskCard);
+    });
+}
+
+// Create task card element
+function createTaskCard(task) {
+    const card = document.createElement('div');
+    card.className = `task-card ${task.priority}-priority ${task.completed ? 'completed' : ''}`;
+
+    const dueDate = task.dueDate ? new Date(task.dueDate).toLocaleDateString() : 'No due date';
+    const category = task.category.charAt(0).toUpperCase() + task.category.slice(1);
+
+    card.innerHTML = `
+        <div class="task-title">${task.title}</div>
+        <div class="task-description">${task.description || 'No description'}</div>
+        <div class="task-meta">
+            <div>
+                <span style="background: #e2e8f0; padding: 2px 8px; border-radius: 12px; font-size: 11px;">
+                    ${category}
+                </span>
+                <span style="margin-left: 8px; font-size: 11px;">
+                    📅 ${dueDate}
+                </span>
+            </div>
+            <div class="task-actions">
+                ${!task.completed ? 
+                    `<button class="action-btn complete-btn" onclick="completeTask('${task.id}')">
+                        <i class="fas fa-check"></i>
+                    </button>` : 
+                    `<span style="color: #48bb78;"><i class="fas fa-check-circle"></i> Done</span>`
+                }
+                <button class="action-btn" onclick="editTask('${task.id}')">
+                    <i class="fas fa-edit"></i>
+                </button>
+                <button class="action-btn" onclick="deleteTask('${task.id}')" style="color: #f56565;">
+                    <i class="fas fa-trash"></i>
+                </button>
+            </div>
+        </div>
+    `;
+
+    return card;
+}
+
+// Complete task
+function completeTask(taskId) {
+    ZeldaStore.mutate('tasks', { type: 'task.complete', taskId: taskId }, list => {
+        const task = list.find(t => String(t.id) === String(taskId));
+        if (task) task.completed = true;
+    });
+    showNotification('Task completed! 🎉', 'success');
+}
+
+// Delete task
+function deleteTask(taskId) {
+    if (confirm('Are you sure you want to delete this task?')) {
+        ZeldaStore.mutate('tasks', { type: 'task.delete', taskId: taskId },
+            list => list.filter(t => String(t.id) !== String(taskId)));
+        showNotification('Task deleted', 'info');
+    }
+}
+
+// Update task statistics
+function updateTaskStats() {
+    const total = tasks.length;
+    const completed = tasks.filter(task => task.completed).length;
+    const pending = total - completed;
+
+    document.getElementById('totalTasks').textContent = total;
+    document.getElementById('completedTasks').textContent = completed;
+    document.getElementById('pendingTasks').textContent = pending;
+}
+
+// Voice task creation
+function startVoiceTaskCreation() {
+    showNotification('🎤 Speak to create a task. Say something like "Create a task to review project proposal with high priority"', 'info');
+    // Voice functionality will be handled by voice.js
+}
+
+// Generate AI suggestions
+function generateAISuggestions() {
+    // This would normally call the backend AI service
+    // For now, we'll use placeholder suggestions
+}
+
+// Apply AI suggestion
+function applySuggestion(element) {
+    const suggestion = element.querySelector('strong').textContent;
+    showNotification(`Applied suggestion: ${suggestion}`, 'success');
+    // Implement the actual suggestion logic
+}
+
+// Show task analytics
+function showTaskAnalytics() {
+    // Calculate task statistics
+    const completedTasks = tasks.filter(task => task.completed).length;
+    const totalTasks = tasks.length;
+    const completionRate = totalTasks > 0 ? Math.round((completedTasks / totalTasks) * 100) : 0;
+
+    const message = `📊 Task Analytics: ${completedTasks}/${totalTasks} completed (${completionRate}%)`;
+    showNotification(message, 'info');
+}
+
+// Show calendar view
+function showCalendarView() {
+    // Simple calendar view toggle
+    const taskCards = document.querySelectorAll('.task-card');
+    let isCalendarView = document.body.classList.toggle('calendar-view');
+
+    if (isCalendarView) {
+        showNotification('📅 Calendar view activated!', 'info');
+    } else {
+        showNotification('📋 List view activated!', 'info');
+    }
+}
+
+// Notification system
+function showNotification(message, type = 'info') {
+    const notification = document.createElement('div');
+    notification.style.cssText = `
+        position: fixed;
+        top: 20px;
+        right: 20px;
+        background: ${type === 'success' ? '#48bb78' : type === 'error' ? '#f56565' : '#667eea'};
+        color: white;
+        padding: 15px 20px;
+        border-radius: 8px;
+        box-shadow: 0 4px 12px rgba(0,0,0,0.1);
+        z-index: 1000;
+        animation: slideIn 0.3s ease;
+    `;
+    notification.textContent = message;
+
+    document.body.appendChild(notification);
+
+    setTimeout(() => {
+        notification.style.animation = 'slideOut 0.3s ease';
+        setTimeout(() => notification.remove(), 300);
+    }, 3000);
+}
+
+// Add CSS animations
+const style = document.createElement('style');
+style.textContent = `
+    @keyframes slideIn {
+        from { transform: translateX(100%); opacity: 0; }
+        to { transform: translateX(0); opacity: 1; }
+    }
+    @keyframes slideOut {
+        from { transform: translateX(0); opacity: 1; }
+        to { transform: translateX(100%); opacity: 0; }
+    }
+`;
+document.head.appendChild(style);
@@ -5,6 +5,7 @@ let mediaRecorder;
 let audioChunks = [];
 let isRecording = false;
 let voiceAssistantActive = false;
+let voiceSocket = null;
 
 // Initialize voice assistant functionality
 function initVoiceAssistant() {
@@ -72,12 +73,17 @@ function startRecording() {
         .then(stream => {
             audioChunks = [];
             mediaRecorder = new MediaRecorder(stream);
+            voiceSocket = openVoiceStream();
             
             mediaRecorder.addEventListener('dataavailable', event => {
                 audioChunks.push(event.data);
+                // Stream chunks as they are captured so the server can transcribe while we talk
+                if (voiceSocket && voiceSocket.readyState === WebSocket.OPEN) {
+                    voiceSocket.send(event.data);
+                }
             });
             
-            mediaRecorder.addEventListener('stop', processAudio);
+            mediaRecorder.addEventListener('stop', finishAudio);
             
             // Update UI to show recording state
             isRecording = true;
@@ -85,8 +91,8 @@ function startRecording() {
             voiceButton.innerHTML = '<i class="fas fa-stop"></i>';
             statusIndicator.textContent = 'Listening...';
             
-            // Start recording
-            mediaRecorder.start();
+            // Start recording, emitting a chunk every 250ms for streaming
+            mediaRecorder.start(250);
             
             // Auto-stop after 10 seconds if user doesn't stop manually
             setTimeout(() => {
@@ -121,6 +127,56 @@ function stopRecording() {
     }
 }
 
+// Open a streaming connection for incremental transcription (falls back to upload)
+function openVoiceStream() {
+    if (!window.WebSocket) {
+        return null;
+    }
+    
+    const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
+    const socket = new WebSocket(`${protocol}//${window.location.host}/ws/voice`);
+    
+    socket.addEventListener('message', event => {
+        const data = JSON.parse(event.data);
+        const statusIndicator = document.getElementById('voice-status');
+        
+        if (data.type === 'partial') {
+            statusIndicator.textContent = data.transcript ? `"${data.transcript}..."` : 'Listening...';
+        } else if (data.type === 'final') {
+            socket.gotFinal = true;
+            socket.close();
+            handleVoiceResult(data);
+        } else if (data.type === 'error') {
+            socket.close();
+        }
+    });
+    
+    socket.addEventListener('error', () => {
+        console.warn('Voice streaming unavailable, falling back to upload');
+    });
+    
+    // If the stream dropped after we finished speaking, upload the full clip instead
+    socket.addEventListener('close', () => {
+        if (socket.endSent && !socket.gotFinal) {
+            processAudio();
+        }
+    });
+    
+    return socket;
+}
+
+// Finish the recording, either by closing the stream or uploading the clip
+function finishAudio() {
+    if (voiceSocket && voiceSocket.readyState === WebSocket.OPEN) {
+        voiceSocket.send(JSON.stringify({ type: 'end' }));
+        voiceSocket.endSent = true;
+        voiceSocket = null;
+    } else {
+        voiceSocket = null;
+        processAudio();
+    }
+}
+
 // Process the recorded audio
 function processAudio() {
     const statusIndicator = document.getElementById('voice-status');
@@ -140,33 +196,39 @@ function processAudio() {
         }
         return response.json();
     })
-    .then(data => {
-        statusIndicator.textContent = 'Click to speak';
-        
-        // Display transcription and response
-        if (data.transcript) {
-            showSpeechFeedback('You: ' + data.transcript);
-        }
-        
-        if (data.reply) {
-            // Wait a moment before showing the AI response (feels more natural)
-            setTimeout(() => {
-                showSpeechFeedback('Zelda: ' + data.reply, true);
-                speakResponse(data.reply);
-                
-                // If there was an action performed, refresh relevant data
-                if (data.action === 'habit_updated') {
-                    loadHabits(); // Reload habits if they were updated
-                }
-            }, 1000);
-        }
-    })
+    .then(handleVoiceResult)
     .catch(error => {
         console.error('Error processing audio:', error);
         statusIndicator.textContent = 'Error processing speech';
     });
 }
 
+// Show the transcript and reply for a processed voice command
+function handleVoiceResult(data) {
+    const statusIndicator = document.getElementById('voice-status');
+    statusIndicator.textContent = 'Click to speak';
+    
+    // Display transcription and response
+    if (data.transcript) {
+        showSpeechFeedback('You: ' + data.transcript);
+    }
+    
+    if (data.reply) {
+        // Wait a moment before showing the AI response (feels more natural)
+        setTimeout(() => {
+            showSpeechFeedback('Zelda: ' + data.reply, true);
+            speakResponse(data.reply);
+            
+            // If there was an action performed, refresh relevant data
+            if (data.action === 'habit_updated') {
+                loadHabits(); // Reload habits if they were updated
+            } else if ((data.action === 'task_created' || data.action === 'task_updated') && typeof loadTasks === 'function') {
+                loadTasks(); // The server changed tasks behind the local store's back
+            }
+        }, 1000);
+    }
+}
+
 // Display speech feedback on screen
 function showSpeechFeedback(text, isAssistant = false) {
     const feedbackContainer = document.getElementById('speech-feedback');
@@ -0,0 +1,142 @@
+"""
+Materialized counters for the dashboard summary.
+
+/api/summary used to mean shipping every task and habit to the browser so it
+could count them. Instead the write paths in app.py report small deltas
+("one open high-priority task added", "habit checked on 2025-01-03") and
+these counters answer the summary from memory.
+
+Each batch of deltas carries the data version before and after its write. If
+the counters were not at the "before" version, some write was missed (another
+process, or two threads finishing out of order), so the counters are marked
+stale and rebuilt from SQL aggregates on the next read.
+"""
+
+import threading
+from collections import Counter
+from datetime import date, timedelta
+
+PRIORITIES = ('high', 'medium', 'low')
+CATEGORIES = ('work', 'personal', 'health', 'learning', 'other')
+
+
+class DashboardSummary:
+    """Task and habit totals kept in step with the database"""
+
+    # Deltas passed to update():
+    #   ('task', +1/-1, completed, priority, category, due_date)
+    #   ('habit', +1/-1)
+    #   ('check', date, +1/-1)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.version = None      # data version the counters reflect; None means rebuild
+        self.rebuilds = 0
+        self._reset()
+
+    def _reset(self):
+        self.tasks = Counter()       # (completed, priority, category) -> tasks
+        self.open_due = Counter()    # due day (YYYY-MM-DD) -> open tasks
+        self.habits = 0
+        self.checked = Counter()     # day -> habits checked that day
+
+    def update(self, before, after, changes):
+        """Apply the deltas of one write that moved the data version from before to after"""
+        with self._lock:
+            if self.version is None or self.version != before:
+                self.version = None
+                return
+            for change in changes:
+                self._apply(change)
+            self.version = after
+
+    def _apply(self, change):
+        kind, *args = change
+        if kind == 'task':
+            delta, completed, priority, category, due_date = args
+            self.tasks[(bool(completed), priority, category)] += delta
+            if not completed and due_date:
+                self.open_due[due_date[:10]] += delta
+        elif kind == 'habit':
+            self.habits += args[0]
+        elif kind == 'check':
+            day, delta = args
+            self.checked[day] += delta
+
+    def rebuild(self, conn):
+        """Recompute every counter with SQL aggregates (one consistent read)"""
+        conn.execute('BEGIN')
+        try:
+            version = conn.execute('SELECT version FROM sync_state WHERE id = 1').fetchone()[0]
+            # Archived tasks (all completed) still count towards the totals
+            tasks = conn.execute('''
+                SELECT completed, priority, category, COUNT(*) FROM (
+                    SELECT completed, priority, category FROM tasks
+                    UNION ALL
+                    SELECT completed, priority, category FROM tasks_archive
+                )
+                GROUP BY completed, priority, category
+            ''').fetchall()
+            open_due = conn.execute('''
+                SELECT substr(due_date, 1, 10), COUNT(*) FROM tasks
+                WHERE NOT completed AND due_date IS NOT NULL AND due_date != ''
+                GROUP BY substr(due_date, 1, 10)
+            ''').fetchall()
+            habits = conn.execute('SELECT COUNT(*) FROM habits').fetchone()[0]
+            checked = conn.execute('''
+                SELECT d.date, COUNT(*) FROM habit_dates d JOIN habits h ON h.id = d.habit_id
+                WHERE d.checked GROUP BY d.date
+            ''').fetchall()
+        finally:
+            conn.rollback()
+
+        with self._lock:
+            self._reset()
+            for completed, priority, category, count in tasks:
+                self.tasks[(bool(completed), priority, category)] = count
+            self.open_due.update(dict(open_due))
+            self.habits = habits
+            self.checked.update(dict(checked))
+            self.version = version
+            self.rebuilds += 1
+
+    def snapshot(self, today=None):
+        """The summary as a small JSON-ready dict"""
+        today = today or date.today()
+        today_str = today.isoformat()
+        week = [(today - timedelta(days=i)).isoformat() for i in range(7)]
+
+        with self._lock:
+            by_priority = {p: {'open': 0, 'completed': 0} for p in PRIORITIES}
+            by_category = {c: {'open': 0, 'completed': 0} for c in CATEGORIES}
+            for (completed, priority, category), count in self.tasks.items():
+                if not count:
+                    continue
+                key = 'completed' if completed else 'open'
+                by_priority.setdefault(priority, {'open': 0, 'completed': 0})[key] += count
+                by_category.setdefault(category, {'open': 0, 'completed': 0})[key] += count
+            overdue = sum(count for day, count in self.open_due.items() if day < today_str)
+            habits = self.habits
+            checked_today = self.checked[today_str]
+            checked_week = sum(self.checked[day] for day in week)
+            version = self.version
+
+        completed = sum(counts['completed'] for counts in by_priority.values())
+        total = completed + sum(counts['open'] for counts in by_priority.values())
+        return {
+            'tasks': {
+                'total': total,
+                'open': total - completed,
+                'completed': completed,
+                'overdue': overdue,
+                'completionRate': round(100 * completed / total) if total else 0,
+                'byPriority': by_priority,
+                'byCategory': by_category
+            },
+            'habits': {
+                'total': habits,
+                'checkedToday': checked_today,
+                'weekCompletion': round(100 * checked_week / (habits * 7)) if habits else 0
+            },
+            'version': version
+        }
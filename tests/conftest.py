@@ -0,0 +1,33 @@
+import os
+import sys
+import tempfile
+
+# The app reads its configuration at import time: point it at a scratch
+# database and keep the background threads and rate limits out of the way
+_scratch = tempfile.mkdtemp(prefix='zelda-tests-')
+os.environ['ZELDA_DB'] = os.path.join(_scratch, 'habits.db')
+os.environ.setdefault('ZELDA_REMINDERS', 'off')
+os.environ.setdefault('ZELDA_ARCHIVE_INTERVAL_HOURS', '0')
+os.environ.setdefault('ZELDA_ADMISSION', 'off')
+os.environ.setdefault('ZELDA_WARMUP', '0')
+os.environ.setdefault('ZELDA_EMBEDDER', 'hashing')
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+
+@pytest.fixture
+def zelda(tmp_path, monkeypatch):
+    """The app module using a fresh database"""
+    import app
+
+    monkeypatch.setattr(app, 'DB_FILE', str(tmp_path / 'habits.db'))
+    monkeypatch.setattr(app, 'single_db', app.DatabaseState(app._connect_db_file))
+    app.init_db()
+    return app
+
+
+@pytest.fixture
+def client(zelda):
+    return zelda.create_app(warm=False).test_client()
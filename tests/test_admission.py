@@ -0,0 +1,98 @@
+import math
+import time
+
+import pytest
+from flask import Flask
+from werkzeug.middleware.proxy_fix import ProxyFix
+
+from admission import AdmissionController, Rejected, RouteLimit, TokenBucket
+
+
+def test_token_bucket_refills_up_to_burst():
+    bucket = TokenBucket(rate=2, burst=10, now=0)
+    assert bucket.wait_time(10, now=0) == 0
+    bucket.take(10)
+    assert bucket.wait_time(6, now=1) == 2
+    assert bucket.tokens == 2
+    bucket.refill(now=100)
+    assert bucket.tokens == 10
+    assert math.isinf(bucket.wait_time(11, now=100))
+
+
+def test_client_and_global_limits():
+    controller = AdmissionController({'chat': RouteLimit(5, 0)}, client_rate=1, client_burst=10,
+                                     global_rate=1, global_burst=15)
+    now = time.monotonic()
+    controller.admit('chat', 'a', now)
+    controller.admit('chat', 'a', now)
+    with pytest.raises(Rejected) as e:
+        controller.admit('chat', 'a', now)
+    assert e.value.reason == 'client_rate' and e.value.retry_after == 5
+    controller.admit('chat', 'b', now)
+    with pytest.raises(Rejected) as e:
+        controller.admit('chat', 'c', now)
+    assert e.value.reason == 'global_rate'
+    controller.admit('chat', 'c', now + 5)
+
+
+def test_concurrency_cap_and_release():
+    controller = AdmissionController({'import': RouteLimit(1, 1)})
+    controller.admit('import', 'a')
+    with pytest.raises(Rejected) as e:
+        controller.admit('import', 'b')
+    assert e.value.reason == 'concurrency'
+    controller.release('import')
+    controller.admit('import', 'b')
+    assert controller.stats()['running'] == {'import': 1}
+
+
+def test_rejected_requests_get_429_with_retry_after():
+    app = Flask(__name__)
+
+    @app.route('/chat', methods=['POST'])
+    def chat():
+        return 'ok'
+
+    AdmissionController({'chat': RouteLimit(10, 0)}, client_rate=0.1, client_burst=10).init_app(app)
+    client = app.test_client()
+    assert client.post('/chat').status_code == 200
+    response = client.post('/chat')
+    assert response.status_code == 429
+    assert response.headers['Retry-After'] == '100'
+    assert response.json['reason'] == 'client_rate'
+
+
+def test_client_is_the_address_the_trusted_proxy_added(zelda):
+    app = Flask(__name__)
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=zelda.PROXY_HOPS)
+
+    @app.route('/client')
+    def client_key():
+        return zelda.admission_client()
+
+    client = app.test_client()
+    proxy = {'REMOTE_ADDR': '10.0.0.2'}
+    # The proxy appends the address it saw to whatever the client sent
+    response = client.get('/client', environ_base=proxy,
+                          headers={'X-Forwarded-For': '203.0.113.9, 198.51.100.7', zelda.USER_HEADER: 'mallory'})
+    assert response.text == '198.51.100.7'
+    assert client.get('/client', environ_base=proxy, headers={'X-Forwarded-For': '198.51.100.8'}).text == '198.51.100.8'
+    assert client.get('/client', environ_base=proxy).text == '10.0.0.2'
+
+
+def test_one_users_voice_commands_fit_the_default_limits():
+    controller = AdmissionController()
+    now = time.monotonic()
+    for _ in range(10):
+        controller.admit('main.handle_voice', '198.51.100.7', now)
+        controller.release('main.handle_voice')
+    for i in range(1, 20):
+        controller.admit('main.handle_voice', '198.51.100.7', now + 3 * i)
+        controller.release('main.handle_voice')
+
+
+def test_import_fits_the_default_client_burst():
+    controller = AdmissionController()
+    for _ in range(3):
+        controller.admit('main.import_api', 'a', now=0)
+        controller.release('main.import_api')
@@ -0,0 +1,40 @@
+from datetime import date, timedelta
+
+import archive
+
+
+def test_set_day_and_checked_days_round_trip():
+    days = bytearray(archive.YEAR_BYTES)
+    checked = [date(2024, 1, 1), date(2024, 2, 29), date(2024, 7, 4), date(2024, 12, 31)]
+    for day in checked:
+        archive.set_day(days, day, True)
+    archive.set_day(days, date(2024, 3, 1), True)
+    archive.set_day(days, date(2024, 3, 1), False)
+    archive.set_day(days, date(2024, 3, 2), False)
+    assert list(archive.checked_days(2024, days)) == [day.isoformat() for day in checked]
+    assert list(archive.checked_days(2024, bytes(archive.YEAR_BYTES))) == []
+
+
+def test_archive_database_moves_cold_rows(zelda):
+    today = date(2026, 10, 19)
+    conn = zelda.connect_db()
+    try:
+        conn.execute("INSERT INTO habits (id, name) VALUES (1, 'Run')")
+        conn.executemany('INSERT INTO habit_dates (habit_id, date, checked) VALUES (1, ?, ?)',
+                         [('2024-03-01', 1), ('2024-03-02', 0), ('2025-01-05', 1), ('2026-10-18', 1)])
+        old = (today - timedelta(days=200)).isoformat()
+        conn.executemany('''
+            INSERT INTO tasks (title, completed, created_at, completed_at, title_key) VALUES (?, ?, ?, ?, ?)
+        ''', [('Old', 1, old, old, 'old'), ('Recent', 1, old, today.isoformat(), 'recent'),
+              ('Open', 0, old, None, 'open')])
+        conn.commit()
+
+        assert archive.archive_database(conn, today) == {'tasks': 1, 'habit_dates': 2, 'habit_years': 1}
+        assert archive.archive_database(conn, today) == {'tasks': 0, 'habit_dates': 0, 'habit_years': 0}
+        assert [row[0] for row in conn.execute('SELECT title FROM tasks ORDER BY id')] == ['Recent', 'Open']
+        assert [row[1] for row in archive.archived_tasks(conn)] == ['Old']
+        assert archive.archived_habit_dates(conn, '2024-01-01') == {1: ['2024-03-01']}
+        assert [row[0] for row in conn.execute('SELECT date FROM habit_dates ORDER BY date')] == [
+            '2025-01-05', '2026-10-18']
+    finally:
+        conn.close()
@@ -0,0 +1,109 @@
+import logging
+import sqlite3
+
+import pytest
+
+import conversation
+from conversation import ConversationMemory
+
+
+@pytest.fixture
+def connect(tmp_path):
+    path = str(tmp_path / 'chat.db')
+    conn = sqlite3.connect(path)
+    conversation.create_tables(conn.cursor())
+    conn.commit()
+    conn.close()
+    return lambda: sqlite3.connect(path)
+
+
+def turn_contents(connect, session='s'):
+    conn = connect()
+    try:
+        return [row[0] for row in conn.execute('SELECT content FROM chat_turns WHERE session = ? ORDER BY id',
+                                               (session,))]
+    finally:
+        conn.close()
+
+
+def summarized_through(connect, session='s'):
+    conn = connect()
+    try:
+        return conn.execute('SELECT summarized_through FROM chat_sessions WHERE session = ?',
+                            (session,)).fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_context_keeps_the_newest_turns_within_the_budget(connect):
+    memory = ConversationMemory(connect, lambda *args: None, context_tokens=10000, summary_tokens=100)
+    for i in range(10):
+        memory.record('s', f'question {i} ' + 'x' * 36, f'answer {i} ' + 'y' * 36)
+    # Each turn is estimated at 12 + 2 tokens: five of them fit in 75
+    memory.context_tokens = 75
+    context = memory.context('s')
+    assert 'Summary' not in context
+    assert context.splitlines() == [f'Zelda: answer 7 {"y" * 36}', f'User: question 8 {"x" * 36}',
+                                    f'Zelda: answer 8 {"y" * 36}', f'User: question 9 {"x" * 36}',
+                                    f'Zelda: answer 9 {"y" * 36}']
+    assert conversation.estimate_tokens(context) <= memory.context_tokens
+
+
+def test_summary_replaces_the_turns_it_covers(connect):
+    memory = ConversationMemory(connect, lambda summary, transcript: 'Talked about the gym.',
+                                context_tokens=60, summary_tokens=20)
+    for i in range(4):
+        memory.record('s', f'question {i}', f'answer {i}')
+    assert memory.update_summary('s')
+    context = memory.context('s')
+    assert context.startswith('Summary of the conversation so far: Talked about the gym.')
+    assert 'question 0' not in context and 'answer 3' in context
+
+
+def test_ring_only_trims_summarized_turns(connect):
+    memory = ConversationMemory(connect, lambda *args: 'summary', context_tokens=10000, max_turns=4)
+
+    def summarize_through(turn_id):
+        conn = connect()
+        conn.execute('UPDATE chat_sessions SET summarized_through = ?', (turn_id,))
+        conn.commit()
+        conn.close()
+
+    for i in range(3):
+        memory.record('s', f'q{i}', f'a{i}')
+    # Nothing is summarized yet, so the ring doesn't drop anything
+    assert turn_contents(connect) == ['q0', 'a0', 'q1', 'a1', 'q2', 'a2']
+    summarize_through(2)
+    memory.record('s', 'q3', 'a3')
+    assert turn_contents(connect) == ['q1', 'a1', 'q2', 'a2', 'q3', 'a3']
+    summarize_through(8)
+    memory.record('s', 'q4', 'a4')
+    assert turn_contents(connect) == ['q3', 'a3', 'q4', 'a4']
+
+
+def test_unsummarized_turns_are_capped_with_a_warning(connect, caplog):
+    memory = ConversationMemory(connect, lambda *args: None, context_tokens=10000, max_turns=2,
+                                max_pending_turns=6)
+    with caplog.at_level(logging.WARNING, logger='conversation'):
+        for i in range(5):
+            memory.record('s', f'q{i}', f'a{i}')
+    assert turn_contents(connect) == ['q2', 'a2', 'q3', 'a3', 'q4', 'a4']
+    assert 'never summarized' in caplog.text
+
+
+def test_summary_only_advances_from_the_state_it_was_built_on(connect):
+    memory = ConversationMemory(connect, None, context_tokens=60, summary_tokens=20)
+    for i in range(4):
+        memory.record('s', f'question {i}', f'answer {i}')
+
+    def summarize_while_another_summary_lands(summary, transcript):
+        conn = connect()
+        conn.execute("UPDATE chat_sessions SET summary = 'newer', summarized_through = 1")
+        conn.commit()
+        conn.close()
+        return 'stale summary'
+
+    memory.summarize = summarize_while_another_summary_lands
+    memory.update_summary('s')
+    assert summarized_through(connect) == 1
+    assert memory.context('s').startswith('Summary of the conversation so far: newer')
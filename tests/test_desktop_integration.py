@@ -0,0 +1,15 @@
+import desktop_integration
+
+
+def test_notification_text_is_passed_as_arguments(monkeypatch):
+    calls = []
+    monkeypatch.setattr(desktop_integration.subprocess, 'run', lambda args, **kwargs: calls.append(args))
+    title = 'Zelda reminder'
+    message = 'x" & (do shell script "touch /tmp/pwned") & " is due 2026-10-19'
+    assert desktop_integration.show_notification(title, message)
+    desktop_integration.create_reminder(message)
+
+    for args in calls:
+        assert args[0] == 'osascript'
+        assert args[-1] == message
+        assert not any('do shell script' in arg for arg in args[:-1])
@@ -0,0 +1,74 @@
+import datetime
+
+import pytest
+
+from habit_index import HabitNameIndex, completed_habit_name
+
+
+@pytest.fixture
+def index():
+    index = HabitNameIndex()
+    for name in ('Reading', 'Read the news', 'Running', 'Drink water', 'Meditation'):
+        index.add(name)
+    return index
+
+
+def test_best_scoring_habit_wins(index):
+    assert index.best_match('reading') == 'Reading'
+    assert index.best_match('my reading') == 'Reading'
+    assert index.best_match('read the news') == 'Read the news'
+    assert index.best_match('drinking water') == 'Drink water'
+    assert index.best_match('meditaton') == 'Meditation'          # transcription slip
+    assert index.best_match('basket weaving') is None
+    names = [name for name, _ in index.search('reading', limit=5)]
+    assert names[0] == 'Reading' and 'Read the news' in names
+    scores = [score for _, score in index.search('running')]
+    assert scores == sorted(scores, reverse=True)
+
+
+def test_add_rename_and_remove_keep_the_index_current(index):
+    index.add('Reading')
+    assert len(index) == 5
+    assert index.equivalent('reading!') == 'Reading'
+
+    index.rename('Running', 'Evening jog')
+    assert 'Running' not in index and 'Evening jog' in index
+    assert index.best_match('running') != 'Running'
+    assert index.best_match('evening jog') == 'Evening jog'
+
+    index.remove('Meditation')
+    index.remove('Meditation')
+    assert index.best_match('meditation') is None
+    assert index.equivalent('meditation') is None
+    assert len(index) == 4
+
+
+@pytest.mark.parametrize('text, name', [
+    ('mark habit reading done', 'reading'),
+    ('i completed my reading habit today', 'reading'),
+    ('check off the drink water habit for today', 'drink water'),
+    ('finished the habit called running just now', 'running'),
+    ('i did my meditation habit.', 'meditation'),
+    ('what habits do i have', None),
+])
+def test_completed_habit_name(text, name):
+    assert completed_habit_name(text) == name
+
+
+def test_voice_completes_the_best_matching_habit(client, zelda):
+    import voice_assistant
+
+    for name in ('Reading', 'Read the news', 'Running'):
+        client.post('/api/habits/new', json={'habit': name})
+    today = datetime.date.today().isoformat()
+    with zelda.create_app(warm=False).test_request_context():
+        for phrase in ('mark habit reading done', 'I completed my reading habit today'):
+            result = voice_assistant.process_command(phrase)
+            assert result['action'] == 'habit_updated'
+            assert "'Reading'" in result['reply']
+        assert voice_assistant.process_command('mark habit basket weaving done')['action'] == 'habit_not_found'
+
+    habits = client.get('/api/habits').json['habits']
+    # Saying it twice leaves it checked rather than toggling it back
+    assert habits['Reading']['dates'] == {today: True}
+    assert habits['Read the news']['dates'] == {}
@@ -0,0 +1,68 @@
+import time
+
+from idempotency import IdempotencyStore
+from summary import DashboardSummary
+
+
+def test_create_is_replayed_for_the_same_key(client):
+    headers = {'Idempotency-Key': 'create-1'}
+    task = {'title': 'Buy milk', 'createdAt': '2026-10-19'}
+    first = client.post('/api/tasks', json=task, headers=headers)
+    retry = client.post('/api/tasks', json=task, headers=headers)
+    assert first.status_code == retry.status_code == 200
+    assert retry.json == first.json
+    assert retry.headers['Idempotent-Replayed'] == 'true'
+    assert 'Idempotent-Replayed' not in first.headers
+    assert len(client.get('/api/tasks').json['tasks']) == 1
+
+
+def test_key_reused_for_a_different_request_is_rejected(client):
+    headers = {'Idempotency-Key': 'create-2'}
+    assert client.post('/api/tasks', json={'title': 'Walk dog', 'createdAt': 'x'}, headers=headers).status_code == 200
+    mismatch = client.post('/api/tasks', json={'title': 'Feed cat', 'createdAt': 'x'}, headers=headers)
+    assert mismatch.status_code == 422
+    assert [task['title'] for task in client.get('/api/tasks').json['tasks']] == ['Walk dog']
+    assert client.post('/api/tasks', json={'title': 'x'}, headers={'Idempotency-Key': 'k' * 256}).status_code == 400
+
+
+def test_store_claims_expires_and_abandons(zelda):
+    store = IdempotencyStore(zelda.connect_db, ttl=60)
+    assert store.begin('k', 'f1') is None
+    assert store.begin('k', 'f1') == ('f1', None, None)        # still running
+    store.finish('k', 201, '{"ok": true}')
+    assert store.begin('k', 'f1') == ('f1', 201, '{"ok": true}')
+
+    store.abandon('k')                                          # only unfinished keys are released
+    assert store.begin('k', 'f1').status == 201
+    assert store.begin('failed', 'f2') is None
+    store.abandon('failed')
+    assert store.begin('failed', 'f2') is None
+
+    store.ttl = 0
+    time.sleep(0.01)
+    assert store.begin('k', 'f3') is None                       # expired keys are claimed afresh
+
+
+def test_creating_an_open_task_again_updates_it(client, zelda, monkeypatch):
+    scheduled = []
+    monkeypatch.setattr(zelda, 'schedule_reminder', lambda *args: scheduled.append(args))
+    first = client.post('/api/tasks', json={'title': 'Pay rent', 'createdAt': '2026-10-19'}).json
+    again = client.post('/api/tasks', json={'title': 'pay rent', 'priority': 'high', 'dueDate': '2026-11-01',
+                                            'createdAt': '2026-10-20'}).json
+    assert again == {'success': True, 'task_id': first['task_id'], 'created': False}
+    [task] = client.get('/api/tasks').json['tasks']
+    assert (task['title'], task['priority'], task['dueDate']) == ('Pay rent', 'high', '2026-11-01')
+    assert scheduled[-1] == (first['task_id'], 'Pay rent', '2026-11-01')
+    # The summary counters were moved along with the task
+    rebuilt = DashboardSummary()
+    conn = zelda.connect_db()
+    rebuilt.rebuild(conn)
+    conn.close()
+    assert zelda.get_summary() == rebuilt.snapshot()
+
+    # Automatic creates (voice, chat) leave an existing task as it is
+    with zelda.create_app(warm=False).test_request_context():
+        assert zelda.create_task_via_voice('Pay rent', '2026-12-01') == first['task_id']
+    [task] = client.get('/api/tasks').json['tasks']
+    assert (task['priority'], task['dueDate']) == ('high', '2026-11-01')
+    assert len(scheduled) == 2
@@ -0,0 +1,74 @@
+import os
+import threading
+
+from flask import Flask, Response
+
+from profiling import RequestProfiler
+
+PROFILE = {'X-Zelda-Profile': 's3cret'}
+
+
+def test_concurrent_cprofile_requests_fall_back_to_sampling(tmp_path):
+    app = Flask(__name__)
+    entered = threading.Event()
+    release = threading.Event()
+
+    @app.route('/slow')
+    def slow():
+        entered.set()
+        release.wait(5)
+        return 'slow'
+
+    @app.route('/fast')
+    def fast():
+        return 'fast'
+
+    RequestProfiler(output_dir=str(tmp_path), secret='s3cret', mode='cprofile').init_app(app)
+    client = app.test_client()
+    slow_response = {}
+    thread = threading.Thread(
+        target=lambda: slow_response.update(r=client.get('/slow', headers=PROFILE, buffered=True)))
+    thread.start()
+    assert entered.wait(5)
+    fast = client.get('/fast', headers=PROFILE, buffered=True)
+    release.set()
+    thread.join(5)
+
+    assert fast.data == b'fast' and slow_response['r'].data == b'slow'
+    assert fast.headers['X-Zelda-Profile-File'].endswith('.speedscope.json')
+    assert slow_response['r'].headers['X-Zelda-Profile-File'].endswith('.prof')
+    assert len(os.listdir(tmp_path)) == 2
+
+    # The cProfile slot is free again
+    assert client.get('/fast', headers=PROFILE, buffered=True).headers['X-Zelda-Profile-File'].endswith('.prof')
+
+
+def test_streamed_response_is_not_buffered(tmp_path):
+    app = Flask(__name__)
+    produced = []
+
+    @app.route('/stream')
+    def stream():
+        def generate():
+            for chunk in ('a', 'b', 'c'):
+                produced.append(chunk)
+                yield chunk
+        return Response(generate())
+
+    RequestProfiler(output_dir=str(tmp_path), secret='s3cret').init_app(app)
+    response = app.test_client().get('/stream', headers=PROFILE, buffered=False)
+    chunks = iter(response.response)
+    assert next(chunks) == b'a' and produced == ['a']
+    assert os.listdir(tmp_path) == []       # still profiling
+    assert list(chunks) == [b'b', b'c']
+    response.close()
+    assert len(os.listdir(tmp_path)) == 1
+
+
+def test_secret_in_the_query_string_is_ignored(tmp_path):
+    app = Flask(__name__)
+    app.route('/fast')(lambda: 'fast')
+    RequestProfiler(output_dir=str(tmp_path), secret='s3cret').init_app(app)
+    response = app.test_client().get('/fast?_profile=s3cret')
+    assert 'X-Zelda-Profile-File' not in response.headers
+    assert os.listdir(tmp_path) == []
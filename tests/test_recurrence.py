@@ -0,0 +1,113 @@
+from datetime import date
+from itertools import islice
+
+import pytest
+
+import recurrence
+
+
+def test_parse_and_format_round_trip():
+    rule = recurrence.parse('rrule:freq=weekly;interval=2;byday=th,mo;until=20261231;start=2026-10-19')
+    assert rule.byday == (0, 3)
+    assert rule.until == date(2026, 12, 31)
+    assert recurrence.format_rule(rule) == 'FREQ=WEEKLY;INTERVAL=2;BYDAY=MO,TH;UNTIL=2026-12-31;START=2026-10-19'
+    assert recurrence.describe(rule) == 'every 2 weeks on Monday, Thursday'
+
+
+@pytest.mark.parametrize('text', [
+    'FREQ=YEARLY',
+    'nonsense',
+    'FREQ=DAILY;BYDAY=MO',
+    'FREQ=DAILY;FOO=1',
+    'FREQ=WEEKLY;BYDAY=XX',
+    'FREQ=DAILY;INTERVAL=0',
+    'FREQ=DAILY;COUNT=0',
+    'FREQ=MONTHLY;BYMONTHDAY=32',
+    'FREQ=MONTHLY;INTERVAL=12;BYMONTHDAY=31;START=2026-02-01',
+    'FREQ=MONTHLY;INTERVAL=24;BYMONTHDAY=31;START=2026-04-01',
+])
+def test_parse_rejects(text):
+    with pytest.raises(ValueError):
+        recurrence.parse(text)
+
+
+def test_daily_and_weekly_occurrences():
+    every_other_day = recurrence.parse('FREQ=DAILY;INTERVAL=2;START=2026-10-01')
+    assert list(recurrence.occurrences(every_other_day, date(2026, 10, 10), date(2026, 10, 16))) == [
+        date(2026, 10, 11), date(2026, 10, 13), date(2026, 10, 15)]
+
+    twice_weekly = recurrence.parse('FREQ=WEEKLY;BYDAY=MO,TH;START=2026-10-21')
+    assert list(recurrence.occurrences(twice_weekly, date(2026, 10, 1), date(2026, 11, 2))) == [
+        date(2026, 10, 22), date(2026, 10, 26), date(2026, 10, 29), date(2026, 11, 2)]
+
+
+def test_count_is_numbered_from_the_start():
+    rule = recurrence.parse('FREQ=WEEKLY;INTERVAL=2;BYDAY=MO;START=2026-10-19;COUNT=3')
+    assert list(recurrence.occurrences(rule, date(2026, 11, 1), date(2027, 1, 1))) == [
+        date(2026, 11, 2), date(2026, 11, 16)]
+
+
+def test_monthly_skips_short_months():
+    rule = recurrence.parse('FREQ=MONTHLY;BYMONTHDAY=31;START=2026-01-01')
+    assert list(recurrence.occurrences(rule, date(2026, 1, 1), date(2026, 8, 1))) == [
+        date(2026, 1, 31), date(2026, 3, 31), date(2026, 5, 31), date(2026, 7, 31)]
+    leap_days = recurrence.parse('FREQ=MONTHLY;INTERVAL=12;BYMONTHDAY=29;START=2025-02-01')
+    assert list(islice(recurrence.occurrences(leap_days), 2)) == [date(2028, 2, 29), date(2032, 2, 29)]
+
+
+def test_monthly_rule_that_never_occurs_ends():
+    # Every fourth February from an odd year never reaches a February 29
+    rule = recurrence.parse('FREQ=MONTHLY;INTERVAL=48;BYMONTHDAY=29;START=2025-02-01')
+    assert list(recurrence.occurrences(rule)) == []
+    assert not recurrence.is_occurrence(rule, date(2029, 2, 28))
+    assert recurrence.latest_occurrence(rule, date(2030, 1, 1)) is None
+
+
+def test_window_far_after_start():
+    rule = recurrence.parse('FREQ=DAILY;START=2020-01-01')
+    assert list(recurrence.occurrences(rule, date(2026, 10, 19), date(2026, 10, 20))) == [
+        date(2026, 10, 19), date(2026, 10, 20)]
+    assert recurrence.is_occurrence(rule, date(2026, 1, 1))
+    assert recurrence.latest_occurrence(rule, date(2026, 10, 19)) == date(2026, 10, 19)
+
+
+@pytest.mark.parametrize('text, rule, rest', [
+    ('water the plants every Monday and Thursday', 'FREQ=WEEKLY;BYDAY=MO,TH', 'water the plants'),
+    ('gym on Tuesdays, Fridays', 'FREQ=WEEKLY;BYDAY=TU,FR', 'gym'),
+    ('stand up on weekdays', 'FREQ=WEEKLY;BYDAY=MO,TU,WE,TH,FR', 'stand up'),
+    ('take out trash every other week', 'FREQ=WEEKLY;INTERVAL=2', 'take out trash'),
+    ('vitamins each day', 'FREQ=DAILY', 'vitamins'),
+    ('review budget every 3 months', 'FREQ=MONTHLY;INTERVAL=3', 'review budget'),
+])
+def test_rule_from_text(text, rule, rest):
+    assert recurrence.rule_from_text(text, date(2026, 10, 19)) == (f'{rule};START=2026-10-19', rest)
+
+
+@pytest.mark.parametrize('text', [
+    'call the dentist on monday',
+    'finish the weekly report',
+    'send the monthly invoice',
+    'read the daily news',
+    'meeting on Wednesday and Friday',
+    'plan the day',
+])
+def test_rule_from_text_leaves_one_off_tasks_alone(text):
+    assert recurrence.rule_from_text(text, date(2026, 10, 19)) == (None, text)
+
+
+def test_complete_and_reopen_occurrence(client):
+    task_id = client.post('/api/tasks', json={
+        'title': 'Water the plants', 'createdAt': '2026-10-01', 'recurrence': 'FREQ=WEEKLY;BYDAY=MO,TH',
+        'dueDate': '2026-10-19'}).json['task_id']
+    url = f'/api/tasks/{task_id}/occurrences/2026-10-22/complete'
+    assert client.put(url).json == {'success': True, 'date': '2026-10-22'}
+    assert client.put(f'/api/tasks/{task_id}/occurrences/2026-10-21/complete').status_code == 400
+
+    window = '/api/tasks/occurrences?start=2026-10-19&end=2026-10-26'
+    days = [(o['date'], o['completed']) for o in client.get(window).json['occurrences']]
+    assert days == [('2026-10-19', False), ('2026-10-22', True), ('2026-10-26', False)]
+
+    assert client.delete(url).json == {'success': True}
+    assert not any(o['completed'] for o in client.get(window).json['occurrences'])
+    for day in ('yesterday', '2026-13-01', '2026-1-5'):
+        assert client.delete(f'/api/tasks/{task_id}/occurrences/{day}/complete').status_code == 400
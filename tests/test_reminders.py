@@ -0,0 +1,98 @@
+import sqlite3
+import subprocess
+import sys
+from datetime import date, timedelta
+
+import reminders
+from reminders import ListSink, ReminderFollower, ReminderScheduler
+
+DUE = (date.today() + timedelta(days=30)).isoformat()
+
+
+def write_in_other_process(path, sql, *params):
+    """Run a write the way another gunicorn worker would: a separate process and connection"""
+    script = 'import sqlite3, sys; c = sqlite3.connect(sys.argv[1]); c.execute(sys.argv[2], sys.argv[3:]); c.commit()'
+    subprocess.run([sys.executable, '-c', script, path, sql, *params], check=True)
+
+
+def add_task(path, title, due_date=DUE):
+    write_in_other_process(path, 'INSERT INTO tasks (title, due_date, title_key, created_at) VALUES (?, ?, ?, ?)',
+                           title, due_date, title.lower(), date.today().isoformat())
+
+
+def make_shard(zelda, path):
+    conn = sqlite3.connect(path)
+    zelda.migrate_schema(conn)
+    conn.commit()
+    conn.close()
+
+
+def test_task_written_by_another_process_gets_scheduled(zelda):
+    scheduler = ReminderScheduler(ListSink())
+    follower = ReminderFollower(scheduler, lambda: [(None, zelda.DB_FILE)])
+    follower.poll(force=True)
+    assert len(scheduler) == 0
+
+    add_task(zelda.DB_FILE, 'Pay rent')
+    assert follower.poll(force=True) == 1
+    assert [entry[2] for entry in scheduler._entries.values()] == ['Pay rent']
+
+    write_in_other_process(zelda.DB_FILE, 'UPDATE tasks SET completed = 1')
+    follower.poll(force=True)
+    assert len(scheduler) == 0
+    # Only the first look read every open task
+    assert follower.full_loads == 1
+
+
+def test_unchanged_database_is_not_read(zelda):
+    follower = ReminderFollower(ReminderScheduler(ListSink()), lambda: [(None, zelda.DB_FILE)])
+    assert follower.poll() == 1
+    assert follower.poll() == 0
+    add_task(zelda.DB_FILE, 'Water plants')
+    assert follower.poll() == 1
+    assert len(follower.scheduler) == 1
+
+
+def test_every_shard_is_followed(zelda, tmp_path):
+    paths = {key: str(tmp_path / f'{key}.db') for key in ('ana', 'ben')}
+    for path in paths.values():
+        make_shard(zelda, path)
+    scheduler = ReminderScheduler(ListSink())
+    follower = ReminderFollower(scheduler, lambda: sorted(paths.items()), zelda._follower_task_key)
+    follower.poll(force=True)
+
+    add_task(paths['ana'], 'Call mom')
+    add_task(paths['ben'], 'Call mom')
+    add_task(paths['ben'], 'Dentist', '2000-01-01')   # past: nothing to remind
+    follower.poll(force=True)
+    assert sorted(scheduler._entries) == [('ana', 1), ('ben', 1)]
+
+    write_in_other_process(paths['ben'], 'DELETE FROM tasks WHERE id = 1')
+    follower.poll(force=True)
+    assert sorted(scheduler._entries) == [('ana', 1)]
+
+
+def test_follower_behind_the_pruned_log_reloads_its_database(zelda):
+    scheduler = ReminderScheduler(ListSink())
+    follower = ReminderFollower(scheduler, lambda: [(None, zelda.DB_FILE)])
+    follower.poll(force=True)
+    add_task(zelda.DB_FILE, 'Pay rent')
+    conn = sqlite3.connect(zelda.DB_FILE)
+    conn.execute('DELETE FROM task_changes')
+    conn.execute("INSERT INTO tasks (title, due_date, title_key, created_at) VALUES ('Dentist', ?, 'dentist', ?)",
+                 (DUE, date.today().isoformat()))
+    conn.commit()
+    conn.close()
+
+    follower.poll(force=True)
+    assert sorted(entry[2] for entry in scheduler._entries.values()) == ['Dentist', 'Pay rent']
+    assert follower.full_loads == 2
+
+
+def test_change_log_is_bounded(zelda, monkeypatch):
+    conn = sqlite3.connect(':memory:')
+    conn.execute('CREATE TABLE tasks (id INTEGER PRIMARY KEY, title TEXT, due_date TEXT, completed INTEGER)')
+    monkeypatch.setattr(reminders, 'CHANGE_LOG_ROWS', 3)
+    reminders.create_table(conn.cursor())
+    conn.executemany('INSERT INTO tasks (title) VALUES (?)', [('task',)] * 10)
+    assert [row[0] for row in conn.execute('SELECT seq FROM task_changes')] == [8, 9, 10]
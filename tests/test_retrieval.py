@@ -0,0 +1,70 @@
+import pytest
+
+import retrieval
+from retrieval import HashingEmbedder, RetrievalIndex, VectorIndex
+
+
+@pytest.fixture(params=[True, False], ids=['numpy', 'lists'])
+def vector_backend(request, monkeypatch):
+    if request.param and not retrieval.NUMPY_AVAILABLE:
+        pytest.skip('NumPy is not installed')
+    monkeypatch.setattr(retrieval, 'NUMPY_AVAILABLE', request.param)
+
+
+def test_vector_index_upsert_remove_search(vector_backend):
+    index = VectorIndex()
+    assert index.search([[1.0, 0.0]], 3) == [[]]
+    index.upsert(['a', 'b', 'c'], [[1.0, 0.0], [0.0, 1.0], [0.6, 0.8]])
+    index.upsert(['b'], [[-1.0, 0.0]])                      # replaced in place
+    assert len(index) == 3
+
+    [hits] = index.search([[1.0, 0.0]], 2)
+    assert [key for key, _ in hits] == ['a', 'c']
+    assert hits[0][1] == pytest.approx(1.0) and hits[1][1] == pytest.approx(0.6)
+
+    index.remove(['a', 'missing'])
+    assert sorted(index.keys) == ['b', 'c']
+    assert [key for key, _ in index.search([[1.0, 0.0]], 5)[0]] == ['c', 'b']
+
+    # Grows past its initial capacity
+    index.upsert([f'k{i}' for i in range(40)], [[0.0, 1.0]] * 40)
+    assert len(index) == 42
+    assert index.search([[0.0, 1.0]], 1)[0][0][1] == pytest.approx(1.0)
+
+
+def test_hashing_embedder_is_deterministic_and_normalized():
+    embedder = HashingEmbedder(dim=64)
+    first, again, empty = embedder.embed(['Water the plants', 'Water the plants', ''])
+    assert first == again
+    assert sum(value * value for value in first) == pytest.approx(1.0)
+    assert not any(empty)
+
+
+def test_retrieval_index_follows_the_data_version(zelda):
+    conn = zelda.connect_db()
+    try:
+        conn.executemany('INSERT INTO tasks (title, created_at, title_key) VALUES (?, ?, ?)',
+                         [('Write the quarterly report', 'x', 'a'), ('Buy groceries', 'x', 'b')])
+        conn.execute("INSERT INTO habits (name) VALUES ('Morning run')")
+        conn.commit()
+        index = RetrievalIndex(HashingEmbedder(), top_k=2)
+        index.refresh(conn, 1)
+        assert index.search('when is the quarterly report due?')[0].startswith('Task: Write the quarterly report')
+
+        conn.execute("UPDATE tasks SET completed = 1 WHERE title_key = 'a'")
+        conn.commit()
+        index.refresh(conn, 1)                                  # same version: not re-read
+        assert len(index.vectors) == 3
+        index.refresh(conn, 2)
+        assert len(index.vectors) == 2
+        assert not any('quarterly' in line for line in index.search('quarterly report'))
+    finally:
+        conn.close()
+
+
+def test_format_context_truncates_long_lines():
+    assert retrieval.format_context([]) == ''
+    context = retrieval.format_context(['Task: short', 'Habit: ' + 'x' * 500])
+    lines = context.splitlines()
+    assert lines[1] == '- Task: short'
+    assert lines[2].endswith('…') and len(lines[2]) == retrieval.ITEM_TOKENS * 4 + 3
@@ -0,0 +1,78 @@
+import pytest
+
+from shards import ShardRouter
+
+
+@pytest.fixture
+def router(zelda, tmp_path, monkeypatch):
+    """Multi-user mode with at most two shards open at once"""
+    router = ShardRouter(str(tmp_path / 'shards'), max_open=2, init=zelda.init_shard,
+                         make_state=lambda shard: zelda.DatabaseState(shard.connect))
+    monkeypatch.setattr(zelda, 'shard_router', router)
+    return router
+
+
+@pytest.fixture
+def client(zelda, router):
+    return zelda.create_app(warm=False).test_client()
+
+
+def as_user(user):
+    return {'headers': {'X-Zelda-User': user}}
+
+
+def add_data(client, user):
+    client.post('/api/tasks', json={'title': f'Task of {user}', 'createdAt': '2026-10-19'}, **as_user(user))
+    client.post('/api/habits', json={'habit': f'Habit of {user}', 'date': '2026-10-19'}, **as_user(user))
+
+
+def titles(client, user):
+    return [task['title'] for task in client.get('/api/tasks', **as_user(user)).json['tasks']]
+
+
+def habits(client, user):
+    return sorted(client.get('/api/habits', **as_user(user)).json['habits'])
+
+
+def test_users_see_only_their_own_data(client, router):
+    add_data(client, 'ana')
+    add_data(client, 'ben')
+    assert titles(client, 'ana') == ['Task of ana']
+    assert titles(client, 'ben') == ['Task of ben']
+    assert habits(client, 'ana') == ['Habit of ana']
+    assert habits(client, 'ben') == ['Habit of ben']
+    assert client.get('/api/summary', **as_user('ben')).json['tasks']['total'] == 1
+    assert router.keys() == ['user-ana', 'user-ben']
+    assert client.get('/api/tasks').status_code == 401
+
+
+def test_escaped_user_ids_get_their_own_shard(router):
+    keys = {router.key_for(user) for user in ('al/ice', 'al_ice', 'al:ice')}
+    assert len(keys) == 3
+    assert all('/' not in key for key in keys)
+
+
+def test_evicted_shard_reopens_with_its_data(client, router):
+    for user in ('ana', 'ben', 'cy'):
+        add_data(client, user)
+    assert router.open_keys() == ['user-ben', 'user-cy']
+    assert router.stats()['evicted'] == 1
+
+    # ana's shard was closed; using it again reopens it from disk
+    assert titles(client, 'ana') == ['Task of ana']
+    assert router.open_keys() == ['user-cy', 'user-ana']
+    client.post('/api/tasks', json={'title': 'Second task', 'createdAt': '2026-10-19'}, **as_user('ana'))
+    assert titles(client, 'ana') == ['Task of ana', 'Second task']
+    assert habits(client, 'ana') == ['Habit of ana']
+    assert client.get('/api/summary', **as_user('ana')).json['tasks']['total'] == 2
+    assert router.stats()['opened'] == 4
+
+
+def test_evicted_shard_closes_its_idle_connections(router):
+    shard = router.get('ana')
+    conn = shard.connect()
+    conn.close()
+    assert shard._idle == [conn]
+    router.get('ben')
+    router.get('cy')
+    assert shard.closed and shard._idle == []
@@ -0,0 +1,42 @@
+import sqlite3
+
+
+def create(title, client_id):
+    return {'id': client_id, 'type': 'task.create',
+            'task': {'clientId': client_id, 'title': title, 'createdAt': '2026-10-19'}}
+
+
+def sync(client, since, *mutations):
+    return client.post('/api/sync', json={'mutations': list(mutations), 'since': since}).json
+
+
+def test_batch_on_the_current_version_is_not_stale(client):
+    since = client.get('/api/tasks').json['version']
+    result = sync(client, since, create('Buy milk', 'tmp-1'), {'id': '2', 'type': 'task.complete', 'taskId': 'tmp-1'})
+    assert all(r['ok'] for r in result['results'])
+    assert not result['stale']
+    assert result['version'] == client.get('/api/tasks').json['version']
+    assert not sync(client, result['version'], create('Walk dog', 'tmp-2'))['stale']
+
+
+def test_batch_from_an_old_version_is_stale(client):
+    since = client.get('/api/tasks').json['version']
+    client.post('/api/tasks', json={'title': 'Buy milk', 'createdAt': '2026-10-19'})
+    assert sync(client, since, create('Walk dog', 'tmp-1'))['stale']
+
+
+def test_write_from_elsewhere_during_the_batch_is_stale(client, zelda, monkeypatch):
+    since = client.get('/api/tasks').json['version']
+    complete = zelda.complete_task_in_db
+
+    def complete_after_another_worker_wrote(task_id):
+        conn = sqlite3.connect(zelda.DB_FILE)
+        conn.execute("INSERT INTO tasks (title, created_at, title_key) VALUES ('Other', '2026-10-19', 'other')")
+        conn.commit()
+        conn.close()
+        return complete(task_id)
+
+    monkeypatch.setattr(zelda, 'complete_task_in_db', complete_after_another_worker_wrote)
+    result = sync(client, since, create('Buy milk', 'tmp-1'), {'id': '2', 'type': 'task.complete', 'taskId': 'tmp-1'})
+    assert all(r['ok'] for r in result['results'])
+    assert result['stale']
@@ -0,0 +1,70 @@
+import pytest
+
+
+@pytest.fixture
+def tasks(client):
+    for title in ('Go to the gym', 'Buy groceries', 'Call mom', 'Write quarterly report'):
+        client.post('/api/tasks', json={'title': title, 'createdAt': '2026-10-19'})
+    return client
+
+
+def open_titles(client):
+    return sorted(task['title'] for task in client.get('/api/tasks').json['tasks'] if not task['completed'])
+
+
+def test_search_ranks_prefix_matches(tasks, zelda):
+    assert [task['title'] for task in zelda.search_tasks('buy gro')] == ['Buy groceries']
+    assert zelda.search_tasks('gym groceries') == []
+    assert len(zelda.search_tasks('gym groceries', match_all=False)) == 2
+
+
+@pytest.mark.parametrize('spoken, title', [
+    ('groceries', 'Buy groceries'),                     # words dropped
+    ('call mom tonight', 'Call mom'),                   # words added
+    ('the quarterly report', 'Write quarterly report'),
+    ('mom', 'Call mom'),
+])
+def test_find_task_resolves_confident_matches(tasks, zelda, spoken, title):
+    assert zelda.find_task(spoken)['title'] == title
+
+
+@pytest.mark.parametrize('spoken', ['the meeting go', 'gym membership renewal form'])
+def test_find_task_ignores_near_misses(tasks, zelda, spoken):
+    assert zelda.find_task(spoken) is None
+    task, confident = zelda.match_task(spoken)
+    assert task is not None and not confident
+
+
+@pytest.mark.parametrize('phrase', [
+    'how did the meeting go',
+    'I finished the gym membership renewal form',
+    'done with the weekly meeting notes',
+])
+def test_voice_near_miss_leaves_tasks_untouched(tasks, zelda, phrase):
+    import voice_assistant
+
+    before = open_titles(tasks)
+    with zelda.create_app(warm=False).test_request_context():
+        result = voice_assistant.process_command(phrase)
+    assert result.get('action') != 'task_updated'
+    assert open_titles(tasks) == before
+
+
+def test_voice_weak_task_match_asks_first(tasks, zelda):
+    import voice_assistant
+
+    with zelda.create_app(warm=False).test_request_context():
+        result = voice_assistant.process_command('complete the gym membership task')
+        assert result['action'] == 'task_confirm'
+        assert result['task_suggested'] == 'Go to the gym'
+        assert open_titles(tasks) == ['Buy groceries', 'Call mom', 'Go to the gym', 'Write quarterly report']
+
+        result = voice_assistant.process_command('complete go to the gym')
+    assert result['action'] == 'task_updated'
+    assert 'Go to the gym' not in open_titles(tasks)
+
+
+def test_chat_completion_needs_a_confident_match(tasks, zelda):
+    with zelda.create_app(warm=False).test_request_context():
+        assert zelda.detect_and_create_items('complete task: meeting go') is None
+        assert zelda.detect_and_create_items('complete task: call mom')['completed'] == ['Call mom']
@@ -0,0 +1,91 @@
+import io
+import json
+
+import pytest
+
+import transfer
+
+
+def test_iter_json_object_reads_members_across_chunks():
+    data = json.dumps({'Run': {'dates': {'2025-03-01': True}}, 'Read': {'color': '#abc'}, 'n': 12345}).encode()
+    members = list(transfer.iter_json_object(io.BytesIO(data), chunk_size=3))
+    assert members == [('Run', {'dates': {'2025-03-01': True}}), ('Read', {'color': '#abc'}), ('n', 12345)]
+
+
+def test_iter_json_object_empty_and_invalid():
+    assert list(transfer.iter_json_object(io.BytesIO(b' { } '))) == []
+    with pytest.raises(ValueError):
+        list(transfer.iter_json_object(io.BytesIO(b'{"a": {"dates": {}}, oops'), chunk_size=4))
+    with pytest.raises(ValueError):
+        list(transfer.iter_json_object(io.BytesIO(b'[1, 2]')))
+
+
+def test_read_csv_recognizes_kind_from_header():
+    tasks = io.BytesIO(b'\xef\xbb\xbftitle,priority,completed\nWalk dog,low,0\nBuy milk,,true\n')
+    assert list(transfer.read_csv(tasks)) == [
+        (2, {'title': 'Walk dog', 'priority': 'low', 'completed': False, 'type': 'task'}),
+        (3, {'title': 'Buy milk', 'completed': True, 'type': 'task'}),
+    ]
+    checks = io.BytesIO(b'habit,date,checked\nRun,2025-01-02,yes\n')
+    assert list(transfer.read_csv(checks)) == [
+        (2, {'habit': 'Run', 'date': '2025-01-02', 'checked': True, 'type': 'check'})]
+    assert list(transfer.read_csv(io.BytesIO(b'foo,bar\n1,2\n'))) == [(1, 'unrecognized CSV header')]
+
+
+def test_importer_upserts_and_reports_errors(zelda):
+    conn = zelda.connect_db()
+    try:
+        records = [
+            (1, {'type': 'habit', 'name': 'Run', 'color': '#123456'}),
+            (2, {'type': 'check', 'habit': 'Run', 'date': '2025-01-02'}),
+            (3, {'type': 'check', 'habit': 'Swim', 'date': 'not a date'}),
+            (4, {'type': 'task', 'title': 'Buy milk', 'recurrence': 'freq=weekly;start=2026-10-19'}),
+            (5, {'type': 'task', 'title': 'buy  MILK!'}),
+            (6, {'type': 'note'}),
+            (7, 'invalid JSON'),
+        ]
+        result = transfer.Importer(conn, zelda.task_title_key, chunk_size=2).run(records)
+        assert result['imported'] == {'habits': 1, 'checks': 1, 'tasks': 1, 'skipped': 4}
+        # The duplicate open task (line 5) is skipped without an error
+        assert [error['line'] for error in result['errors']] == [3, 6, 7]
+
+        # A habit record without a color keeps the existing one
+        transfer.Importer(conn, zelda.task_title_key).run([(1, {'type': 'habit', 'name': 'Run'})])
+        assert conn.execute('SELECT name, color FROM habits').fetchall() == [('Run', '#123456')]
+        assert conn.execute('SELECT title, recurrence FROM tasks').fetchall() == [
+            ('Buy milk', 'FREQ=WEEKLY;START=2026-10-19')]
+    finally:
+        conn.close()
+
+
+def test_export_then_import_round_trip(client, zelda):
+    client.post('/api/tasks', json={'title': 'Buy milk', 'priority': 'high', 'createdAt': '2026-10-01'})
+    client.post('/api/habits/new', json={'name': 'Read', 'color': '#123456'})
+    client.post('/api/habits', json={'habit': 'Read', 'date': '2026-01-02'})
+    exported = client.get('/api/export').data
+    assert b'"Buy milk"' in exported
+
+    conn = zelda.connect_db()
+    conn.execute('DELETE FROM tasks')
+    conn.commit()
+    conn.close()
+    response = client.post('/api/import', data=exported, content_type='application/x-ndjson')
+    assert response.status_code == 200
+    assert response.json['imported']['tasks'] == 1
+    assert [task['title'] for task in client.get('/api/tasks').json['tasks']] == ['Buy milk']
+
+
+def test_raw_body_import_with_idempotency_key(client):
+    body = b'{"type": "task", "title": "Walk dog"}\n{"type": "habit", "name": "Stretch"}\n'
+    headers = {'Idempotency-Key': 'import-1'}
+    first = client.post('/api/import', data=body, content_type='application/x-ndjson', headers=headers)
+    assert first.status_code == 200
+    assert first.json['imported'] == {'habits': 1, 'checks': 0, 'tasks': 1, 'skipped': 0}
+    assert [task['title'] for task in client.get('/api/tasks').json['tasks']] == ['Walk dog']
+
+    retry = client.post('/api/import', data=body, content_type='application/x-ndjson', headers=headers)
+    assert retry.headers.get('Idempotent-Replayed') == 'true'
+    assert retry.json == first.json
+
+    other = client.post('/api/import', data=body + b'\n', content_type='application/x-ndjson', headers=headers)
+    assert other.status_code == 422
@@ -0,0 +1,146 @@
+"""
+Content-addressed cache for voice transcriptions.
+
+Flaky connections make the browser retry voice uploads. Keying transcripts by a
+hash of the raw audio bytes (plus the recognition engine) lets a retried clip
+skip ffmpeg conversion and speech recognition entirely.
+"""
+
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+log = logging.getLogger(__name__)
+
+
+class TranscriptionCache:
+    """LRU cache of transcripts bounded by entry count and total bytes.
+
+    When ``db_path`` is given, entries are also written to a local SQLite file
+    so they survive restarts.
+    """
+
+    def __init__(self, max_entries=256, max_bytes=1024 * 1024, db_path=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.db_path = db_path
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if self.db_path:
+            conn = sqlite3.connect(self.db_path)
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS transcriptions (
+                    key TEXT PRIMARY KEY,
+                    transcript TEXT NOT NULL,
+                    last_used REAL NOT NULL
+                )
+            ''')
+            conn.commit()
+            conn.close()
+
+    @staticmethod
+    def make_key(audio_bytes, engine):
+        """Hash the audio together with the engine/model that transcribes it"""
+        digest = hashlib.sha256()
+        digest.update(engine.encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(audio_bytes)
+        return digest.hexdigest()
+
+    def get(self, key):
+        """Return the cached transcript for key, or None"""
+        with self._lock:
+            transcript = self._entries.get(key)
+            if transcript is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return transcript
+
+        transcript = self._load(key)
+        with self._lock:
+            if transcript is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._insert(key, transcript)
+            return transcript
+
+    def put(self, key, transcript):
+        """Store a transcript, evicting least recently used entries as needed"""
+        with self._lock:
+            self._insert(key, transcript)
+        self._store(key, transcript)
+
+    def stats(self):
+        """Size and hit ratio information for reporting"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+                'persistent': bool(self.db_path)
+            }
+
+    def _insert(self, key, transcript):
+        if key in self._entries:
+            self._bytes -= self._entry_size(key, self._entries.pop(key))
+        size = self._entry_size(key, transcript)
+        if size > self.max_bytes:
+            return
+        self._entries[key] = transcript
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            old_key, old_transcript = self._entries.popitem(last=False)
+            self._bytes -= self._entry_size(old_key, old_transcript)
+            self.evictions += 1
+
+    @staticmethod
+    def _entry_size(key, transcript):
+        return len(key) + len(transcript.encode('utf-8'))
+
+    def _load(self, key):
+        if not self.db_path:
+            return None
+        try:
+            conn = sqlite3.connect(self.db_path)
+            row = conn.execute('SELECT transcript FROM transcriptions WHERE key=?', (key,)).fetchone()
+            if row:
+                conn.execute('UPDATE transcriptions SET last_used=? WHERE key=?', (time.time(), key))
+                conn.commit()
+            conn.close()
+            return row[0] if row else None
+        except sqlite3.Error as e:
+            log.warning("Transcription cache read failed: %s", e)
+            return None
+
+    def _store(self, key, transcript):
+        if not self.db_path:
+            return
+        try:
+            conn = sqlite3.connect(self.db_path)
+            conn.execute(
+                'INSERT OR REPLACE INTO transcriptions (key, transcript, last_used) VALUES (?, ?, ?)',
+                (key, transcript, time.time())
+            )
+            # Keep the file bounded by the same entry limit as memory
+            conn.execute('''
+                DELETE FROM transcriptions WHERE key NOT IN (
+                    SELECT key FROM transcriptions ORDER BY last_used DESC LIMIT ?
+                )
+            ''', (self.max_entries,))
+            conn.commit()
+            conn.close()
+        except sqlite3.Error as e:
+            log.warning("Transcription cache write failed: %s", e)
@@ -0,0 +1,349 @@
+"""
+Streaming bulk export and import of tasks and habits.
+
+Export walks the database with cursors inside one read transaction and
+yields ~64KB chunks, so memory stays flat however many rows there are.
+Import reads the upload incrementally and writes in chunked executemany
+transactions (ZELDA_IMPORT_CHUNK rows each).
+
+Formats:
+
+    ndjson   one record per line, all kinds in one stream:
+               {"type": "habit", "name": ..., "color": ...}
+               {"type": "check", "habit": ..., "date": "YYYY-MM-DD", "checked": true}
+               {"type": "task", "title": ..., "description": ..., "priority": ...,
+                "category": ..., "dueDate": ..., "completed": ..., "createdAt": ...,
+                "completedAt": ..., "recurrence": ...}
+    csv      one kind per file (``kind=tasks|habits|checks`` on export; on
+             import the kind is recognized from the header)
+    legacy   the old habits.json: {"Habit": {"dates": {"YYYY-MM-DD": true}, "color": "#hex"}}
+             (import only; read one habit at a time)
+"""
+
+import codecs
+import csv
+import io
+import json
+import os
+from datetime import date
+
+import archive
+import recurrence
+
+CHUNK_BYTES = 64 * 1024
+IMPORT_CHUNK = int(os.environ.get('ZELDA_IMPORT_CHUNK', '5000'))
+MAX_REPORTED_ERRORS = 20
+
+CSV_COLUMNS = {
+    'tasks': ['title', 'description', 'priority', 'category', 'dueDate', 'completed', 'createdAt', 'completedAt',
+              'recurrence'],
+    'habits': ['name', 'color'],
+    'checks': ['habit', 'date', 'checked'],
+}
+
+
+# --- Export ---
+
+def export_records(conn, kinds=('habits', 'checks', 'tasks'), archived=True):
+    """Yield export records (dicts with a "type") from one consistent snapshot"""
+    conn.execute('BEGIN')
+    try:
+        if 'habits' in kinds:
+            for name, color in conn.execute('SELECT name, color FROM habits ORDER BY id'):
+                yield {'type': 'habit', 'name': name, 'color': color}
+        if 'checks' in kinds:
+            if archived:
+                rows = conn.execute('''
+                    SELECT h.name, a.year, a.days FROM habit_history_archive a
+                    JOIN habits h ON h.id = a.habit_id ORDER BY a.habit_id, a.year
+                ''')
+                for name, year, days in rows:
+                    for day in archive.checked_days(year, days):
+                        yield {'type': 'check', 'habit': name, 'date': day, 'checked': True}
+            rows = conn.execute('''
+                SELECT h.name, d.date, d.checked FROM habit_dates d
+                JOIN habits h ON h.id = d.habit_id ORDER BY d.habit_id, d.date
+            ''')
+            for name, day, checked in rows:
+                yield {'type': 'check', 'habit': name, 'date': day, 'checked': bool(checked)}
+        if 'tasks' in kinds:
+            tables = ('tasks', 'tasks_archive') if archived else ('tasks',)
+            for table in tables:
+                rows = conn.execute(f'''
+                    SELECT title, description, priority, category, due_date, completed, created_at, completed_at,
+                           recurrence
+                    FROM {table} ORDER BY id
+                ''')
+                for (title, description, priority, category, due_date, completed, created_at, completed_at,
+                     recurrence) in rows:
+                    yield {'type': 'task', 'title': title, 'description': description, 'priority': priority,
+                           'category': category, 'dueDate': due_date, 'completed': bool(completed),
+                           'createdAt': created_at, 'completedAt': completed_at, 'recurrence': recurrence}
+    finally:
+        conn.rollback()
+
+
+def _chunked(lines):
+    """Join text lines into byte chunks of about CHUNK_BYTES"""
+    buffer = []
+    size = 0
+    for line in lines:
+        buffer.append(line)
+        size += len(line)
+        if size >= CHUNK_BYTES:
+            yield ''.join(buffer).encode()
+            buffer = []
+            size = 0
+    if buffer:
+        yield ''.join(buffer).encode()
+
+
+def ndjson_chunks(records):
+    return _chunked(json.dumps(record, separators=(',', ':')) + '\n' for record in records)
+
+
+def csv_chunks(records, kind):
+    columns = CSV_COLUMNS[kind]
+
+    def lines():
+        out = io.StringIO()
+        writer = csv.writer(out)
+        writer.writerow(columns)
+        for record in records:
+            writer.writerow(['' if record.get(column) is None else record[column] for column in columns])
+            yield out.getvalue()
+            out.seek(0)
+            out.truncate()
+        yield out.getvalue()
+
+    return _chunked(lines())
+
+
+# --- Reading uploads ---
+
+def _text(stream):
+    return io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+
+
+def read_ndjson(stream):
+    """Yield (line number, record or error message) from an NDJSON stream"""
+    for number, line in enumerate(_text(stream), 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield number, f'invalid JSON: {e}'
+            continue
+        yield number, record if isinstance(record, dict) else 'expected a JSON object'
+
+
+def read_csv(stream):
+    """Yield (line number, record or error message) from a CSV export"""
+    reader = csv.DictReader(_text(stream))
+    fields = set(reader.fieldnames or ())
+    if {'habit', 'date'} <= fields:
+        kind = 'check'
+    elif 'title' in fields:
+        kind = 'task'
+    elif 'name' in fields:
+        kind = 'habit'
+    else:
+        yield 1, 'unrecognized CSV header'
+        return
+    for row in reader:
+        record = {key: value for key, value in row.items() if key is not None and value != ''}
+        for flag in ('completed', 'checked'):
+            if flag in record:
+                record[flag] = record[flag].strip().lower() in ('1', 'true', 'yes')
+        record['type'] = kind
+        yield reader.line_num, record
+
+
+def iter_json_object(stream, chunk_size=CHUNK_BYTES):
+    """Yield (key, value) for each member of a top-level JSON object, one member in memory at a time"""
+    decoder = json.JSONDecoder()
+    reader = codecs.getincrementaldecoder('utf-8-sig')()
+    buffer = ''
+    position = 0
+    eof = False
+
+    def fill():
+        nonlocal buffer, position, eof
+        data = stream.read(chunk_size)
+        eof = not data
+        buffer = buffer[position:] + reader.decode(data or b'', final=eof)
+        position = 0
+
+    def skip_space():
+        nonlocal position
+        while True:
+            while position < len(buffer) and buffer[position] in ' \t\r\n':
+                position += 1
+            if position < len(buffer) or eof:
+                return
+            fill()
+
+    def expect(chars):
+        nonlocal position
+        skip_space()
+        if position >= len(buffer) or buffer[position] not in chars:
+            raise ValueError(f'expected one of {chars!r} in legacy habits.json')
+        position += 1
+        return buffer[position - 1]
+
+    def value():
+        nonlocal position
+        skip_space()
+        while True:
+            try:
+                result, end = decoder.raw_decode(buffer, position)
+                # A number or literal cut at the buffer's end would still parse
+                if end < len(buffer) or eof:
+                    position = end
+                    return result
+            except json.JSONDecodeError as e:
+                if eof:
+                    raise ValueError(f'invalid legacy habits.json: {e.msg}') from None
+            fill()
+
+    expect('{')
+    skip_space()
+    if position < len(buffer) and buffer[position] == '}':
+        return
+    while True:
+        key = value()
+        if not isinstance(key, str):
+            raise ValueError('legacy habits.json keys must be habit names')
+        expect(':')
+        yield key, value()
+        if expect(',}') == '}':
+            return
+
+
+def read_legacy_habits(stream):
+    """Yield records from the legacy habits.json structure"""
+    for number, (name, entry) in enumerate(iter_json_object(stream), 1):
+        if not isinstance(entry, dict):
+            yield number, f'habit {name!r}: expected an object'
+            continue
+        # Very old files stored the dates directly under the habit name
+        dates = entry['dates'] if 'dates' in entry else {k: v for k, v in entry.items() if k != 'color'}
+        yield number, {'type': 'habit', 'name': name, 'color': entry.get('color')}
+        for day, checked in (dates.items() if isinstance(dates, dict) else ()):
+            yield number, {'type': 'check', 'habit': name, 'date': day, 'checked': bool(checked)}
+
+
+READERS = {'ndjson': read_ndjson, 'csv': read_csv, 'legacy': read_legacy_habits}
+
+
+# --- Writing ---
+
+class Importer:
+    """Validate records and write them in chunked transactions"""
+
+    def __init__(self, conn, title_key, chunk_size=IMPORT_CHUNK):
+        self.conn = conn
+        self.title_key = title_key
+        self.chunk_size = chunk_size
+        self.counts = {'habits': 0, 'checks': 0, 'tasks': 0, 'skipped': 0}
+        self.errors = []
+        self._habit_ids = {}
+        self._habits = []
+        self._checks = []
+        self._tasks = []
+
+    def error(self, number, message):
+        self.counts['skipped'] += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'line': number, 'error': message})
+
+    def add(self, number, record):
+        if isinstance(record, str):
+            self.error(number, record)
+            return
+        kind = record.get('type')
+        try:
+            if kind == 'habit':
+                self._add_habit(record)
+            elif kind == 'check':
+                self._add_check(record)
+            elif kind == 'task':
+                self._add_task(record)
+            else:
+                raise ValueError(f'unknown record type {kind!r}')
+        except (KeyError, TypeError, ValueError) as e:
+            self.error(number, str(e) if not isinstance(e, KeyError) else f'missing field {e}')
+            return
+        if len(self._checks) + len(self._tasks) + len(self._habits) >= self.chunk_size:
+            self.flush()
+
+    def _add_habit(self, record):
+        name = str(record['name']).strip()
+        if not name:
+            raise ValueError('empty habit name')
+        self._habits.append((name, record.get('color') or None))
+
+    def _add_check(self, record):
+        day = str(record['date'])
+        date.fromisoformat(day)
+        self._checks.append((str(record['habit']).strip(), day, 1 if record.get('checked', True) else 0))
+
+    def _add_task(self, record):
+        title = str(record['title']).strip()
+        if not title:
+            raise ValueError('empty task title')
+        completed = bool(record.get('completed'))
+        rule = record.get('recurrence')
+        if rule:
+            rule = recurrence.format_rule(recurrence.parse(rule))
+        self._tasks.append((
+            title, record.get('description') or '', record.get('priority') or 'medium',
+            record.get('category') or 'other', record.get('dueDate'), completed,
+            record.get('createdAt') or date.today().isoformat(), self.title_key(title),
+            record.get('completedAt') if completed else None, rule or None
+        ))
+
+    def flush(self):
+        """Write buffered records in one transaction"""
+        if not (self._habits or self._checks or self._tasks):
+            return
+        conn = self.conn
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            if self._habits:
+                # A record without a color keeps the existing habit's color
+                conn.executemany("INSERT INTO habits (name, color) VALUES (?1, coalesce(?2, '#2ecc40')) "
+                                 'ON CONFLICT (name) DO UPDATE SET color = coalesce(?2, color)', self._habits)
+                self.counts['habits'] += len(self._habits)
+            if self._checks:
+                for name in {name for name, _, _ in self._checks} - self._habit_ids.keys():
+                    conn.execute('INSERT OR IGNORE INTO habits (name) VALUES (?)', (name,))
+                    self._habit_ids[name] = conn.execute('SELECT id FROM habits WHERE name = ?', (name,)).fetchone()[0]
+                conn.executemany('''
+                    INSERT INTO habit_dates (habit_id, date, checked) VALUES (?, ?, ?)
+                    ON CONFLICT (habit_id, date) DO UPDATE SET checked = excluded.checked
+                ''', [(self._habit_ids[name], day, checked) for name, day, checked in self._checks])
+                self.counts['checks'] += len(self._checks)
+            if self._tasks:
+                cursor = conn.executemany('''
+                    INSERT INTO tasks (title, description, priority, category, due_date, completed, created_at,
+                                       title_key, completed_at, recurrence)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (title_key) WHERE NOT completed DO NOTHING
+                ''', self._tasks)
+                self.counts['tasks'] += cursor.rowcount
+                self.counts['skipped'] += len(self._tasks) - cursor.rowcount
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            self._habits, self._checks, self._tasks = [], [], []
+
+    def run(self, records):
+        for number, record in records:
+            self.add(number, record)
+        self.flush()
+        return {'imported': self.counts, 'errors': self.errors}
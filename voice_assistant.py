@@ -3,8 +3,17 @@ import tempfile
 import subprocess
 import re
 import datetime
+import logging
+import threading
+import queue
+from array import array
 from flask import request, jsonify
 import json
+from transcription_cache import TranscriptionCache
+from stages import stage
+from habit_index import completed_habit_name
+
+log = logging.getLogger(__name__)
 
 # Try to import speech recognition - fallback to simpler approach if not available
 try:
@@ -13,12 +22,35 @@ try:
 except ImportError:
     SPEECH_RECOGNITION_AVAILABLE = False
 
+# Identifies the recognizer in cache keys, so switching engines never serves stale transcripts
+STT_ENGINE = 'google-web-speech'
+
+# Retried uploads of the same clip are answered from here without decoding.
+# Set ZELDA_TRANSCRIPTION_CACHE to a file path to persist it across restarts.
+transcription_cache = TranscriptionCache(db_path=os.environ.get('ZELDA_TRANSCRIPTION_CACHE'))
+
+def recognize_audio(recognizer, audio_data):
+    """Run the speech-to-text engine on recorded audio (swappable for benchmarks)"""
+    return recognizer.recognize_google(audio_data)
+
+def is_wav(audio_bytes):
+    """True if the upload is already a RIFF/WAVE file and needs no conversion"""
+    return audio_bytes[:4] == b'RIFF' and audio_bytes[8:12] == b'WAVE'
+
 def handle_voice_command(audio_file):
     """Process voice commands using speech recognition and respond appropriately"""
     try:
+        with stage('upload_read'):
+            audio_bytes = audio_file.read()
+        cache_key = TranscriptionCache.make_key(audio_bytes, STT_ENGINE)
+        cached_transcript = transcription_cache.get(cache_key)
+        if cached_transcript is not None:
+            log.debug("Transcription cache hit: %s", cached_transcript)
+            return respond_to_transcript(cached_transcript)
+        
         # Save the audio file temporarily
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.webm') as tmp_file:
-            tmp_file.write(audio_file.read())
+        with tempfile.NamedTemporaryFile(delete=False, suffix='.wav' if is_wav(audio_bytes) else '.webm') as tmp_file:
+            tmp_file.write(audio_bytes)
             tmp_file_path = tmp_file.name
         
         transcript = ""
@@ -30,52 +62,58 @@ def handle_voice_command(audio_file):
                 r.energy_threshold = 300  # Adjust for background noise
                 r.dynamic_energy_threshold = True
                 
-                # Convert webm to wav using ffmpeg
-                wav_path = tmp_file_path.replace('.webm', '.wav')
-                
-                print(f"Converting audio from {tmp_file_path} to {wav_path}")
-                
-                # Convert using ffmpeg with better settings
-                result = subprocess.run([
-                    'ffmpeg', '-i', tmp_file_path, 
-                    '-acodec', 'pcm_s16le',  # 16-bit PCM
-                    '-ar', '16000',          # Sample rate 16kHz
-                    '-ac', '1',              # Mono channel
-                    '-y',                    # Overwrite output
-                    wav_path
-                ], capture_output=True, text=True)
-                
-                if result.returncode != 0:
-                    print(f"FFmpeg error: {result.stderr}")
-                    raise subprocess.CalledProcessError(result.returncode, "ffmpeg")
-                
-                print(f"Audio converted successfully to {wav_path}")
+                if is_wav(audio_bytes):
+                    # Already PCM, skip the ffmpeg round trip
+                    wav_path = tmp_file_path
+                else:
+                    # Convert webm to wav using ffmpeg
+                    wav_path = tmp_file_path.replace('.webm', '.wav')
+                    
+                    # Convert using ffmpeg with better settings
+                    with stage('decode'):
+                        result = subprocess.run([
+                            'ffmpeg', '-i', tmp_file_path, 
+                            '-acodec', 'pcm_s16le',  # 16-bit PCM
+                            '-ar', '16000',          # Sample rate 16kHz
+                            '-ac', '1',              # Mono channel
+                            '-y',                    # Overwrite output
+                            wav_path
+                        ], capture_output=True, text=True)
+                    
+                    if result.returncode != 0:
+                        log.warning("FFmpeg error: %s", result.stderr)
+                        raise subprocess.CalledProcessError(result.returncode, "ffmpeg")
+                    
+                    log.debug("Converted %s to %s", tmp_file_path, wav_path)
                 
                 # Now try to recognize the WAV file
                 with sr.AudioFile(wav_path) as source:
                     # Adjust for ambient noise
-                    r.adjust_for_ambient_noise(source, duration=0.5)
-                    audio_data = r.record(source)
+                    with stage('vad'):
+                        r.adjust_for_ambient_noise(source, duration=0.5)
+                    with stage('decode'):
+                        audio_data = r.record(source)
                     
-                    print("Attempting speech recognition...")
-                    transcript = r.recognize_google(audio_data)
-                    print(f"Recognized: {transcript}")
+                    with stage('recognition'):
+                        transcript = recognize_audio(r, audio_data)
+                    log.debug("Recognized: %s", transcript)
+                    transcription_cache.put(cache_key, transcript)
                 
                 # Clean up WAV file
                 if os.path.exists(wav_path):
                     os.unlink(wav_path)
                     
             except subprocess.CalledProcessError as e:
-                print(f"FFmpeg conversion failed: {e}")
+                log.warning("FFmpeg conversion failed: %s", e)
                 transcript = "Sorry, I couldn't process the audio format. Please try again."
             except sr.UnknownValueError:
-                print("Google Speech Recognition could not understand audio")
+                log.info("Google Speech Recognition could not understand audio")
                 transcript = "I couldn't understand what you said. Please speak clearly and try again."
             except sr.RequestError as e:
-                print(f"Could not request results from Google Speech Recognition service: {e}")
+                log.warning("Could not request results from Google Speech Recognition service: %s", e)
                 transcript = "Speech recognition service is temporarily unavailable."
             except Exception as e:
-                print(f"Speech recognition error: {e}")
+                log.exception("Speech recognition error")
                 transcript = "There was an error processing your voice. Please try again."
         else:
             # Fallback - simulate speech recognition for demo
@@ -86,21 +124,190 @@ def handle_voice_command(audio_file):
             os.unlink(tmp_file_path)
         
         # Process the command
-        if transcript and len(transcript.strip()) > 0 and "couldn't" not in transcript and "error" not in transcript:
+        return respond_to_transcript(transcript)
+        
+    except Exception as e:
+        log.exception("Error processing audio")
+        return {
+            'transcript': '',
+            'reply': "Sorry, there was an error processing your voice command. Please try again.",
+            'action': 'error'
+        }
+
+def respond_to_transcript(transcript):
+    """Route a finished transcript through the command processor"""
+    if transcript and len(transcript.strip()) > 0 and "couldn't" not in transcript and "error" not in transcript:
+        with stage('routing'):
             command_result = process_command(transcript)
-            return {
-                'transcript': transcript,
-                **command_result
-            }
+        return {
+            'transcript': transcript,
+            **command_result
+        }
+    else:
+        return {
+            'transcript': transcript,
+            'reply': transcript if "couldn't" in transcript or "error" in transcript else "I didn't catch that. Could you please try speaking again?",
+            'action': 'error'
+        }
+
+# --- STREAMING VOICE INPUT ---
+# Audio arrives as MediaRecorder webm chunks. A single long-lived ffmpeg process
+# decodes them to 16kHz mono PCM, which is split into segments on silence.
+# Closed segments are recognized while the user is still talking, so when the
+# stream ends only the tail segment is left to transcribe.
+
+SAMPLE_RATE = 16000
+SAMPLE_WIDTH = 2
+FRAME_BYTES = SAMPLE_RATE * SAMPLE_WIDTH // 10  # 100ms of audio
+
+def recognize_pcm(pcm_bytes):
+    """Recognize raw 16kHz mono 16-bit PCM, returning '' when nothing was understood"""
+    if not SPEECH_RECOGNITION_AVAILABLE or not pcm_bytes:
+        return ""
+    r = sr.Recognizer()
+    try:
+        return recognize_audio(r, sr.AudioData(pcm_bytes, SAMPLE_RATE, SAMPLE_WIDTH))
+    except sr.UnknownValueError:
+        return ""
+
+def frame_energy(frame):
+    """Root-mean-square energy of a 16-bit PCM frame"""
+    samples = array('h', frame[:len(frame) - len(frame) % SAMPLE_WIDTH])
+    if not samples:
+        return 0
+    return (sum(sample * sample for sample in samples) / len(samples)) ** 0.5
+
+class StreamingVoiceSession:
+    """Incrementally decode and transcribe a voice stream"""
+
+    def __init__(self, energy_threshold=300, silence_seconds=0.6,
+                 max_segment_seconds=8.0, window_seconds=4.0, partial_interval=1.0):
+        self.energy_threshold = energy_threshold
+        self.silence_frames = int(silence_seconds * 10)
+        self.max_segment_bytes = int(max_segment_seconds * SAMPLE_RATE * SAMPLE_WIDTH)
+        self.window_bytes = int(window_seconds * SAMPLE_RATE * SAMPLE_WIDTH)
+        self.partial_bytes = int(partial_interval * SAMPLE_RATE * SAMPLE_WIDTH)
+
+        self.segments = []          # final transcripts, by segment index
+        self.partials = queue.Queue()
+        self._jobs = queue.Queue()
+        self._segment = bytearray()
+        self._segment_has_speech = False
+        self._trailing_silence = 0
+        self._since_partial = 0
+
+        self._decoder = subprocess.Popen([
+            'ffmpeg', '-loglevel', 'error',
+            '-i', 'pipe:0',
+            '-f', 's16le', '-acodec', 'pcm_s16le',
+            '-ar', str(SAMPLE_RATE), '-ac', '1',
+            'pipe:1'
+        ], stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        self._reader = threading.Thread(target=self._read_pcm, daemon=True)
+        self._worker = threading.Thread(target=self._recognize_jobs, daemon=True)
+        self._reader.start()
+        self._worker.start()
+
+    def feed(self, chunk):
+        """Pass an encoded audio chunk to the decoder"""
+        try:
+            self._decoder.stdin.write(chunk)
+            self._decoder.stdin.flush()
+        except (BrokenPipeError, ValueError):
+            pass
+
+    def drain_partials(self):
+        """Return interim transcripts produced since the last call"""
+        partials = []
+        while True:
+            try:
+                partials.append(self.partials.get_nowait())
+            except queue.Empty:
+                return partials
+
+    def finish(self):
+        """Close the stream and return the full transcript"""
+        try:
+            self._decoder.stdin.close()
+        except (BrokenPipeError, ValueError):
+            pass
+        self._reader.join()
+        self._jobs.put(None)
+        self._worker.join()
+        return ' '.join(text for text in self.segments if text).strip()
+
+    def close(self):
+        """Tear down the decoder without waiting for recognition"""
+        if self._decoder.poll() is None:
+            self._decoder.kill()
+        self._jobs.put(None)
+
+    def _read_pcm(self):
+        while True:
+            frame = self._decoder.stdout.read(FRAME_BYTES)
+            if not frame:
+                break
+            self._add_frame(frame)
+        self._close_segment()
+        self._decoder.wait()
+
+    def _add_frame(self, frame):
+        self._segment.extend(frame)
+        self._since_partial += len(frame)
+        if frame_energy(frame) >= self.energy_threshold:
+            self._segment_has_speech = True
+            self._trailing_silence = 0
         else:
-            return {
-                'transcript': transcript,
-                'reply': transcript if "couldn't" in transcript or "error" in transcript else "I didn't catch that. Could you please try speaking again?",
-                'action': 'error'
-            }
-        
+            self._trailing_silence += 1
+
+        if self._segment_has_speech and self._trailing_silence >= self.silence_frames:
+            self._close_segment()
+        elif len(self._segment) >= self.max_segment_bytes:
+            self._close_segment()
+        elif self._segment_has_speech and self._since_partial >= self.partial_bytes:
+            self._since_partial = 0
+            self._jobs.put(('partial', len(self.segments), bytes(self._segment[-self.window_bytes:])))
+
+    def _close_segment(self):
+        if self._segment_has_speech:
+            self.segments.append('')
+            self._jobs.put(('final', len(self.segments) - 1, bytes(self._segment)))
+        self._segment = bytearray()
+        self._segment_has_speech = False
+        self._trailing_silence = 0
+        self._since_partial = 0
+
+    def _recognize_jobs(self):
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                break
+            kind, index, pcm = job
+            # Only the newest interim result matters, skip stale ones
+            if kind == 'partial' and not self._jobs.empty():
+                continue
+            try:
+                text = recognize_pcm(pcm)
+            except Exception as e:
+                log.warning("Streaming recognition error: %s", e)
+                text = ""
+            if kind == 'final':
+                self.segments[index] = text
+            committed = ' '.join(t for t in self.segments[:index] if t)
+            self.partials.put(f"{committed} {text}".strip())
+
+def handle_voice_stream(session):
+    """Finish a streaming session and process the resulting command"""
+    try:
+        if not SPEECH_RECOGNITION_AVAILABLE:
+            session.close()
+            return respond_to_transcript("Voice command received (speech recognition not fully installed)")
+        transcript = session.finish()
+        if not transcript:
+            transcript = "I couldn't understand what you said. Please speak clearly and try again."
+        return respond_to_transcript(transcript)
     except Exception as e:
-        print(f"Error processing audio: {str(e)}")
+        log.exception("Error processing audio stream")
         return {
             'transcript': '',
             'reply': "Sorry, there was an error processing your voice command. Please try again.",
@@ -154,11 +361,17 @@ def check_task_commands(text_lower, original_text):
             date_time = extract_datetime_from_text(original_text)
             
             if task_text:
+                rule, task_text = extract_recurrence_from_text(task_text, date_time)
                 from app import create_task_via_voice
-                result = create_task_via_voice(task_text, date_time)
+                result = create_task_via_voice(task_text, date_time, rule)
                 
+                if rule:
+                    from recurrence import describe, parse
+                    when = f", repeating {describe(parse(rule))}"
+                else:
+                    when = f" for {date_time}" if date_time else ''
                 return {
-                    'reply': f"I've added '{task_text}' to your tasks{' for ' + date_time if date_time else ''}.",
+                    'reply': f"I've added '{task_text}' to your tasks{when}.",
                     'action': 'task_updated',
                     'task_added': task_text
                 }
@@ -172,11 +385,32 @@ def check_task_commands(text_lower, original_text):
     for pattern in complete_patterns:
         match = re.search(pattern, text_lower)
         if match:
-            task_name = match.group(2).strip()
+            task_name = clean_task_reference(match.group(2))
+            if not task_name or re.search(r"\bhabits?\b", task_name):
+                continue
             
+            from app import match_task, complete_task_in_db
+            task, confident = match_task(task_name)
+            if confident:
+                complete_task_in_db(task['id'])
+                return {
+                    'reply': f"Nice work! I've marked '{task['title']}' as complete.",
+                    'action': 'task_updated',
+                    'task_completed': task['title']
+                }
+            if not re.search(r"\b(task|todo)\b", match.group(2)):
+                # Not a task we know; it may be a habit ("I finished my reading habit")
+                break
+            if task:
+                # A weak match is only suggested: completing can't be undone by voice
+                return {
+                    'reply': f"Did you mean '{task['title']}'? Say \"complete {task['title']}\" to mark it done.",
+                    'action': 'task_confirm',
+                    'task_suggested': task['title']
+                }
             return {
-                'reply': f"Task completion will be available in the tasks page. You can mark '{task_name}' as complete there.",
-                'action': 'task_info'
+                'reply': f"I couldn't find an open task matching '{task_name}'. You can check your list on the Tasks page.",
+                'action': 'task_not_found'
             }
     
     # List tasks patterns
@@ -195,6 +429,13 @@ def check_task_commands(text_lower, original_text):
     
     return None
 
+def clean_task_reference(text):
+    """Strip filler around a spoken task name ("the report task for today" -> "report")"""
+    text = re.sub(r"^(?:the|my|a|an|that|task|todo)\s+", '', text.strip(), flags=re.IGNORECASE)
+    text = re.sub(r"\s+(?:task|todo|item|for today|today|now|please)$", '', text, flags=re.IGNORECASE)
+    text = re.sub(r"^(?:the|my|that)\s+", '', text, flags=re.IGNORECASE)
+    return text.strip(' .!?"\'')
+
 def extract_task_from_text(text):
     """Extract task description from natural language"""
     # Common patterns to extract the actual task
@@ -257,6 +498,13 @@ def extract_datetime_from_text(text):
     
     return None
 
+def extract_recurrence_from_text(text, date_time=None):
+    """Recurrence rule for phrases like "every Monday" or "every other day",
+    starting on date_time if one was spoken. Returns (rule or None, text without the phrase)."""
+    from recurrence import rule_from_text
+    start = datetime.date.fromisoformat(date_time) if date_time else None
+    return rule_from_text(text, start)
+
 def check_general_commands(text_lower, original_text):
     """Check for general assistant commands"""
     
@@ -291,9 +539,6 @@ def check_general_commands(text_lower, original_text):
 
 def check_habit_commands(text):
     """Check for habit-related commands in the text"""
-    # Pattern for completing a habit today
-    complete_pattern = r"(complete|finished|did|mark|check|done|completed).*?(habit|task|chore|activity|goal).*?(called|named|labeled|known as)?[\s\"]*([\w\s]+?)[\s\"]*(?:today|now|just now|for today|for the day)?[\.\?]?$"
-    
     # Pattern for adding a new habit
     add_habit_pattern = r"(add|create|make|start).*?(habit|routine).*?(called|named|labeled)?[\s\"]*([\w\s]+?)[\s\"]*[\.\?]?$"
     
@@ -334,7 +579,6 @@ def check_habit_commands(text):
         
         if task_title:
             # Create task in database
-            import datetime
             task_data = {
                 'title': task_title,
                 'description': f'Created via voice command: "{text}"',
@@ -366,26 +610,18 @@ def check_habit_commands(text):
                 }
     
     # Check for completing a habit
-    complete_match = re.search(complete_pattern, text)
-    if complete_match:
-        habit_name = complete_match.group(4).strip()
-        from app import get_habits_from_db, save_habit_date
-        
-        habits = get_habits_from_db()
+    habit_name = completed_habit_name(text)
+    if habit_name is not None:
+        from app import find_habit, set_habit_date
         
         # Find the best matching habit name
-        best_match = None
-        if habit_name:
-            # Simple fuzzy match for habit names
-            for existing_habit in habits.keys():
-                if habit_name.lower() in existing_habit.lower() or existing_habit.lower() in habit_name.lower():
-                    best_match = existing_habit
-                    break
+        best_match = find_habit(habit_name) if habit_name else None
         
         if best_match:
             # Get today's date
+            # Set rather than toggle, so saying it twice doesn't undo it
             today = datetime.date.today().isoformat()
-            save_habit_date(best_match, today)
+            set_habit_date(best_match, today, True)
             
             return {
                 'reply': f"Excellent work! I've marked '{best_match}' as complete for today. Keep up the great momentum!",
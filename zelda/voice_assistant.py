@@ -1,30 +1,58 @@
+import logging
 import os
 import tempfile
-import whisper
-import openai
+import threading
 from flask import request, jsonify
 import re
 import datetime
+from transcription_cache import TranscriptionCache
+from habit_index import completed_habit_name
 
-# Load whisper model once at startup
+log = logging.getLogger(__name__)
+
+# Whisper model, loaded once on first use rather than at import:
+# loading takes seconds and hundreds of MB.
 # Using 'base' model for good balance of accuracy and speed
 # Options: 'tiny', 'base', 'small', 'medium', 'large'
-model = whisper.load_model("base")
+WHISPER_MODEL = "base"
+_model = None
+_model_lock = threading.Lock()
+
+def get_model():
+    """Return the Whisper model, loading it on first use"""
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                import whisper
+                _model = whisper.load_model(WHISPER_MODEL)
+    return _model
+
+# Retried uploads of the same clip skip transcription entirely
+transcription_cache = TranscriptionCache(db_path=os.environ.get('ZELDA_TRANSCRIPTION_CACHE'))
 
 def handle_voice_command(audio_file):
     """Process voice commands using Whisper and respond appropriately"""
     # Transcribe the audio using Whisper
     try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.webm') as tmp_file:
-            tmp_file.write(audio_file.read())
-            tmp_file_path = tmp_file.name
+        audio_bytes = audio_file.read()
+        cache_key = TranscriptionCache.make_key(audio_bytes, f"whisper-{WHISPER_MODEL}")
+        transcript = transcription_cache.get(cache_key)
         
-        # Transcribe using Whisper
-        result = model.transcribe(tmp_file_path)
-        transcript = result["text"].strip()
-        
-        # Clean up temp file
-        os.unlink(tmp_file_path)
+        if transcript is None:
+            with tempfile.NamedTemporaryFile(delete=False, suffix='.webm') as tmp_file:
+                tmp_file.write(audio_bytes)
+                tmp_file_path = tmp_file.name
+            
+            # Transcribe using Whisper
+            result = get_model().transcribe(tmp_file_path)
+            transcript = result["text"].strip()
+            
+            # Clean up temp file
+            os.unlink(tmp_file_path)
+            
+            if transcript:
+                transcription_cache.put(cache_key, transcript)
         
         if not transcript:
             return {
@@ -40,8 +68,8 @@ def handle_voice_command(audio_file):
             **command_result  # This unpacks the reply and any action flags
         }
         
-    except Exception as e:
-        print(f"Error processing audio: {str(e)}")
+    except Exception:
+        log.exception("Error processing audio")
         return {
             'transcript': '',
             'reply': "Sorry, there was an error processing your voice command."
@@ -67,33 +95,21 @@ def process_command(text):
 
 def check_habit_commands(text):
     """Check for habit-related commands in the text"""
-    # Pattern for completing a habit today
-    complete_pattern = r"(complete|finished|did|mark|check|done|completed).*?(habit|task|chore|activity|goal).*?(called|named|labeled|known as)?[\s\"]*([\w\s]+?)[\s\"]*(?:today|now|just now|for today|for the day)?[\.\?]?$"
-    
     # Pattern for adding a new habit
     add_pattern = r"(add|create|make|start).*?(habit|task|chore|activity|goal).*?(called|named|labeled)?[\s\"]*([\w\s]+?)[\s\"]*[\.\?]?$"
     
     # Check for completing a habit
-    complete_match = re.search(complete_pattern, text)
-    if complete_match:
-        habit_name = complete_match.group(4).strip()
-        from app import get_habits_from_db, save_habit_date
-        
-        habits = get_habits_from_db()
+    habit_name = completed_habit_name(text)
+    if habit_name is not None:
+        from app import find_habit, set_habit_date
         
         # Find the best matching habit name
-        best_match = None
-        if habit_name:
-            # Simple fuzzy match for habit names
-            for existing_habit in habits.keys():
-                if habit_name.lower() in existing_habit.lower() or existing_habit.lower() in habit_name.lower():
-                    best_match = existing_habit
-                    break
+        best_match = find_habit(habit_name) if habit_name else None
         
         if best_match:
             # Get today's date
             today = datetime.date.today().isoformat()
-            save_habit_date(best_match, today)
+            set_habit_date(best_match, today, True)
             
             return {
                 'reply': f"Great job! I've marked '{best_match}' as complete for today.",